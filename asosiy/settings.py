@@ -2,6 +2,7 @@
 Django settings for telegram_chat project.
 """
 import os
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -14,6 +15,9 @@ SECRET_KEY = 'django-insecure-web-telegram-chat-2025-secret-key-change-in-produc
 # DEBUG = True
 DEBUG = False
 
+# `manage.py test` yoki pytest ostida (test runner DEBUG'ni baribir False qiladi)
+TESTING = (len(sys.argv) > 1 and sys.argv[1] == 'test') or 'pytest' in sys.modules
+
 DOMEN = 'file.kspi.uz'
 LOCAL_DOMEN = '127.0.0.1'
 
@@ -25,7 +29,11 @@ SESSION_COOKIE_SECURE = False  # HTTPS uchun True qiling
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_AGE = 86400  # 24 soat
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False
-SESSION_SAVE_EVERY_REQUEST = True
+# Har bir so'rovda yozish o'rniga: cached_db + sliding expiry (chat.middleware.SlidingSessionMiddleware).
+# Session umrining shu qismi o'tgandan keyingina muddat bazaga qayta yoziladi (24 soat * 0.25 = 6 soatda bir marta)
+SESSION_ENGINE = 'chat.sessions'
+SESSION_SAVE_EVERY_REQUEST = False
+CHAT_SESSION_REFRESH_FRACTION = 0.25
 
 # CSRF settings
 CSRF_COOKIE_SECURE = False  # HTTPS uchun True qiling
@@ -49,8 +57,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'chat.middleware.MetricsMiddleware',
+    'chat.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'chat.middleware.SlidingSessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -80,13 +90,25 @@ WSGI_APPLICATION = 'asosiy.wsgi.application'
 ASGI_APPLICATION = 'asosiy.asgi.application'
 
 # Database
+# chat.sqlite_backend - oddiy sqlite3 + WAL/PRAGMA sozlamalari va BEGIN IMMEDIATE
+# tranzaksiyalar; timeout - lock bo'shashini kutish (sekund)
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'chat.sqlite_backend',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'timeout': 20,
+        },
     }
 }
 
+# PRAGMA'larni o'zgartirish (chat.sqlite_backend.base.DEFAULT_PRAGMAS ustidan)
+CHAT_SQLITE_PRAGMAS = {}
+
+# Xabar yozishlarini bitta writer thread orqali o'tkazish (group commit)
+CHAT_DB_SINGLE_WRITER = True
+CHAT_DB_WRITER_MAX_BATCH = 64
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -113,13 +135,53 @@ CHANNEL_LAYERS = {
     }
 }
 
-# Development uchun InMemoryChannelLayer
-if DEBUG:
+# Online holat (presence): ulanishlar heartbeat bilan yangilanadi,
+# o'zgarishlar xona bo'yicha har CHAT_PRESENCE_INTERVAL_MS da bitta diff bo'lib yuboriladi
+CHAT_PRESENCE_BACKEND = 'chat.presence.RedisPresenceBackend'
+CHAT_PRESENCE_OPTIONS = {
+    'ttl': 60,
+    'url': 'redis://127.0.0.1:6379/0',
+}
+CHAT_PRESENCE_INTERVAL_MS = 2000
+
+# Development va testlar uchun InMemoryChannelLayer (Redis talab qilinmaydi)
+if DEBUG or TESTING:
     CHANNEL_LAYERS = {
         'default': {
             'BACKEND': 'channels.layers.InMemoryChannelLayer',
         }
     }
+    CHAT_PRESENCE_BACKEND = 'chat.presence.InMemoryPresenceBackend'
+    CHAT_PRESENCE_OPTIONS = {'ttl': 60}
+
+# Cache (production'da bir nechta worker uchun Redis ishlating:
+# 'django.core.cache.backends.redis.RedisCache', LOCATION='redis://127.0.0.1:6379/1')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'telegram-live',
+    }
+}
+
+# Sidebar xonalar ro'yxati keshi (sekund); signal'lar orqali avtomatik yangilanadi
+CHAT_ROOM_LIST_CACHE_TIMEOUT = 300
+
+# @mention username'lari keshi (process ichida LRU, TTL sekundda)
+CHAT_MENTION_CACHE_SIZE = 10000
+CHAT_MENTION_CACHE_TTL = 300
+
+# Oldindan render qilingan xabar HTML'i keshi (id + tahrir versiyasi bo'yicha)
+CHAT_MESSAGE_HTML_CACHE_TIMEOUT = 7 * 24 * 3600
+
+# Write-behind rejimi: WebSocket xabarlari worker ichida yig'ilib bitta
+# bulk_create bilan saqlanadi (N ta xabar yoki X ms, qaysi biri oldin bo'lsa)
+CHAT_WRITE_BEHIND = False
+CHAT_WRITE_BEHIND_MAX_BATCH = 100
+CHAT_WRITE_BEHIND_MAX_DELAY_MS = 5
+
+# Typing indicator: xona bo'yicha snapshot yuborish oralig'i va eskirish vaqti (sekund)
+CHAT_TYPING_INTERVAL_MS = 1000
+CHAT_TYPING_TTL = 4
 
 # Internationalization
 LANGUAGE_CODE = 'uz-uz'
@@ -137,14 +199,75 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
 # File upload settings
-FILE_UPLOAD_MAX_MEMORY_SIZE = 100 * 1024 * 1024  # 100MB
-DATA_UPLOAD_MAX_MEMORY_SIZE = 100 * 1024 * 1024  # 100MB
+# Katta fayllar xotirada emas, vaqtinchalik faylda saqlanadi
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2621440  # 2.5MB
+DATA_UPLOAD_MAX_MEMORY_SIZE = 2621440  # 2.5MB
 FILE_UPLOAD_PERMISSIONS = 0o644
 FILE_UPLOAD_DIRECTORY_PERMISSIONS = 0o755
 
 # Security settings for file uploads
 SECURE_FILE_UPLOAD = True
 
+# Bo'laklab (resumable) yuklash: bo'lak hajmi, maksimal fayl hajmi va .part fayllar papkasi
+CHAT_UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024  # 5MB
+CHAT_UPLOAD_MAX_SIZE = 100 * 1024 * 1024  # 100MB
+CHAT_UPLOAD_TEMP_DIR = MEDIA_ROOT / 'chunked_uploads'
+# Bitta PATCH bo'lakni shuncha sekund band qiladi (uzilib qolgan so'rov lock'i keyin bo'shaydi)
+CHAT_UPLOAD_LOCK_TIMEOUT = 300
+
+# Fayllar SHA-256 bo'yicha bitta nusxada saqlanadigan papka (MEDIA_ROOT ichida)
+CHAT_CAS_PREFIX = 'chat_files/cas'
+
+# Fayl yuklab berishni reverse proxy'ga topshirish: None, 'x-accel-redirect' (nginx)
+# yoki 'x-sendfile' (Apache/lighttpd). nginx uchun internal location kerak:
+#   location /protected-media/ { internal; alias <MEDIA_ROOT>/; }
+CHAT_DOWNLOAD_OFFLOAD = None
+CHAT_DOWNLOAD_ACCEL_PREFIX = '/protected-media/'
+
+# Imzolangan yuklash havolalari: amal qilish muddati (sekund) va fayl o'chirilganda
+# berilgan havolalarni kesh orqali bekor qilish
+CHAT_DOWNLOAD_TOKEN_TTL = 3600
+CHAT_DOWNLOAD_TOKEN_REVOCATION = True
+
+# Rasm preview'lari: alohida process'lar soni, thumbnail'ning eng katta tomoni (px) va sifati
+CHAT_PREVIEW_WORKERS = 2
+CHAT_PREVIEW_MAX_SIZE = 320
+CHAT_PREVIEW_QUALITY = 80
+
+# Chat tarixi: sahifa ochilganda nechta xabar ko'rsatiladi (qolganlari scroll bilan)
+CHAT_HISTORY_PAGE_SIZE = 50
+CHAT_HISTORY_MAX_PAGE_SIZE = 200
+
+# Xabar qidiruvi (SQLite FTS5): sahifa hajmi va bm25 bo'yicha saralanadigan eng yangi mos xabarlar soni
+CHAT_SEARCH_PAGE_SIZE = 20
+CHAT_SEARCH_RANK_WINDOW = 2000
+
+# Qayta ulanishda replay: shundan ko'p hodisa o'tkazib yuborilgan bo'lsa client sahifani to'liq yangilaydi
+# (hodisalar jurnali ham shu oyna bilan cheklanadi)
+CHAT_RESUME_MAX_EVENTS = 500
+
+# Statistika (userlar/xabarlar soni) keshi, sekund; aniq qayta hisoblash: manage.py recount_stats
+CHAT_STATS_CACHE_TIMEOUT = 60
+# Admin ro'yxatlarida filtrsiz COUNT(*) o'rniga hisoblagichlar (juda katta jadvallar uchun)
+CHAT_ADMIN_APPROXIMATE_COUNT = False
+
+# Prometheus metrikalari (/metrics). DEBUG o'chiq bo'lsa faqat "Authorization: Bearer <token>",
+# staff user yoki ALLOWED_IPS'dagi REMOTE_ADDR uchun ochiq, boshqalarga 404.
+# Reverse proxy ortida REMOTE_ADDR proxy manzili bo'ladi - u holda IP ro'yxatini bo'sh qoldiring
+CHAT_METRICS_ENABLED = True
+CHAT_METRICS_TOKEN = None
+CHAT_METRICS_ALLOWED_IPS = []
+
+# SQL profil (so'rovlar soni, vaqti, takrorlangan shakllar) - HTTP so'rov va WebSocket event bo'yicha.
+# Shu chegaralardan oshganlari 'chat.profiling' logger'iga yoziladi
+CHAT_PROFILING = DEBUG or TESTING
+CHAT_PROFILING_LOG_QUERIES = 20
+CHAT_PROFILING_LOG_SQL_MS = 100
+CHAT_PROFILING_LOG_DUPLICATES = 5
+# @query_budget / ChatConsumer.query_budgets (o'qishlar va yozuvlar) oshsa: True - QueryBudgetExceeded
+# (testlar yiqiladi), False - log. DEBUG'da ham faqat log - dev server 500 bermasin
+CHAT_QUERY_BUDGET_STRICT = TESTING
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
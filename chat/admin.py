@@ -1,12 +1,23 @@
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth.models import User
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from .models import Room, Message, RoomMember
+from .stats import ApproximateCountPaginator
+
+
+class ApproximateCountMixin:
+    """Katta jadvallar: CHAT_ADMIN_APPROXIMATE_COUNT yoqilsa changelist COUNT(*) qilmaydi"""
+    paginator = ApproximateCountPaginator
+
+    @property
+    def show_full_result_count(self):
+        return not getattr(settings, 'CHAT_ADMIN_APPROXIMATE_COUNT', False)
 
 
 @admin.register(Room)
-class RoomAdmin(admin.ModelAdmin):
-    list_display = ['name', 'created_by', 'member_count', 'created_at']
+class RoomAdmin(ApproximateCountMixin, admin.ModelAdmin):
+    list_display = ['name', 'created_by', 'member_count', 'message_count', 'created_at']
     list_filter = ['created_at', 'created_by']
     search_fields = ['name']
     readonly_fields = ['created_at']
@@ -17,7 +28,7 @@ class RoomAdmin(admin.ModelAdmin):
 
 
 @admin.register(Message)
-class MessageAdmin(admin.ModelAdmin):
+class MessageAdmin(ApproximateCountMixin, admin.ModelAdmin):
     list_display = ['content_preview', 'user', 'room', 'timestamp', 'has_file']
     list_filter = ['timestamp', 'room']
     search_fields = ['content', 'user__username', 'room__name']
@@ -27,7 +38,7 @@ class MessageAdmin(admin.ModelAdmin):
         if obj.content:
             return obj.content[:50] + '...' if len(obj.content) > 50 else obj.content
         elif obj.file:
-            return f"📎 {obj.file.name}"
+            return f"📎 {obj.display_file_name}"
         return "Bo'sh xabar"
     content_preview.short_description = 'Xabar'
     
@@ -39,13 +50,13 @@ class MessageAdmin(admin.ModelAdmin):
 
 @admin.register(RoomMember)
 class RoomMemberAdmin(admin.ModelAdmin):
-    list_display = ['user', 'room', 'joined_at']
+    list_display = ['user', 'room', 'joined_at', 'unread_count']
     list_filter = ['joined_at', 'room']
     search_fields = ['user__username', 'room__name']
 
 
 # Custom User Admin
-class ChatUserAdmin(BaseUserAdmin):
+class ChatUserAdmin(ApproximateCountMixin, BaseUserAdmin):
     list_display = BaseUserAdmin.list_display + ('room_count',)
     
     def room_count(self, obj):
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class ChatConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'chat'
+
+    def ready(self):
+        # Signal handler'larni ro'yxatdan o'tkazish
+        from . import signals  # noqa: F401
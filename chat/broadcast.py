@@ -0,0 +1,53 @@
+import json
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+from .metrics import instrument_layer
+
+
+def room_group_name(room_id):
+    """Xona uchun channel layer group nomi"""
+    return f'chat_{room_id}'
+
+
+def encode_frame(frame_type, **payload):
+    """Client'ga yuboriladigan JSON frame'ni bir marta serialize qilish"""
+    return json.dumps({'type': frame_type, **payload})
+
+
+def frame_event(frame_type, exclude_user=None, **payload):
+    """
+    Channel layer event'i: frame oldindan encode qilingan, qabul qiluvchi
+    consumer'lar uni qayta serialize qilmasdan uzatadi.
+    `exclude_user` - bu user'ning o'z consumer'lari frame'ni o'tkazib yuboradi.
+    """
+    event = {
+        'type': 'chat.frame',
+        'frame_type': frame_type,
+        'text': encode_frame(frame_type, **payload),
+    }
+    if exclude_user is not None:
+        event['exclude_user'] = exclude_user
+    return event
+
+
+def send_to_room(room_id, event):
+    """
+    Sync koddan (view, signal) xona group'iga event yuborish.
+    Event tranzaksiya commit bo'lgandan keyin yuboriladi.
+    """
+    channel_layer = instrument_layer(get_channel_layer())
+    if channel_layer is None:
+        return
+
+    def send():
+        async_to_sync(channel_layer.group_send)(room_group_name(room_id), event)
+
+    transaction.on_commit(send)
+
+
+def send_frame_to_room(room_id, frame_type, exclude_user=None, **payload):
+    """Sync koddan xonaga bir marta serialize qilingan frame yuborish"""
+    send_to_room(room_id, frame_event(frame_type, exclude_user=exclude_user, **payload))
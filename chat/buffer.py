@@ -0,0 +1,122 @@
+import asyncio
+import logging
+
+from django.conf import settings
+from django.db import transaction
+
+from .events import allocate_seq
+from .models import Message
+from .previews import schedule_preview
+from .rendering import cache_messages_html
+from .rooms import invalidate_room_list
+from .stats import add_room_totals_bulk
+from .unread import increment_unread_bulk
+from .writer import database_write
+
+
+logger = logging.getLogger(__name__)
+
+
+class MessageWriteBuffer:
+    """
+    Write-behind bufer: kelgan xabarlarni bir necha millisekund (yoki N ta
+    xabar) yig'ib, bitta tranzaksiyada `bulk_create` bilan saqlaydi.
+
+    Batch'lar ketma-ket yoziladi, har bir xabarning `on_saved` callback'i
+    (masalan, broadcast) saqlangandan keyin navbat tartibida chaqiriladi,
+    shuning uchun id'lar va broadcast tartibi kelish tartibiga mos keladi.
+    """
+
+    def __init__(self, max_batch=100, max_delay=0.005):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._pending = []
+        self._timer = None
+        self._flush_lock = asyncio.Lock()
+
+    async def save(self, message, on_saved=None):
+        """Xabarni navbatga qo'yish; saqlangan Message (id bilan) qaytariladi"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((message, on_saved, future))
+
+        if len(self._pending) >= self.max_batch:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._start_flush)
+
+        return await future
+
+    async def flush(self):
+        """Navbatdagi barcha xabarlarni darhol saqlash"""
+        task = self._start_flush()
+        if task is not None:
+            await task
+
+    def _start_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return None
+        batch, self._pending = self._pending, []
+        return asyncio.ensure_future(self._flush(batch))
+
+    async def _flush(self, batch):
+        async with self._flush_lock:
+            messages = [message for message, _, _ in batch]
+            try:
+                await database_write(self._write, messages)
+            except Exception as exc:
+                logger.exception("Write-behind batch saqlanmadi (%d ta xabar)", len(messages))
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                return
+
+            for message, on_saved, future in batch:
+                if on_saved is not None:
+                    try:
+                        await on_saved(message)
+                    except Exception:
+                        logger.exception("Xabar #%s uchun on_saved xatosi", message.id)
+                if not future.done():
+                    future.set_result(message)
+
+    @staticmethod
+    def _write(messages):
+        with transaction.atomic():
+            # pre_save ishlamaydi - har bir xona uchun tartib raqamlari bitta UPDATE bilan
+            counts = {}
+            for message in messages:
+                counts[message.room_id] = counts.get(message.room_id, 0) + 1
+            next_seq = {room_id: allocate_seq(room_id, count) for room_id, count in counts.items()}
+            for message in messages:
+                message.seq = next_seq[message.room_id]
+                next_seq[message.room_id] += 1
+            Message.objects.bulk_create(messages)
+            # bulk_create post_save yubormaydi - signal'lar ishi batch uchun bir marta:
+            # xona bo'yicha bitta UPDATE, HTML bitta set_many, sidebar keshi bir marta
+            increment_unread_bulk(messages)
+            add_room_totals_bulk(messages)
+            cache_messages_html(messages)
+            for message in messages:
+                schedule_preview(message)
+        invalidate_room_list()
+
+
+_buffers = {}
+
+
+def get_message_buffer():
+    """Joriy event loop uchun (worker process'da bitta) bufer"""
+    loop = asyncio.get_running_loop()
+    buffer = _buffers.get(loop)
+    if buffer is None:
+        buffer = MessageWriteBuffer(
+            max_batch=getattr(settings, 'CHAT_WRITE_BEHIND_MAX_BATCH', 100),
+            max_delay=getattr(settings, 'CHAT_WRITE_BEHIND_MAX_DELAY_MS', 5) / 1000,
+        )
+        _buffers.clear()
+        _buffers[loop] = buffer
+    return buffer
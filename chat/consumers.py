@@ -1,25 +1,87 @@
 import json
+import time
+from channels.exceptions import StopConsumer
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
 from channels.db import database_sync_to_async
 from django.contrib.auth.models import User
 from .models import Room, Message, RoomMember
+from .broadcast import room_group_name, frame_event
+from .buffer import get_message_buffer
+from .events import delete_message, edit_message_content, get_replay
+from . import metrics
+from .profiling import annotate_profile, profiled
+from .presence import get_presence_service
+from .rendering import cache_message_html
+from .typing import get_typing_aggregator
+from .unread import mark_read
+from .writer import database_write
 from django.utils import timezone
 
 
+# Metrika label'lari cheklangan bo'lishi uchun ma'lum frame turlari
+FRAME_TYPES = frozenset(['chat_message', 'typing', 'heartbeat', 'presence', 'edit_message', 'delete_message', 'read', 'resume'])
+
+
 class ChatConsumer(AsyncWebsocketConsumer):
+    # Frame turi bo'yicha SQL so'rovlar byudjeti (CHAT_PROFILING, qarang: chat.profiling).
+    # O'qishlar va yozuvlar (writer thread'ida bajarilganlari ham) alohida sanaladi
+    query_budgets = {
+        'chat_message': 2,
+        'typing': 0,
+        'heartbeat': 0,
+        'presence': 0,
+        'edit_message': 0,
+        'delete_message': 0,
+        'read': 0,
+        'resume': 6,
+    }
+    write_budgets = {
+        'chat_message': 5,
+        'typing': 0,
+        'heartbeat': 0,
+        'presence': 0,
+        'edit_message': 5,
+        'delete_message': 9,
+        'read': 3,
+        'resume': 0,
+    }
+    
+    async def dispatch(self, message):
+        """Har bir handler (connect/receive/disconnect va layer event'lari) vaqti va SQL profili"""
+        handler = message['type']
+        with profiled(f'ws {handler}'):
+            if not metrics.metrics_enabled():
+                return await super().dispatch(message)
+            started = time.perf_counter()
+            try:
+                return await super().dispatch(message)
+            except StopConsumer:
+                # disconnect'dagi oddiy to'xtash signali - xato emas
+                raise
+            except Exception:
+                metrics.WS_HANDLER_ERRORS.inc(handler)
+                raise
+            finally:
+                metrics.WS_HANDLER_SECONDS.observe(time.perf_counter() - started, handler)
+    
     async def connect(self):
-        self.room_id = self.scope['url_route']['kwargs']['room_id']
-        self.room_group_name = f'chat_{self.room_id}'
+        self.room_id = int(self.scope['url_route']['kwargs']['room_id'])
+        self.room_group_name = room_group_name(self.room_id)
         self.user = self.scope['user']
         
+        metrics.instrument_layer(self.channel_layer)
+        
         # User autentifikatsiya qilinganligini tekshirish
         if not self.user.is_authenticated:
+            metrics.WS_CONNECTS.inc('unauthenticated')
             await self.close()
             return
         
-        # User xona a'zosi ekanligini tekshirish
-        is_member = await self.check_room_membership()
+        # Xona va a'zolik holatini bir marta yuklab, ulanish davomida keshlash
+        is_member = await self.load_connection_state()
         if not is_member:
+            metrics.WS_CONNECTS.inc('forbidden')
             await self.close()
             return
         
@@ -30,15 +92,14 @@ class ChatConsumer(AsyncWebsocketConsumer):
         )
         
         await self.accept()
+        metrics.WS_CONNECTS.inc('accepted')
         
-        # Xonaga kirganligini bildirish
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'user_join',
-                'user': self.user.username,
-            }
-        )
+        # Online holat: join darhol broadcast qilinmaydi, presence_diff orqali boradi
+        presence = get_presence_service()
+        await presence.join(self.room_id, self.user.username, self.channel_name)
+        self.presence_joined = True
+        metrics.WS_CONNECTIONS.inc(str(self.room_id))
+        await self.send_presence_snapshot()
     
     async def disconnect(self, close_code):
         # WebSocket ni room group dan olib tashlash
@@ -48,175 +109,223 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 self.channel_name
             )
             
-            # Xonadan chiqganligini bildirish
-            if hasattr(self, 'user') and self.user.is_authenticated:
-                await self.channel_layer.group_send(
-                    self.room_group_name,
-                    {
-                        'type': 'user_leave',
-                        'user': self.user.username,
-                    }
-                )
+            # Online ro'yxatdan chiqarish (faqat qabul qilingan ulanishlar uchun)
+            if getattr(self, 'presence_joined', False):
+                self.presence_joined = False
+                metrics.WS_DISCONNECTS.inc()
+                metrics.WS_CONNECTIONS.dec(str(self.room_id))
+                get_typing_aggregator().update(self.room_id, self.user.username, False)
+                await get_presence_service().leave(self.room_id, self.user.username, self.channel_name)
     
     async def receive(self, text_data):
         """Client'dan xabar kelganda"""
         try:
             data = json.loads(text_data)
             message_type = data.get('type', 'chat_message')
+            metrics.WS_FRAMES_RECEIVED.inc(message_type if message_type in FRAME_TYPES else 'unknown')
+            annotate_profile(
+                label=f'ws {message_type}',
+                budget=self.query_budgets.get(message_type),
+                write_budget=self.write_budgets.get(message_type),
+            )
             
             if message_type == 'chat_message':
                 content = data.get('message', '').strip()
                 reply_to_id = data.get('reply_to')
                 
                 if content:
-                    # Xabarni database ga saqlash
-                    message = await self.save_message(content, reply_to_id)
-                    
-                    if message:
-                        # Barcha group a'zolariga yuborish
-                        await self.channel_layer.group_send(
-                            self.room_group_name,
-                            {
-                                'type': 'chat_message',
-                                'message': content,
-                                'user': self.user.username,
-                                'user_id': self.user.id,
-                                'message_id': message.id,
-                                'timestamp': message.timestamp.strftime('%H:%M'),
-                                'reply_to': reply_to_id,
-                            }
-                        )
+                    if getattr(settings, 'CHAT_WRITE_BEHIND', False):
+                        # Bufer orqali bulk saqlash, broadcast navbat tartibida bo'ladi
+                        message = await self.build_message(content, reply_to_id)
+                        if message:
+                            await get_message_buffer().save(message, on_saved=self.broadcast_chat_message)
+                    else:
+                        # Xabarni database ga saqlash
+                        message = await self.save_message(content, reply_to_id)
+                        
+                        if message:
+                            await self.broadcast_chat_message(message)
             
             elif message_type == 'typing':
-                # Typing indicator
-                await self.channel_layer.group_send(
-                    self.room_group_name,
-                    {
-                        'type': 'user_typing',
-                        'user': self.user.username,
-                        'is_typing': data.get('is_typing', False),
-                    }
+                # Typing indicator: darhol broadcast emas, aggregator snapshot'iga qo'shiladi
+                get_typing_aggregator().update(
+                    self.room_id,
+                    self.user.username,
+                    bool(data.get('is_typing', False)),
                 )
             
+            elif message_type == 'heartbeat':
+                await get_presence_service().heartbeat(self.room_id, self.user.username, self.channel_name)
+            
+            elif message_type == 'presence':
+                await self.send_presence_snapshot()
+            
+            elif message_type == 'edit_message':
+                # Tahrir: bitta UPDATE (writer orqali) va xonaga kichik delta - sahifa qayta render qilinmaydi
+                content = data.get('content', '').strip()
+                try:
+                    message_id = int(data.get('message_id'))
+                except (TypeError, ValueError):
+                    message_id = None
+                
+                # A'zolik keshlangan holatdan (self.room), muallif va xona - UPDATE filtrida
+                if message_id and content and self.room is not None:
+                    delta = await database_write(edit_message_content, self.room_id, message_id, content, self.user.id)
+                    if delta:
+                        await self.broadcast('message_edited', **delta)
+                    else:
+                        await self.send_error('edit_message', "Xabarni tahrirlab bo'lmadi", message_id=message_id)
+            
             elif message_type == 'delete_message':
-                message_id = data.get('message_id')
                 delete_type = data.get('delete_type', 'all')
+                try:
+                    message_id = int(data.get('message_id'))
+                except (TypeError, ValueError):
+                    message_id = None
                 
+                state = None
                 if message_id:
-                    success = await self.delete_message(message_id, delete_type)
-                    if success:
-                        await self.channel_layer.group_send(
-                            self.room_group_name,
-                            {
-                                'type': 'message_deleted',
-                                'message_id': message_id,
-                                'delete_type': delete_type,
-                            }
-                        )
+                    state = await database_write(delete_message, message_id, delete_type, self.user.id, room_id=self.room_id)
+                if state:
+                    await self.broadcast('message_deleted', **state)
+                else:
+                    await self.send_error('delete_message', "Xabarni o'chirib bo'lmadi", message_id=message_id)
+            
+            elif message_type == 'read':
+                # "Shu seq gacha o'qildi" - o'qilmaganlar hisoblagichi tiklanadi
+                try:
+                    seq = int(data.get('seq'))
+                except (TypeError, ValueError):
+                    seq = None
+                if seq is not None:
+                    await database_write(mark_read, self.room_id, self.user.id, seq)
+            
+            elif message_type == 'resume':
+                # Qayta ulangan client oxirgi ko'rgan seq'dan keyingi hodisalarni so'raydi
+                await self.send_replay(data.get('last_seq'))
         
         except json.JSONDecodeError:
             pass
     
-    async def chat_message(self, event):
-        """Group'dan xabar kelganda client ga yuborish"""
-        await self.send(text_data=json.dumps({
-            'type': 'chat_message',
-            'message': event['message'],
-            'user': event['user'],
-            'user_id': event['user_id'],
-            'message_id': event['message_id'],
-            'timestamp': event['timestamp'],
-            'reply_to': event.get('reply_to'),
-        }))
+    async def broadcast(self, frame_type, exclude_user=None, **payload):
+        """Frame'ni bir marta serialize qilib butun xonaga yuborish"""
+        await self.channel_layer.group_send(
+            self.room_group_name,
+            frame_event(frame_type, exclude_user=exclude_user, **payload),
+        )
     
-    async def user_join(self, event):
-        """User xonaga kirganini bildirish"""
-        await self.send(text_data=json.dumps({
-            'type': 'user_join',
-            'user': event['user'],
-        }))
+    async def broadcast_chat_message(self, message):
+        """Saqlangan xabarni barcha group a'zolariga yuborish"""
+        # post_save signali (bufer'da - batch'ning o'zi) HTML'ni keshga yozib obyektga qo'yadi
+        html = getattr(message, 'rendered_html', None)
+        if html is None:
+            html = await database_sync_to_async(cache_message_html)(message)
+        await self.broadcast(
+            'chat_message',
+            message=message.content,
+            html=str(html),
+            user=self.user.username,
+            user_id=self.user.id,
+            message_id=message.id,
+            timestamp=message.timestamp.strftime('%H:%M'),
+            reply_to=message.reply_to_id,
+            seq=message.seq,
+        )
     
-    async def user_leave(self, event):
-        """User xonadan chiqganini bildirish"""
+    async def send_replay(self, last_seq):
+        """O'tkazib yuborilgan xabar/tahrir/o'chirishlarni faqat shu client'ga yuborish"""
+        try:
+            last_seq = int(last_seq)
+        except (TypeError, ValueError):
+            return
+        events, current_seq = await database_sync_to_async(get_replay)(self.room_id, last_seq)
+        if events is None:
+            # Uzilish juda uzoq - to'liq sahifani qayta yuklash arzonroq
+            await self.send(text_data=json.dumps({'type': 'resync', 'last_seq': current_seq}))
+            return
         await self.send(text_data=json.dumps({
-            'type': 'user_leave',
-            'user': event['user'],
+            'type': 'replay',
+            'events': events,
+            'last_seq': current_seq,
         }))
     
-    async def user_typing(self, event):
-        """User yozayotganini ko'rsatish"""
-        # O'ziga o'zi yubormaslik
-        if event['user'] != self.user.username:
-            await self.send(text_data=json.dumps({
-                'type': 'user_typing',
-                'user': event['user'],
-                'is_typing': event['is_typing'],
-            }))
+    async def send_error(self, action, error, **payload):
+        """Faqat shu client'ga: so'ralgan amal bajarilmadi"""
+        await self.send(text_data=json.dumps({'type': 'error', 'action': action, 'error': error, **payload}))
     
-    async def message_deleted(self, event):
-        """Xabar o'chirilganini bildirish"""
+    async def send_presence_snapshot(self):
+        """Xonadagi online userlar ro'yxatini faqat shu client'ga yuborish"""
+        online = await get_presence_service().snapshot(self.room_id)
         await self.send(text_data=json.dumps({
-            'type': 'message_deleted',
-            'message_id': event['message_id'],
-            'delete_type': event['delete_type'],
+            'type': 'presence_snapshot',
+            'online': online,
         }))
     
+    async def chat_frame(self, event):
+        """Oldindan encode qilingan frame'ni client'ga o'zgartirmasdan uzatish"""
+        if event.get('exclude_user') == self.user.username:
+            return
+        await self.send(text_data=event['text'])
+        metrics.WS_FRAMES_SENT.inc(event.get('frame_type', 'unknown'))
+    
+    async def membership_changed(self, event):
+        """A'zolik yoki xona o'zgarganda keshlangan holatni yangilash"""
+        if event.get('user_id') not in (None, self.user.id):
+            return
+        
+        is_member = await self.load_connection_state()
+        if not is_member:
+            await self.close()
+    
     @database_sync_to_async
-    def check_room_membership(self):
-        """User xona a'zosi ekanligini tekshirish"""
-        try:
-            room = Room.objects.get(id=self.room_id)
-            return RoomMember.objects.filter(room=room, user=self.user).exists()
-        except Room.DoesNotExist:
+    def load_connection_state(self):
+        """Xona, a'zolik va admin holatini bitta so'rov bilan yuklash"""
+        membership = (
+            RoomMember.objects
+            .select_related('room')
+            .filter(room_id=self.room_id, user=self.user)
+            .first()
+        )
+        if membership is None:
+            self.room = None
+            self.is_room_admin = False
+            self.is_room_owner = False
             return False
+        
+        self.room = membership.room
+        self.is_room_admin = membership.is_admin
+        self.is_room_owner = membership.room.created_by_id == self.user.id
+        return True
     
-    @database_sync_to_async
-    def save_message(self, content, reply_to_id=None):
-        """Xabarni database ga saqlash"""
-        try:
-            room = Room.objects.get(id=self.room_id)
-            
-            reply_to = None
-            if reply_to_id:
-                try:
-                    reply_to = Message.objects.get(id=reply_to_id, room=room)
-                except Message.DoesNotExist:
-                    pass
-            
-            message = Message.objects.create(
-                room=room,
-                user=self.user,
-                content=content,
-                message_type='text',
-                reply_to=reply_to,
-            )
-            return message
-        except Room.DoesNotExist:
+    def _build_message(self, content, reply_to_id=None):
+        """Saqlanmagan Message obyektini tayyorlash (xona keshdan olinadi)"""
+        if self.room is None:
             return None
+        
+        reply_to_pk = None
+        if reply_to_id:
+            reply_to_pk = (
+                Message.objects
+                .filter(id=reply_to_id, room_id=self.room_id)
+                .values_list('id', flat=True)
+                .first()
+            )
+        
+        return Message(
+            room=self.room,
+            user=self.user,
+            content=content,
+            message_type='text',
+            reply_to_id=reply_to_pk,
+        )
     
     @database_sync_to_async
-    def delete_message(self, message_id, delete_type):
-        """Xabarni o'chirish"""
-        try:
-            message = Message.objects.get(id=message_id, room_id=self.room_id)
-            
-            # Faqat xabar egasi yoki xona admini o'chira oladi
-            if message.user == self.user or message.room.created_by == self.user:
-                if delete_type == 'text':
-                    message.content = ''
-                    message.save()
-                elif delete_type == 'file':
-                    if message.file:
-                        message.file.delete()
-                        message.file = None
-                        message.file_size = 0
-                        message.file_type = None
-                        message.save()
-                elif delete_type == 'all':
-                    if message.file:
-                        message.file.delete()
-                    message.delete()
-                return True
-        except Message.DoesNotExist:
-            pass
-        return False
+    def build_message(self, content, reply_to_id=None):
+        return self._build_message(content, reply_to_id)
+    
+    async def save_message(self, content, reply_to_id=None):
+        """Xabarni database ga saqlash (xona keshdan olinadi, INSERT yagona writer orqali)"""
+        message = await self.build_message(content, reply_to_id)
+        if message is not None:
+            await database_write(message.save)
+        return message
@@ -0,0 +1,220 @@
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+
+READ_BLOCK_SIZE = 64 * 1024
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+TOKEN_SALT = 'chat.download'
+
+
+def get_token_ttl():
+    return getattr(settings, 'CHAT_DOWNLOAD_TOKEN_TTL', 3600)
+
+
+def revoked_key(message_id):
+    return f'chat:download_revoked:{message_id}'
+
+
+def make_download_token(message):
+    """
+    Xabar faylini yuklash uchun imzolangan token. Unda faylni berish uchun
+    kerakli hamma narsa bor, shuning uchun tekshirishda DB'ga murojaat yo'q.
+    """
+    return sign_file(message.id, message.file.name, message.display_file_name, message.file_type, message.blob_id)
+
+
+def sign_file(message_id, name, file_name, content_type, digest=None):
+    """Storage'dagi `name` fayli uchun xabarga bog'langan token (preview'lar ham shu bilan)"""
+    return signing.dumps({
+        'm': message_id,
+        'f': name,
+        'n': file_name,
+        't': content_type,
+        'h': digest,
+    }, salt=TOKEN_SALT, compress=True)
+
+
+def load_download_token(token, message_id):
+    """
+    Token imzosi, muddati va bekor qilinganini tekshirish.
+    Yaroqsiz bo'lsa None (chaqiruvchi oddiy ruxsat tekshiruviga qaytadi).
+    """
+    try:
+        data = signing.loads(token, salt=TOKEN_SALT, max_age=get_token_ttl())
+    except signing.BadSignature:
+        return None
+    if data.get('m') != message_id:
+        return None
+    if getattr(settings, 'CHAT_DOWNLOAD_TOKEN_REVOCATION', True) and cache.get(revoked_key(message_id)):
+        return None
+    return data
+
+
+def revoke_download_tokens(message_id):
+    """Fayl o'chirilganda xabarning berilgan barcha tokenlarini bekor qilish"""
+    if getattr(settings, 'CHAT_DOWNLOAD_TOKEN_REVOCATION', True):
+        cache.set(revoked_key(message_id), True, get_token_ttl())
+
+
+def download_url(message):
+    """Sahifa va WebSocket frame'lariga qo'yiladigan imzolangan yuklash havolasi"""
+    return reverse('chat:download_signed', args=[message.id, make_download_token(message)])
+
+
+def signed_file_url(message_id, name, content_type):
+    """
+    Xabarga tegishli qo'shimcha fayl (masalan, thumbnail) uchun imzolangan
+    havola: /media/ orqali emas, xuddi asosiy fayl kabi muddat va bekor
+    qilish tekshiruvi bilan beriladi
+    """
+    token = sign_file(message_id, name, os.path.basename(name), content_type)
+    return reverse('chat:download_signed', args=[message_id, token])
+
+
+def file_etag(stat, digest=None):
+    """
+    Kuchli ETag: CAS fayl uchun kontent hash'i, eski fayllar uchun
+    (nginx kabi) o'zgartirilgan vaqt va hajmdan hosil qilinadi
+    """
+    if digest:
+        return f'"{digest}"'
+    return f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+
+
+def parse_range(header, size):
+    """
+    `Range: bytes=start-end` sarlavhasini (start, end) ga aylantirish.
+    Sarlavha bo'lmasa yoki bir nechta oraliq so'ralsa None (to'liq fayl
+    yuboriladi), qondirib bo'lmaydigan oraliq uchun ValueError.
+    """
+    match = RANGE_PATTERN.match(header.replace(' ', '')) if header else None
+    if not match:
+        return None
+
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # bytes=-500 - oxirgi 500 bytes
+        length = int(end)
+        if length == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def if_range_matches(request, etag, last_modified):
+    """If-Range mos kelmasa (fayl o'zgargan) Range e'tiborsiz qoldiriladi"""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == int(last_modified)
+
+
+def iter_file_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            block = f.read(min(READ_BLOCK_SIZE, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+
+
+def offload_response(file_name):
+    """
+    Baytlarni reverse proxy yuboradi: Django faqat ruxsatni tekshiradi.
+    nginx (X-Accel-Redirect) va Apache/lighttpd (X-Sendfile) Range va
+    If-* so'rovlarini o'zi bajaradi.
+    """
+    mode = getattr(settings, 'CHAT_DOWNLOAD_OFFLOAD', None)
+    if mode == 'x-accel-redirect':
+        response = HttpResponse()
+        prefix = getattr(settings, 'CHAT_DOWNLOAD_ACCEL_PREFIX', '/protected-media/')
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(file_name)
+        return response
+    if mode == 'x-sendfile':
+        response = HttpResponse()
+        response['X-Sendfile'] = os.path.join(str(settings.MEDIA_ROOT), file_name)
+        return response
+    return None
+
+
+def serve_message_file(request, message, file_name, content_type):
+    return serve_file(request, message.file.name, file_name, content_type, digest=message.blob_id)
+
+
+def serve_file(request, name, file_name, content_type, digest=None):
+    """
+    Storage'dagi `name` faylini Range (206/416), ETag/Last-Modified
+    (304/412) va ixtiyoriy proxy offload bilan yuborish
+    """
+    path = default_storage.path(name)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return HttpResponse("Fayl topilmadi", status=404)
+
+    etag = file_etag(stat, digest)
+    last_modified = stat.st_mtime
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(last_modified))
+    if response is None:
+        response = offload_response(name)
+    if response is None:
+        response = _file_response(request, path, stat.st_size, etag, last_modified)
+
+    if response.status_code in (200, 206, 304):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = 'private, max-age=0, must-revalidate'
+    if response.status_code in (200, 206):
+        response['Content-Type'] = content_type
+        response['Content-Disposition'] = f'attachment; filename*=UTF-8\'\'{quote(file_name)}'
+
+    # Xavfsizlik header'lari qo'shish
+    response['X-Content-Type-Options'] = 'nosniff'
+    response['Content-Security-Policy'] = "default-src 'none'; sandbox"
+    response['X-Download-Options'] = 'noopen'
+    response['X-Permitted-Cross-Domain-Policies'] = 'none'
+    return response
+
+
+def _file_response(request, path, size, etag, last_modified):
+    byte_range = None
+    if request.method == 'GET' and if_range_matches(request, etag, last_modified):
+        try:
+            byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    if byte_range is None:
+        response = FileResponse(open(path, 'rb'))
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(iter_file_range(path, start, length), status=206)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(length)
+    response['Accept-Ranges'] = 'bytes'
+    return response
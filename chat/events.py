@@ -0,0 +1,175 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Room, Message, RoomEvent, RoomMember
+from .previews import preview_urls
+from .rendering import attach_rendered_html, cache_message_html, invalidate_message_html, message_payload
+from .rooms import invalidate_room_list
+from .storage import release_message_file
+
+
+def get_resume_limit():
+    return getattr(settings, 'CHAT_RESUME_MAX_EVENTS', 500)
+
+
+def allocate_seq(room_id, count=1):
+    """
+    Xona hisoblagichidan ketma-ket `count` ta tartib raqami olish.
+    Birinchi raqam qaytariladi. Yozish bilan bir tranzaksiyada chaqirilsa
+    (writer thread) raqamlar commit tartibiga mos keladi.
+    """
+    with transaction.atomic():
+        Room.objects.filter(id=room_id).update(last_seq=F('last_seq') + count)
+        last_seq = Room.objects.filter(id=room_id).values_list('last_seq', flat=True).get()
+    return last_seq - count + 1
+
+
+def record_event(room_id, event_type, message_id, **data):
+    """Tahrir/o'chirish hodisasini jurnalga yozib, uning tartib raqamini qaytarish"""
+    with transaction.atomic():
+        seq = allocate_seq(room_id)
+        RoomEvent.objects.create(room_id=room_id, seq=seq, event_type=event_type, message_id=message_id, data=data)
+        # Replay oynasidan tashqaridagi hodisalar kerak emas (client baribir resync qiladi)
+        RoomEvent.objects.filter(room_id=room_id, seq__lte=seq - get_resume_limit()).delete()
+    return seq
+
+
+def edit_message_content(room_id, message_id, content, user_id):
+    """
+    Xabar matnini tahrirlash: faqat content/edited_at ustunlari bitta UPDATE
+    bilan (FTS trigger'i indeksni o'zi yangilaydi), hodisa jurnalga yoziladi.
+    Faqat muallif va faqat shu xonadagi xabar - ruxsat UPDATE filtrining o'zida.
+    Client'larga yuboriladigan message_edited delta'si, mos xabar bo'lmasa None.
+    """
+    edited_at = timezone.now()
+    with transaction.atomic():
+        updated = (
+            Message.objects
+            .filter(id=message_id, room_id=room_id, user_id=user_id)
+            .update(content=content, edited_at=edited_at)
+        )
+        if not updated:
+            return None
+        seq = record_event(room_id, 'edit', message_id)
+    # Yangi versiya HTML'i keshga (kalit edited_at bo'yicha - eski versiya kaliti o'z-o'zidan eskiradi)
+    html = cache_message_html(Message(id=message_id, room_id=room_id, content=content, edited_at=edited_at))
+    # .update() post_save signal'ini chaqirmaydi - sidebar'dagi oxirgi xabar matni uchun
+    invalidate_room_list()
+    return {'message_id': message_id, 'message': content, 'html': html, 'edited': True, 'seq': seq}
+
+
+def delete_message(message_id, delete_type, user_id, room_id=None):
+    """
+    Xabarni to'liq ('all') yoki qisman ('text'/'file') o'chirish, hodisani
+    jurnalga yozish - yagona writer orqali chaqiriladi (fayl havolasini
+    bo'shatish ham yozuv). Faqat xona a'zosi bo'lgan muallif yoki xona
+    yaratuvchisi. message_deleted frame'i ma'lumotlari, ruxsat bo'lmasa None.
+    """
+    if delete_type not in ('text', 'file', 'all'):
+        return None
+    messages = Message.objects.select_related('user', 'room').filter(id=message_id)
+    if room_id is not None:
+        messages = messages.filter(room_id=room_id)
+    message = messages.first()
+    if message is None or user_id not in (message.user_id, message.room.created_by_id):
+        return None
+    if not RoomMember.objects.filter(room_id=message.room_id, user_id=user_id).exists():
+        return None
+
+    room_id = message.room_id
+    if delete_type in ('text', 'all'):
+        invalidate_message_html(message)
+    with transaction.atomic():
+        if delete_type == 'text':
+            message.content = ''
+            message.save()
+        elif delete_type == 'file':
+            if message.file:
+                release_message_file(message)
+                message.save()
+        else:
+            if message.file:
+                release_message_file(message)
+            message.delete()
+        seq = record_event(room_id, 'delete', message_id, delete_type=delete_type)
+    if delete_type == 'all':
+        return {'message_id': message_id, 'delete_type': 'all', 'seq': seq}
+    return message_state(message, seq, delete_type=delete_type)
+
+
+def message_state(message, seq, delete_type=None):
+    """
+    Tahrir yoki qisman o'chirishdan keyingi xabar holati (qolgan matn/fayl) -
+    client bubble'ni sahifani yangilamasdan joyida o'zgartiradi.
+    Jonli broadcast va replay uchun bir xil maydonlar.
+    """
+    state = message_payload(message)
+    state['delete_type'] = delete_type
+    state['edited'] = bool(message.edited_at)
+    state['seq'] = seq
+    return state
+
+
+def message_frame(message):
+    """Replay uchun xabar frame'i (jonli broadcast bilan bir xil maydonlar)"""
+    frame = message_payload(message)
+    frame['type'] = 'file_message' if message.file else 'chat_message'
+    return frame
+
+
+def get_replay(room_id, last_seq):
+    """
+    `last_seq` dan keyingi hamma narsa: yangi xabarlar, tahrirlar va
+    o'chirishlar - seq bo'yicha tartiblangan frame'lar ro'yxati.
+    Uzilish juda katta bo'lsa (yoki client kelajakdagi seq yuborsa) None -
+    client sahifani to'liq yangilashi kerak.
+    """
+    limit = get_resume_limit()
+    current_seq = Room.objects.filter(id=room_id).values_list('last_seq', flat=True).first()
+    if current_seq is None or last_seq > current_seq:
+        return None, current_seq
+    if current_seq - last_seq > limit:
+        return None, current_seq
+
+    messages = list(
+        Message.objects
+        .filter(room_id=room_id, seq__gt=last_seq)
+        .select_related('user')
+        .order_by('seq')
+    )
+    events = list(RoomEvent.objects.filter(room_id=room_id, seq__gt=last_seq).order_by('seq'))
+    attach_rendered_html(messages)
+
+    frames = [message_frame(message) for message in messages]
+
+    edited_ids = [
+        event.message_id for event in events
+        if event.event_type in ('edit', 'preview') or event.data.get('delete_type') in ('text', 'file')
+    ]
+    current = Message.objects.select_related('user').in_bulk(edited_ids) if edited_ids else {}
+    attach_rendered_html(current.values())
+
+    for event in events:
+        if event.event_type == 'delete' and event.data.get('delete_type', 'all') == 'all':
+            frames.append({'type': 'message_deleted', 'message_id': event.message_id, 'delete_type': 'all', 'seq': event.seq})
+            continue
+        message = current.get(event.message_id)
+        if message is None:
+            # Keyinroq butunlay o'chirilgan - uning 'delete' hodisasi ham replay'da bor
+            continue
+        if event.event_type == 'preview':
+            frames.append({
+                'type': 'preview_ready',
+                'message_id': event.message_id,
+                'preview': preview_urls(message.id, message.preview),
+                'seq': event.seq,
+            })
+            continue
+        frame = message_state(message, event.seq, delete_type=event.data.get('delete_type'))
+        frame['type'] = 'message_edited' if event.event_type == 'edit' else 'message_deleted'
+        frames.append(frame)
+
+    frames.sort(key=lambda frame: frame['seq'])
+    return frames, current_seq
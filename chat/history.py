@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+
+from .models import Message
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def get_page_size(value=None):
+    """So'ralgan sahifa hajmini settings chegarasida qaytaradi"""
+    default = getattr(settings, 'CHAT_HISTORY_PAGE_SIZE', 50)
+    max_size = getattr(settings, 'CHAT_HISTORY_MAX_PAGE_SIZE', 200)
+    try:
+        size = int(value) if value else default
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, max_size))
+
+
+def encode_cursor(message):
+    """Xabardan (timestamp, id) cursor yasaydi: '<mikrosekund>:<id>'"""
+    delta = message.timestamp - EPOCH
+    micros = (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+    return f'{micros}:{message.id}'
+
+
+def decode_cursor(cursor):
+    """Cursor'ni (timestamp, id) juftligiga qaytaradi, noto'g'ri bo'lsa None"""
+    try:
+        micros, message_id = cursor.split(':', 1)
+        return EPOCH + timedelta(microseconds=int(micros)), int(message_id)
+    except (AttributeError, ValueError, OverflowError):
+        return None
+
+
+def get_history_page(room, before=None, limit=None):
+    """
+    Xona tarixidan bitta sahifa olish (keyset pagination).
+
+    `before` cursor'dan oldingi eng yangi `limit` ta xabar xronologik
+    tartibda qaytariladi. So'rov (room, timestamp, id) indeksidan foydalanadi,
+    shuning uchun xona qanchalik katta bo'lmasin narxi sahifa hajmiga teng.
+    Natija: (messages, next_cursor, has_more)
+    """
+    limit = get_page_size(limit)
+    queryset = Message.objects.filter(room=room)
+
+    position = decode_cursor(before) if before else None
+    if position:
+        timestamp, message_id = position
+        queryset = queryset.filter(
+            Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=message_id)
+        )
+
+    rows = list(
+        queryset.select_related('user').order_by('-timestamp', '-id')[:limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    rows.reverse()
+
+    next_cursor = encode_cursor(rows[0]) if rows and has_more else None
+    return rows, next_cursor, has_more
+
+
+def get_history_around(room, cursor, limit=None):
+    """
+    Qidiruv natijasiga o'tish uchun `cursor` dagi xabar atrofidagi sahifa:
+    yarmi shu xabargacha (o'zi bilan), yarmi undan keyin. Eski tomonga
+    scroll odatdagidek next_cursor (before=) bilan davom etadi.
+    Natija: (messages, next_cursor, has_more, has_newer), cursor noto'g'ri bo'lsa None
+    """
+    position = decode_cursor(cursor)
+    if position is None:
+        return None
+    limit = get_page_size(limit)
+    timestamp, message_id = position
+    queryset = Message.objects.filter(room=room).select_related('user')
+
+    older_limit = limit - limit // 2
+    newer_limit = limit // 2
+    older = list(
+        queryset
+        .filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lte=message_id))
+        .order_by('-timestamp', '-id')[:older_limit + 1]
+    )
+    newer = list(
+        queryset
+        .filter(Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, id__gt=message_id))
+        .order_by('timestamp', 'id')[:newer_limit + 1]
+    )
+    has_more = len(older) > older_limit
+    has_newer = len(newer) > newer_limit
+    older = older[:older_limit]
+    older.reverse()
+    rows = older + newer[:newer_limit]
+
+    next_cursor = encode_cursor(rows[0]) if rows and has_more else None
+    return rows, next_cursor, has_more, has_newer
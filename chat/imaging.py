@@ -0,0 +1,40 @@
+"""Preview worker process'larida bajariladigan kod (Django import qilinmaydi)"""
+import os
+
+
+def generate_preview(source_path, media_root, thumb_name, webp_name, max_size, quality):
+    """
+    Rasmdan JPEG va WebP thumbnail yaratish. Alohida (spawn) process'da
+    ishlaydi, shuning uchun Django'siz - faqat fayl yo'llari bilan.
+    Natija: asl o'lcham va thumbnail ma'lumotlari.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(source_path) as image:
+        width, height = image.size
+        image.seek(0)
+        thumb = ImageOps.exif_transpose(image)
+        thumb.thumbnail((max_size, max_size))
+        if thumb.mode not in ('RGB', 'L'):
+            background = Image.new('RGB', thumb.size, (255, 255, 255))
+            rgba = thumb.convert('RGBA')
+            background.paste(rgba, mask=rgba.getchannel('A'))
+            thumb = background
+
+        for name, fmt in ((thumb_name, 'JPEG'), (webp_name, 'WEBP')):
+            path = os.path.join(media_root, name)
+            if os.path.exists(path):
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f'{path}.{os.getpid()}.tmp'
+            thumb.save(temp_path, fmt, quality=quality)
+            os.replace(temp_path, path)
+
+    return {
+        'width': width,
+        'height': height,
+        'thumb': thumb_name,
+        'webp': webp_name,
+        'thumb_width': thumb.width,
+        'thumb_height': thumb.height,
+    }
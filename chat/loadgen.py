@@ -0,0 +1,187 @@
+"""
+WebSocket yuklama generatori: N xona x M client chat, typing va delete
+trafigini yuboradi va fan-out kechikishini o'lchaydi.
+
+Client'lar ikki xil: `CommunicatorClient` - ilovani shu process ichida
+(channels.testing orqali) ishga tushiradi, `NetworkClient` - ishlab
+turgan serverga haqiqiy WebSocket orqali ulanadi (`websockets` paketi).
+Kechikish generatorning o'z soati bilan o'lchanadi: yuborish vaqti xabar
+matniga yoziladi va har bir qabul qiluvchida ayiriladi.
+"""
+import asyncio
+import json
+import random
+import statistics
+import time
+
+
+BENCH_PREFIX = 'bench'
+
+
+class CommunicatorClient:
+    """Ilovani process ichida ishga tushiruvchi client (tarmoq yo'q)"""
+
+    def __init__(self, application, path, user):
+        from channels.testing import WebsocketCommunicator
+
+        self.communicator = WebsocketCommunicator(application, path)
+        self.communicator.scope['user'] = user
+
+    async def connect(self):
+        connected, _ = await self.communicator.connect()
+        if not connected:
+            raise ConnectionError('WebSocket ulanish rad etildi')
+
+    async def send(self, data):
+        await self.communicator.send_to(text_data=json.dumps(data))
+
+    async def receive(self):
+        # Timeout'da WebsocketCommunicator ilovani to'xtatadi - shuning uchun
+        # uzoq kutiladi, oxirida receive task bekor qilinadi
+        return json.loads(await self.communicator.receive_from(timeout=3600))
+
+    async def close(self):
+        await self.communicator.disconnect()
+
+
+class NetworkClient:
+    """Ishlab turgan serverga (daphne/uvicorn) haqiqiy WebSocket ulanish"""
+
+    def __init__(self, url, cookie=None, origin=None):
+        self.url = url
+        self.headers = {}
+        if cookie:
+            self.headers['Cookie'] = cookie
+        if origin:
+            self.headers['Origin'] = origin
+        self.connection = None
+
+    async def connect(self):
+        import websockets
+
+        try:
+            self.connection = await websockets.connect(self.url, additional_headers=self.headers)
+        except TypeError:
+            # websockets < 14
+            self.connection = await websockets.connect(self.url, extra_headers=self.headers)
+
+    async def send(self, data):
+        await self.connection.send(json.dumps(data))
+
+    async def receive(self):
+        return json.loads(await self.connection.recv())
+
+    async def close(self):
+        await self.connection.close()
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))
+    return values[index]
+
+
+class LoadStats:
+    def __init__(self):
+        self.latencies = []
+        self.sent = {'chat': 0, 'typing': 0, 'delete': 0}
+        self.received = 0
+        self.expected = 0
+        self.errors = 0
+        self.send_elapsed = 0.0
+        self.elapsed = 0.0
+
+    def summary(self):
+        latencies = sorted(self.latencies)
+        return {
+            'sent': dict(self.sent),
+            'delivered': len(latencies),
+            'expected': self.expected,
+            'received_frames': self.received,
+            'errors': self.errors,
+            'elapsed': self.elapsed,
+            'messages_per_sec': self.sent['chat'] / self.send_elapsed if self.send_elapsed else 0,
+            'deliveries_per_sec': len(latencies) / self.elapsed if self.elapsed else 0,
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'mean_ms': statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        }
+
+
+class BenchClient:
+    """Bitta simulyatsiya qilingan foydalanuvchi: yuboruvchi va qabul qiluvchi"""
+
+    def __init__(self, index, room_key, transport):
+        self.index = index
+        self.room_key = room_key
+        self.transport = transport
+        self.own_messages = []
+        self.receiver = None
+
+    async def receive_loop(self, stats):
+        while True:
+            data = await self.transport.receive()
+            stats.received += 1
+            if data.get('type') != 'chat_message':
+                continue
+            parts = (data.get('message') or '').split(' ')
+            if len(parts) != 4 or parts[0] != BENCH_PREFIX:
+                continue
+            stats.latencies.append(time.perf_counter() - float(parts[3]))
+            if parts[1] == str(self.index) and data.get('message_id'):
+                self.own_messages.append(data['message_id'])
+
+    async def send_loop(self, stats, messages, interval, typing_ratio, delete_ratio, room_size):
+        rng = random.Random(self.index)
+        for seq in range(messages):
+            roll = rng.random()
+            try:
+                if roll < typing_ratio:
+                    await self.transport.send({'type': 'typing', 'is_typing': True})
+                    stats.sent['typing'] += 1
+                elif roll < typing_ratio + delete_ratio and self.own_messages:
+                    message_id = self.own_messages.pop(0)
+                    await self.transport.send({'type': 'delete_message', 'message_id': message_id, 'delete_type': 'all'})
+                    stats.sent['delete'] += 1
+                else:
+                    await self.transport.send({
+                        'type': 'chat_message',
+                        'message': f'{BENCH_PREFIX} {self.index} {seq} {time.perf_counter():.9f}',
+                    })
+                    stats.sent['chat'] += 1
+                    stats.expected += room_size
+            except Exception:
+                stats.errors += 1
+            await asyncio.sleep(interval * rng.uniform(0.5, 1.5))
+
+
+async def run_load(clients, messages=20, interval=0.05, typing_ratio=0.2, delete_ratio=0.05, drain=2.0):
+    """
+    Ulangan client'lar bilan yuklamani bajarish. `clients` - BenchClient
+    ro'yxati (allaqachon ulangan). LoadStats qaytaradi.
+    """
+    stats = LoadStats()
+    room_sizes = {}
+    for client in clients:
+        room_sizes[client.room_key] = room_sizes.get(client.room_key, 0) + 1
+
+    for client in clients:
+        client.receiver = asyncio.ensure_future(client.receive_loop(stats))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        client.send_loop(stats, messages, interval, typing_ratio, delete_ratio, room_sizes[client.room_key])
+        for client in clients
+    ))
+    stats.send_elapsed = time.perf_counter() - started
+    # Yo'ldagi xabarlar yetib kelishini kutish
+    deadline = time.perf_counter() + drain
+    while len(stats.latencies) < stats.expected and time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+    stats.elapsed = time.perf_counter() - started
+
+    for client in clients:
+        client.receiver.cancel()
+    await asyncio.gather(*(client.receiver for client in clients), return_exceptions=True)
+    return stats
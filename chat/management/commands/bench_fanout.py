@@ -0,0 +1,76 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+
+from chat.broadcast import frame_event
+from chat.consumers import ChatConsumer
+
+
+class Command(BaseCommand):
+    help = "Broadcast fan-out narxini xona hajmiga qarab o'lchash (har recipient'da serialize vs bir marta)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=str, default='10,100,500,1000', help="Xona hajmlari (vergul bilan)")
+        parser.add_argument('--rounds', type=int, default=200, help='Har bir hajm uchun broadcast soni')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        self.stdout.write('{:>8}{:>14}{:>14}{:>12}'.format("a'zolar", 'eski (ms)', 'yangi (ms)', 'tezlashish'))
+        for size in sizes:
+            legacy, single = asyncio.run(self.measure(size, options['rounds']))
+            self.stdout.write(f"{size:>8}{legacy * 1000:>14.3f}{single * 1000:>14.3f}{legacy / single:>11.1f}x")
+        self.stdout.write('Qiymatlar: bitta broadcast uchun o\'rtacha vaqt (serialize + barcha recipient handler\'lari)')
+
+    def make_consumers(self, size):
+        sent = []
+
+        async def send(text_data=None, bytes_data=None, close=False):
+            sent.append(text_data)
+
+        consumers = []
+        for index in range(size):
+            consumer = ChatConsumer()
+            consumer.user = SimpleNamespace(username=f'user{index}', id=index)
+            consumer.send = send
+            consumers.append(consumer)
+        return consumers, sent
+
+    async def measure(self, size, rounds):
+        consumers, _ = self.make_consumers(size)
+        payload = {
+            'message': 'Salom! ' * 20,
+            'user': 'user0',
+            'user_id': 0,
+            'message_id': 123456,
+            'timestamp': '12:34',
+            'reply_to': None,
+        }
+
+        # Eski yo'l: har bir recipient event'dan dict yig'ib json.dumps qiladi
+        started = time.perf_counter()
+        for _ in range(rounds):
+            event = {'type': 'chat_message', **payload}
+            for consumer in consumers:
+                await consumer.send(text_data=json.dumps({
+                    'type': 'chat_message',
+                    'message': event['message'],
+                    'user': event['user'],
+                    'user_id': event['user_id'],
+                    'message_id': event['message_id'],
+                    'timestamp': event['timestamp'],
+                    'reply_to': event.get('reply_to'),
+                }))
+        legacy = (time.perf_counter() - started) / rounds
+
+        # Yangi yo'l: sender bir marta encode qiladi, recipient'lar uzatadi
+        started = time.perf_counter()
+        for _ in range(rounds):
+            event = frame_event('chat_message', **payload)
+            for consumer in consumers:
+                await consumer.chat_frame(event)
+        single = (time.perf_counter() - started) / rounds
+
+        return legacy, single
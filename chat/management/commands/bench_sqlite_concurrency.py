@@ -0,0 +1,94 @@
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+
+from chat.writer import DatabaseWriter
+
+
+MODES = (
+    # (nom, ENGINE, yagona writer)
+    ('oddiy', 'django.db.backends.sqlite3', False),
+    ('wal', 'chat.sqlite_backend', False),
+    ('wal+writer', 'chat.sqlite_backend', True),
+)
+
+
+class Command(BaseCommand):
+    help = "Bir vaqtda yozishda SQLite 'database is locked' xatolarini oddiy va WAL/yagona writer rejimida solishtirish"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16, help='Bir vaqtda yozayotgan thread\'lar soni')
+        parser.add_argument('--writes', type=int, default=200, help='Har bir thread yozuvlari soni')
+        parser.add_argument('--timeout', type=float, default=5, help='sqlite3 busy timeout (sekund)')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'rejim':<12}{'yozuvlar':>10}{'xatolar':>9}{'sekund':>9}{'yozuv/s':>10}{'p99 ms':>9}")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for name, engine, single_writer in MODES:
+                alias = f'bench_{name}'
+                self.add_database(alias, engine, os.path.join(temp_dir, f'{alias}.sqlite3'), options['timeout'])
+                try:
+                    ok, errors, elapsed, p99 = self.run_mode(alias, single_writer, options)
+                finally:
+                    connections[alias].close()
+                self.stdout.write(f"{name:<12}{ok:>10}{errors:>9}{elapsed:>9.2f}{ok / elapsed:>10.0f}{p99:>9.1f}")
+
+    def add_database(self, alias, engine, path, timeout):
+        config = connections.configure_settings({
+            'default': dict(settings.DATABASES['default']),
+            alias: {'ENGINE': engine, 'NAME': path, 'OPTIONS': {'timeout': timeout}},
+        })[alias]
+        connections.settings[alias] = config
+        with connections[alias].cursor() as cursor:
+            cursor.execute('CREATE TABLE bench_message (id INTEGER PRIMARY KEY, room_id INTEGER, content TEXT)')
+            cursor.execute('CREATE INDEX bench_message_room ON bench_message (room_id)')
+
+    @staticmethod
+    def write_one(alias, room_id, content):
+        # Message.save + signal'lar kabi: tranzaksiya ichida avval o'qish, keyin yozish
+        with transaction.atomic(using=alias):
+            with connections[alias].cursor() as cursor:
+                cursor.execute('SELECT COUNT(*) FROM bench_message WHERE room_id = %s', [room_id])
+                cursor.execute('INSERT INTO bench_message (room_id, content) VALUES (%s, %s)', [room_id, content])
+
+    def run_mode(self, alias, single_writer, options):
+        writer = DatabaseWriter(using=alias) if single_writer else None
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+        start_barrier = threading.Barrier(options['threads'])
+
+        def worker(index):
+            start_barrier.wait()
+            local_latencies, local_errors = [], 0
+            for i in range(options['writes']):
+                started = time.perf_counter()
+                try:
+                    if writer is not None:
+                        writer.run(self.write_one, alias, index % 4, f'bench {index}:{i}')
+                    else:
+                        self.write_one(alias, index % 4, f'bench {index}:{i}')
+                    local_latencies.append(time.perf_counter() - started)
+                except OperationalError:
+                    local_errors += 1
+            connections[alias].close()
+            with lock:
+                latencies.extend(local_latencies)
+                errors.append(local_errors)
+
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(options['threads'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else 0
+        return len(latencies), sum(errors), elapsed, p99
@@ -0,0 +1,209 @@
+import asyncio
+import tracemalloc
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from chat import presence
+from chat.loadgen import BenchClient, CommunicatorClient, NetworkClient, run_load
+from chat.models import Room, RoomMember
+from chat.writer import get_writer, writer_enabled
+
+
+class Command(BaseCommand):
+    help = (
+        "WebSocket yuklama testi: N xona x M client chat/typing/delete trafigi, "
+        "fan-out kechikishi (p50/p99), o'tkazuvchanlik va ulanish boshiga xotira"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=5, help='Xonalar soni')
+        parser.add_argument('--clients', type=int, default=20, help='Har bir xonadagi client\'lar soni')
+        parser.add_argument('--messages', type=int, default=20, help='Har bir client yuboradigan frame\'lar soni')
+        parser.add_argument('--interval-ms', type=float, default=50, help='Client frame\'lari orasidagi o\'rtacha pauza')
+        parser.add_argument('--typing-ratio', type=float, default=0.2, help='Typing frame\'lar ulushi')
+        parser.add_argument('--delete-ratio', type=float, default=0.05, help='O\'chirish frame\'lari ulushi')
+        parser.add_argument('--drain', type=float, default=3.0, help='Oxirida yetib kelmagan xabarlarni kutish (sekund)')
+        parser.add_argument(
+            '--layer', choices=['inmemory', 'redis'], default='inmemory',
+            help="Process ichidagi test uchun channel layer",
+        )
+        parser.add_argument(
+            '--redis-url', default=None,
+            help="Haqiqiy Redis manzili; berilmasa --layer redis lokal fakeredis bilan ishlaydi",
+        )
+        parser.add_argument(
+            '--url', default=None,
+            help="Ishlab turgan serverga ulanish (masalan ws://127.0.0.1:8000); berilmasa process ichida",
+        )
+        parser.add_argument('--keep', action='store_true', help='Test xona va userlarini o\'chirmaslik')
+
+    def handle(self, *args, **options):
+        rooms, users = self.create_fixtures(options['rooms'], options['clients'])
+        try:
+            if options['url']:
+                summary, memory = asyncio.run(self.run_network(rooms, users, options)), None
+            else:
+                with override_settings(**self.layer_settings(options)):
+                    presence._backend = None
+                    summary, memory = asyncio.run(self.run_in_process(rooms, users, options))
+                presence._backend = None
+        finally:
+            if writer_enabled():
+                # Navbatda qolgan yozuvlar tugasin - aks holda ular o'chirilgan xonaga yoziladi
+                get_writer().run(lambda: None)
+            if not options['keep']:
+                Room.objects.filter(id__in=[room.id for room in rooms]).delete()
+                User.objects.filter(id__in=[user.id for user in users]).delete()
+
+        self.report(summary, memory, options)
+
+    def create_fixtures(self, room_count, clients_per_room):
+        total = room_count * clients_per_room
+        names = [f'bench_ws_{index}' for index in range(total)]
+        existing = set(User.objects.filter(username__in=names).values_list('username', flat=True))
+        User.objects.bulk_create([User(username=name) for name in names if name not in existing])
+        users = list(User.objects.filter(username__in=names).order_by('id'))
+
+        rooms = [Room.objects.create(name=f'bench-ws-{index}', created_by=users[0]) for index in range(room_count)]
+        RoomMember.objects.bulk_create([
+            RoomMember(room=rooms[index // clients_per_room], user=user)
+            for index, user in enumerate(users)
+        ])
+        return rooms, users
+
+    def layer_settings(self, options):
+        if options['layer'] == 'inmemory':
+            return {
+                'CHANNEL_LAYERS': {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+                'CHAT_PRESENCE_BACKEND': 'chat.presence.InMemoryPresenceBackend',
+                'CHAT_PRESENCE_OPTIONS': {'ttl': 60},
+            }
+
+        if options['redis_url']:
+            host = {'address': options['redis_url']}
+            presence_options = {'ttl': 60, 'url': options['redis_url'], 'prefix': 'bench:presence:'}
+        else:
+            # Redis o'rniga lokal stand-in: channels_redis'ning Lua skriptlari uchun fakeredis[lua]
+            try:
+                from fakeredis import FakeServer
+                from fakeredis.aioredis import FakeConnection
+                import lupa  # noqa: F401
+            except ImportError:
+                raise CommandError("Lokal Redis stand-in uchun: pip install 'fakeredis[lua]' (yoki --redis-url bering)")
+            server = FakeServer()
+            host = {'connection_class': FakeConnection, 'server': server}
+            presence_options = {'ttl': 60, 'prefix': 'bench:presence:'}
+            self.fake_server = server
+
+        return {
+            'CHANNEL_LAYERS': {'default': {
+                'BACKEND': 'channels_redis.core.RedisChannelLayer',
+                'CONFIG': {'hosts': [host], 'capacity': 10000},
+            }},
+            'CHAT_PRESENCE_BACKEND': 'chat.presence.RedisPresenceBackend',
+            'CHAT_PRESENCE_OPTIONS': presence_options,
+        }
+
+    def presence_backend(self):
+        backend = presence.get_presence_backend()
+        if getattr(self, 'fake_server', None) is not None:
+            from fakeredis import FakeAsyncRedis
+            backend.redis = FakeAsyncRedis(server=self.fake_server)
+        return backend
+
+    async def run_in_process(self, rooms, users, options):
+        from channels.routing import URLRouter
+        from chat.routing import websocket_urlpatterns
+
+        application = URLRouter(websocket_urlpatterns)
+        await sync_to_async(self.presence_backend)()
+        per_room = options['clients']
+
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        clients = []
+        for index, user in enumerate(users):
+            room = rooms[index // per_room]
+            transport = CommunicatorClient(application, f'/ws/chat/{room.id}/', user)
+            await transport.connect()
+            clients.append(BenchClient(index, room.id, transport))
+        # Ulanish boshiga: consumer + communicator + layer/presence holati
+        memory = (tracemalloc.get_traced_memory()[0] - before) / len(clients)
+        tracemalloc.stop()
+
+        try:
+            stats = await self.run(clients, options)
+        finally:
+            await asyncio.gather(*(client.transport.close() for client in clients), return_exceptions=True)
+        return stats.summary(), memory
+
+    async def run_network(self, rooms, users, options):
+        base = options['url'].rstrip('/')
+        origin = base.replace('ws://', 'http://').replace('wss://', 'https://')
+        cookies = await sync_to_async(self.session_cookies)(users)
+        per_room = options['clients']
+
+        clients = []
+        for index, user in enumerate(users):
+            room = rooms[index // per_room]
+            transport = NetworkClient(f'{base}/ws/chat/{room.id}/', cookie=cookies[user.id], origin=origin)
+            await transport.connect()
+            clients.append(BenchClient(index, room.id, transport))
+        try:
+            stats = await self.run(clients, options)
+        finally:
+            await asyncio.gather(*(client.transport.close() for client in clients), return_exceptions=True)
+        return stats.summary()
+
+    @staticmethod
+    def session_cookies(users):
+        """Server bilan bir DB'dan foydalanilganda bench userlar uchun session yaratish"""
+        cookies = {}
+        for user in users:
+            session = SessionStore()
+            session['_auth_user_id'] = str(user.pk)
+            session['_auth_user_backend'] = 'django.contrib.auth.backends.ModelBackend'
+            session['_auth_user_hash'] = user.get_session_auth_hash()
+            session.create()
+            cookies[user.id] = f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+        return cookies
+
+    async def run(self, clients, options):
+        # Ulanishdan keyingi presence/snapshot frame'lari o'lchovga aralashmasin
+        await asyncio.sleep(0.2)
+        return await run_load(
+            clients,
+            messages=options['messages'],
+            interval=options['interval_ms'] / 1000,
+            typing_ratio=options['typing_ratio'],
+            delete_ratio=options['delete_ratio'],
+            drain=options['drain'],
+        )
+
+    def report(self, summary, memory, options):
+        mode = options['url'] or f"process ichida, {options['layer']}" + (
+            '' if options['layer'] == 'inmemory' or options['redis_url'] else ' (fakeredis)'
+        )
+        sent = summary['sent']
+        self.stdout.write(f"Rejim: {mode}")
+        self.stdout.write(f"Ulanishlar: {options['rooms']} xona x {options['clients']} client")
+        self.stdout.write(f"Yuborildi: chat={sent['chat']} typing={sent['typing']} delete={sent['delete']}, xatolar={summary['errors']}")
+        self.stdout.write(f"Yetkazildi: {summary['delivered']}/{summary['expected']} chat frame, jami {summary['received_frames']} frame")
+        self.stdout.write(f"O'tkazuvchanlik: {summary['messages_per_sec']:.0f} msg/s, {summary['deliveries_per_sec']:.0f} yetkazish/s")
+        self.stdout.write(
+            f"Fan-out kechikishi: p50={summary['p50_ms']:.1f} ms  p99={summary['p99_ms']:.1f} ms  o'rtacha={summary['mean_ms']:.1f} ms"
+        )
+        if memory is not None:
+            self.stdout.write(f"Xotira: ~{memory / 1024:.1f} KB / ulanish (tracemalloc)")
+
+        if summary['delivered'] < summary['expected']:
+            self.stdout.write(self.style.WARNING(
+                f"{summary['expected'] - summary['delivered']} ta yetkazish --drain ichida kelmadi"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS('Barcha xabarlar yetkazildi'))
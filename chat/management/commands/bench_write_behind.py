@@ -0,0 +1,64 @@
+import asyncio
+import time
+
+from channels.db import database_sync_to_async
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from chat.buffer import MessageWriteBuffer
+from chat.models import Room, Message, RoomMember
+
+
+class Command(BaseCommand):
+    help = 'Xabar yozish tezligini (messages/sec) oddiy va write-behind rejimda solishtirish'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=2000, help='Har bir rejim uchun xabarlar soni')
+        parser.add_argument('--clients', type=int, default=50, help='Bir vaqtda yozayotgan clientlar soni')
+        parser.add_argument('--batch', type=int, default=100, help='Write-behind batch hajmi')
+        parser.add_argument('--delay-ms', type=float, default=5, help='Write-behind kutish vaqti (ms)')
+
+    def handle(self, *args, **options):
+        user, _ = User.objects.get_or_create(username='bench_writer')
+        room = Room.objects.create(name='bench-write-behind', created_by=user)
+        RoomMember.objects.create(room=room, user=user)
+
+        try:
+            direct = asyncio.run(self.run_direct(room, user, options))
+            buffered = asyncio.run(self.run_buffered(room, user, options))
+        finally:
+            room.delete()
+
+        self.stdout.write(f"{'rejim':<14}{'xabarlar':>10}{'sekund':>10}{'msg/sec':>12}")
+        for name, (count, elapsed) in (('oddiy', direct), ('write-behind', buffered)):
+            self.stdout.write(f"{name:<14}{count:>10}{elapsed:>10.2f}{count / elapsed:>12.0f}")
+        self.stdout.write(self.style.SUCCESS(
+            f'Tezlashish: {(buffered[0] / buffered[1]) / (direct[0] / direct[1]):.1f}x'
+        ))
+
+    async def _run_clients(self, options, send_one):
+        per_client = options['messages'] // options['clients']
+
+        async def client(index):
+            for i in range(per_client):
+                await send_one(f'bench {index}:{i}')
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client(index) for index in range(options['clients'])))
+        return per_client * options['clients'], time.perf_counter() - started
+
+    async def run_direct(self, room, user, options):
+        create = database_sync_to_async(Message.objects.create)
+
+        async def send_one(content):
+            await create(room=room, user=user, content=content, message_type='text')
+
+        return await self._run_clients(options, send_one)
+
+    async def run_buffered(self, room, user, options):
+        buffer = MessageWriteBuffer(max_batch=options['batch'], max_delay=options['delay_ms'] / 1000)
+
+        async def send_one(content):
+            await buffer.save(Message(room=room, user=user, content=content, message_type='text'))
+
+        return await self._run_clients(options, send_one)
@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from chat.models import ChunkedUpload
+from chat.uploads import discard_upload
+
+
+class Command(BaseCommand):
+    help = "Tugallanmagan eski resumable yuklashlarni va ularning .part fayllarini o'chirish"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24, help='Necha soatdan beri yangilanmagan yuklashlar')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        count = 0
+        for upload in ChunkedUpload.objects.filter(updated_at__lt=cutoff):
+            discard_upload(upload)
+            count += 1
+        
+        self.stdout.write(self.style.SUCCESS(f"{count} ta eski yuklash o'chirildi"))
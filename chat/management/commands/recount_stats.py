@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from chat.stats import get_global_stats, recount_stats
+
+
+class Command(BaseCommand):
+    help = "Statistika hisoblagichlarini (xona totallari, userlar soni) aniq qayta hisoblash - masalan, cron orqali"
+
+    def handle(self, *args, **options):
+        changed = recount_stats()
+        stats = get_global_stats()
+        self.stdout.write(
+            f"Userlar: {stats['users']}, xonalar: {stats['rooms']}, "
+            f"xabarlar: {stats['messages']}, fayllar: {stats['file_size']} bytes"
+        )
+        self.stdout.write(self.style.SUCCESS(f"{changed} ta xona totali tuzatildi"))
@@ -0,0 +1,105 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+
+
+MENTION_PATTERN = re.compile(r'@(\w+)')
+
+
+class UsernameCache:
+    """
+    Username mavjudligi uchun chegaralangan LRU/TTL kesh (process ichida).
+
+    Har bir yozuv: username -> (mavjudmi, eskirish vaqti). Hajm `max_size`
+    dan oshsa eng uzoq ishlatilmagan yozuv chiqarib tashlanadi.
+    """
+
+    def __init__(self, max_size=10000, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, usernames):
+        """Keshda bor yozuvlarni {username: mavjudmi} ko'rinishida qaytaradi"""
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for username in usernames:
+                entry = self._data.get(username)
+                if entry is None:
+                    continue
+                exists, expires_at = entry
+                if expires_at <= now:
+                    del self._data[username]
+                    continue
+                self._data.move_to_end(username)
+                found[username] = exists
+        return found
+
+    def set_many(self, values):
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for username, exists in values.items():
+                self._data[username] = (exists, expires_at)
+                self._data.move_to_end(username)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def invalidate(self, username):
+        with self._lock:
+            self._data.pop(username, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+username_cache = UsernameCache(
+    max_size=getattr(settings, 'CHAT_MENTION_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'CHAT_MENTION_CACHE_TTL', 300),
+)
+
+
+def find_mentions(text):
+    """Matndagi barcha @username nomzodlarini to'plam sifatida qaytaradi"""
+    if not text:
+        return set()
+    return set(MENTION_PATTERN.findall(text))
+
+
+def resolve_mentions(usernames):
+    """
+    Qaysi username'lar mavjudligini aniqlash.
+
+    Keshda yo'q username'lar bitta `username__in` so'rovi bilan tekshiriladi
+    va natija (mavjud/mavjud emas) keshga yoziladi. Mavjud username'lar
+    to'plamini qaytaradi.
+    """
+    usernames = set(usernames)
+    if not usernames:
+        return set()
+
+    known = username_cache.get_many(usernames)
+    missing = usernames - known.keys()
+    if missing:
+        existing = set(
+            User.objects.filter(username__in=missing).values_list('username', flat=True)
+        )
+        resolved = {username: username in existing for username in missing}
+        username_cache.set_many(resolved)
+        known.update(resolved)
+
+    return {username for username, exists in known.items() if exists}
+
+
+def prime_mentions(texts):
+    """Bir sahifadagi barcha xabarlar uchun mention'larni oldindan yechib olish"""
+    candidates = set()
+    for text in texts:
+        candidates |= find_mentions(text)
+    return resolve_mentions(candidates)
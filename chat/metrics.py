@@ -0,0 +1,261 @@
+"""
+Prometheus text formatidagi metrikalar (/metrics): WebSocket consumer,
+channel layer, ORM so'rovlari va HTTP view'lar uchun hisoblagich va
+histogrammalar.
+
+Tashqi paketsiz, process ichida: har bir kuzatuv - bitta lock ostida bir
+nechta qo'shish amali, shuning uchun to'liq yuklamada ham yoqib qo'yish
+mumkin. Bir nechta worker process bo'lsa har biri o'z qiymatlarini beradi
+(Prometheus har birini alohida target sifatida yig'adi).
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from django.conf import settings
+
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def header(self):
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            values = list(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}' for labels, value in values]
+
+
+class Gauge(Counter):
+    """
+    Joriy qiymat. `callback` berilsa qiymat scrape paytida olinadi
+    (masalan, navbat uzunligi) - yozish yo'lida hech qanday xarajat yo'q.
+    """
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def dec(self, *labels, amount=1):
+        with self._lock:
+            value = self._values.get(labels, 0) - amount
+            if value == 0 and labels:
+                # Masalan, xonada ulanish qolmadi - seriya yo'qoladi
+                self._values.pop(labels, None)
+            else:
+                self._values[labels] = value
+
+    def set(self, *labels, value):
+        with self._lock:
+            self._values[labels] = value
+
+    def collect(self):
+        if self.callback is not None:
+            for labels, value in self.callback():
+                self.set(*labels, value=value)
+        return super().collect()
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                # [bucket'lar..., +Inf, yig'indi]
+                series = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def collect(self):
+        with self._lock:
+            values = [(labels, list(series)) for labels, series in self._values.items()]
+        lines = []
+        for labels, series in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                lines.append(
+                    f'{self.name}_bucket{_format_labels(self.labelnames, labels, [("le", _format_value(bound))])} {cumulative}'
+                )
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{label_text} {_format_value(series[-1])}')
+            lines.append(f'{self.name}_count{label_text} {cumulative}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            samples = metric.collect()
+            if samples or metric.kind != 'histogram':
+                lines.extend(metric.header())
+                lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def metrics_enabled():
+    return getattr(settings, 'CHAT_METRICS_ENABLED', True)
+
+
+def _sync_queue_depth():
+    """database_sync_to_async navbati (asgiref'ning bitta thread'li executor'i)"""
+    from asgiref.sync import SyncToAsync
+
+    executor = getattr(SyncToAsync, 'single_thread_executor', None)
+    work_queue = getattr(executor, '_work_queue', None)
+    return [((), work_queue.qsize() if work_queue is not None else 0)]
+
+
+def _writer_queue_depth():
+    from .writer import _writers
+
+    return [((alias,), writer._queue.qsize()) for alias, writer in list(_writers.items())]
+
+
+# WebSocket
+WS_CONNECTIONS = Gauge('chat_ws_connections', "Xona bo'yicha ochiq WebSocket ulanishlar", ['room'])
+WS_CONNECTS = Counter('chat_ws_connects_total', "Ulanish urinishlari natija bo'yicha", ['outcome'])
+WS_DISCONNECTS = Counter('chat_ws_disconnects_total', 'Yopilgan ulanishlar')
+WS_HANDLER_SECONDS = Histogram('chat_ws_handler_seconds', "Consumer handler'lari davomiyligi (connect/receive/disconnect, layer event'lari)", ['handler'])
+WS_HANDLER_ERRORS = Counter('chat_ws_handler_errors_total', "Handler'dagi kutilmagan xatolar", ['handler'])
+WS_FRAMES_RECEIVED = Counter('chat_ws_frames_received_total', "Client'dan kelgan frame'lar turi bo'yicha", ['type'])
+WS_FRAMES_SENT = Counter('chat_ws_frames_sent_total', "Client'larga uzatilgan broadcast frame'lar turi bo'yicha", ['type'])
+
+# Channel layer
+LAYER_SECONDS = Histogram('chat_channel_layer_seconds', 'Channel layer chaqiruvlari davomiyligi', ['op'])
+LAYER_ERRORS = Counter('chat_channel_layer_errors_total', 'Channel layer xatolari', ['op'])
+
+# Baza
+DB_QUERY_SECONDS = Histogram('chat_db_query_seconds', "SQL so'rovlar davomiyligi", ['alias', 'statement'])
+DB_WRITE_SECONDS = Histogram('chat_db_write_seconds', "Yozish funksiyalari (navbat kutish bilan) davomiyligi", ['op'])
+DB_SYNC_QUEUE = Gauge('chat_db_sync_queue_depth', 'database_sync_to_async navbatidagi vazifalar', callback=_sync_queue_depth)
+DB_WRITER_QUEUE = Gauge('chat_db_writer_queue_depth', 'Yagona writer navbatidagi vazifalar', ['alias'], callback=_writer_queue_depth)
+
+# HTTP
+HTTP_REQUESTS = Counter('chat_http_requests_total', "HTTP so'rovlar view, metod va status bo'yicha", ['view', 'method', 'status'])
+HTTP_SECONDS = Histogram('chat_http_request_seconds', "HTTP so'rov davomiyligi view bo'yicha", ['view'])
+
+
+def instrument_layer(layer):
+    """Channel layer metodlarini vaqt o'lchovchi o'ram bilan almashtirish (bir marta)"""
+    if layer is None or getattr(layer, '_chat_metrics', False) or not metrics_enabled():
+        return layer
+    for op in ('send', 'group_send', 'group_add', 'group_discard'):
+        method = getattr(layer, op, None)
+        if method is not None:
+            setattr(layer, op, _timed_layer_call(op, method))
+    layer._chat_metrics = True
+    return layer
+
+
+def _timed_layer_call(op, method):
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await method(*args, **kwargs)
+        except Exception:
+            LAYER_ERRORS.inc(op)
+            raise
+        finally:
+            LAYER_SECONDS.observe(time.perf_counter() - started, op)
+    return wrapper
+
+
+def _statement_type(sql):
+    keyword = sql.lstrip()[:6].upper()
+    if keyword in ('SELECT', 'INSERT', 'UPDATE', 'DELETE'):
+        return keyword.lower()
+    return 'other'
+
+
+def query_timer(alias):
+    """connection.execute_wrappers uchun: har bir SQL so'rov vaqti"""
+    def wrapper(execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - started, alias, _statement_type(sql))
+    return wrapper
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """connection_created signali: yangi DB ulanishiga so'rov o'lchovchisini qo'shish"""
+    if metrics_enabled() and not any(getattr(w, '_chat_metrics', False) for w in connection.execute_wrappers):
+        wrapper = query_timer(connection.alias)
+        wrapper._chat_metrics = True
+        # Boshiga: connection.execute_wrapper() context manager'lari oxirgisini pop qiladi
+        connection.execute_wrappers.insert(0, wrapper)
+
+
+def render_metrics():
+    return registry.render()
@@ -0,0 +1,81 @@
+import time
+
+from django.contrib.sessions.middleware import SessionMiddleware
+
+from . import metrics
+from .profiling import discard_profile, finish_profile, profiling_enabled, start_profile
+
+
+class SlidingSessionMiddleware(SessionMiddleware):
+    """
+    SESSION_SAVE_EVERY_REQUEST o'rniga: o'zgarmagan session faqat
+    `refresh_due()` bo'lganda saqlanadi - muddat va cookie shunda uzayadi.
+    """
+
+    def process_response(self, request, response):
+        session = getattr(request, 'session', None)
+        if (
+            session is not None
+            and session.accessed
+            and not session.modified
+            and hasattr(session, 'refresh_due')
+            and not session.is_empty()
+            and session.refresh_due()
+        ):
+            session.modified = True
+        return super().process_response(request, response)
+
+
+class MetricsMiddleware:
+    """HTTP so'rovlar soni va davomiyligi view nomi bo'yicha (/metrics uchun)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not metrics.metrics_enabled():
+            return self.get_response(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match is not None else 'unresolved'
+        metrics.HTTP_SECONDS.observe(time.perf_counter() - started, view)
+        metrics.HTTP_REQUESTS.inc(view, request.method, str(response.status_code))
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    CHAT_PROFILING yoqilganda har bir so'rovning SQL profili: so'rovlar
+    soni, vaqti, takrorlangan shakllar va @query_budget tekshiruvi.
+    Natija Server-Timing header'ida ham (brauzer devtools'da ko'rinadi).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not profiling_enabled():
+            return self.get_response(request)
+        profile, token = start_profile(f'{request.method} {request.path}')
+        request.query_profile = profile
+        try:
+            response = self.get_response(request)
+        except Exception:
+            discard_profile(token)
+            raise
+        finish_profile(profile, token)
+        response['Server-Timing'] = (
+            f'sql;dur={profile.sql_time * 1000:.1f};desc="{profile.count} queries, {profile.writes} writes", '
+            f'app;dur={profile.elapsed * 1000:.1f}'
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = getattr(request, 'query_profile', None)
+        if profile is not None:
+            profile.budget = getattr(view_func, 'query_budget', None)
+            profile.write_budget = getattr(view_func, 'write_budget', None)
+            match = getattr(request, 'resolver_match', None)
+            if match is not None:
+                profile.label = f'{request.method} {match.view_name}'
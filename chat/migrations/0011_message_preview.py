@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0010_fileblob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='preview',
+            field=models.JSONField(blank=True, help_text="Rasm o'lchami va thumbnail fayllari", null=True),
+        ),
+    ]
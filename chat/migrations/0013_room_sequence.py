@@ -0,0 +1,78 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def fill_sequences(apps, schema_editor):
+    """
+    Mavjud xabarlarni xona ichida id tartibida 1, 2, ... deb raqamlash va
+    xonaning last_seq'ini oxirgisiga tenglash - aks holda hammasi seq=0
+    bo'lib qoladi va yangi xabarlar eskilari bilan aralashadi
+    """
+    Room = apps.get_model('chat', 'Room')
+    Message = apps.get_model('chat', 'Message')
+
+    for room_id in Room.objects.values_list('id', flat=True).iterator():
+        batch = []
+        seq = 0
+        for message in Message.objects.filter(room_id=room_id).only('id').order_by('id').iterator():
+            seq += 1
+            message.seq = seq
+            batch.append(message)
+            if len(batch) >= 500:
+                Message.objects.bulk_update(batch, ['seq'])
+                batch = []
+        if batch:
+            Message.objects.bulk_update(batch, ['seq'])
+        if seq:
+            Room.objects.filter(id=room_id).update(last_seq=seq)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0012_message_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.BigIntegerField()),
+                ('event_type', models.CharField(choices=[('edit', 'Tahrir'), ('delete', "O'chirish")], max_length=10)),
+                ('message_id', models.BigIntegerField()),
+                ('data', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['seq'],
+            },
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='seq',
+            field=models.BigIntegerField(default=0, help_text='Xona ichidagi tartib raqami (qayta ulanishda replay uchun)'),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='last_seq',
+            field=models.BigIntegerField(default=0, help_text='Xonadagi oxirgi hodisa tartib raqami'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['room', 'seq'], name='chat_msg_room_seq_idx'),
+        ),
+        migrations.AddField(
+            model_name='roomevent',
+            name='room',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='chat.room'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='roomevent',
+            unique_together={('room', 'seq')},
+        ),
+        migrations.RunPython(fill_sequences, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0013_room_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='roommember',
+            name='last_read_seq',
+            field=models.BigIntegerField(default=0, help_text="Shu seq gacha o'qilgan"),
+        ),
+        migrations.AddField(
+            model_name='roommember',
+            name='unread_count',
+            field=models.PositiveIntegerField(default=0, help_text="O'qilmagan xabarlar (yangi xabarda oshiriladi)"),
+        ),
+    ]
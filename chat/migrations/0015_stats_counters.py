@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:50
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_counters(apps, schema_editor):
+    """Mavjud ma'lumotlar uchun boshlang'ich qiymatlar (keyin signal'lar yuritadi)"""
+    Room = apps.get_model('chat', 'Room')
+    Message = apps.get_model('chat', 'Message')
+    StatCounter = apps.get_model('chat', 'StatCounter')
+    User = apps.get_model('auth', 'User')
+
+    totals = Message.objects.values('room_id').annotate(count=Count('id'), size=Sum('file_size'))
+    for row in totals:
+        Room.objects.filter(id=row['room_id']).update(message_count=row['count'], file_size_total=row['size'] or 0)
+    StatCounter.objects.update_or_create(name='users', defaults={'value': User.objects.count()})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0014_roommember_unread'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatCounter',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='file_size_total',
+            field=models.BigIntegerField(default=0, help_text='Biriktirilgan fayllar hajmi (bytes)'),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='message_count',
+            field=models.PositiveIntegerField(default=0, help_text="Xabarlar soni (signal'lar orqali yuritiladi)"),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
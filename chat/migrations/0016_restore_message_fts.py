@@ -0,0 +1,21 @@
+from importlib import import_module
+
+from django.db import migrations
+
+
+# SQLite'da chat_message jadvalini o'zgartiruvchi migratsiyalar (masalan,
+# 0013 dagi Message.seq) jadvalni qayta yaratadi va FTS triggerlari yo'qoladi.
+# Triggerlar qayta qo'shiladi, indeks to'liq qayta quriladi. Message'ga yangi
+# ustun qo'shilsa, shu migratsiyadagidek create_fts yana chaqirilishi kerak.
+create_fts = import_module('chat.migrations.0012_message_fts').create_fts
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0015_stats_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0016_restore_message_fts'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='roomevent',
+            name='event_type',
+            field=models.CharField(choices=[('edit', 'Tahrir'), ('delete', "O'chirish"), ('preview', 'Preview tayyor')], max_length=10),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0017_roomevent_preview'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chunkedupload',
+            name='locked_until',
+            field=models.DateTimeField(blank=True, help_text="Bo'lak yozilmoqda (shu vaqtgacha band)", null=True),
+        ),
+    ]
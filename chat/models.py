@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
@@ -8,6 +10,9 @@ class Room(models.Model):
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_rooms')
     members = models.ManyToManyField(User, through='RoomMember', blank=True, related_name='user_rooms')
     created_at = models.DateTimeField(default=timezone.now)
+    last_seq = models.BigIntegerField(default=0, help_text="Xonadagi oxirgi hodisa tartib raqami")
+    message_count = models.PositiveIntegerField(default=0, help_text="Xabarlar soni (signal'lar orqali yuritiladi)")
+    file_size_total = models.BigIntegerField(default=0, help_text="Biriktirilgan fayllar hajmi (bytes)")
 
     def __str__(self):
         return self.name
@@ -16,6 +21,31 @@ class Room(models.Model):
         ordering = ['-created_at']
 
 
+class StatCounter(models.Model):
+    """Jadvallarni to'liq COUNT qilmaslik uchun global hisoblagichlar (masalan, 'users')"""
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}={self.value}"
+
+
+class FileBlob(models.Model):
+    """
+    Kontent bo'yicha manzillangan fayl (SHA-256). Bir xil fayl necha marta
+    yuklanmasin diskda bitta nusxa saqlanadi; ref_count - unga bog'langan
+    xabarlar soni, 0 ga tushganda fayl o'chiriladi.
+    """
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    file = models.FileField(max_length=255)
+    size = models.BigIntegerField(default=0, help_text="Fayl hajmi (bytes)")
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.ref_count} ta havola)"
+
+
 class Message(models.Model):
     MESSAGE_TYPES = (
         ('text', 'Text'),
@@ -28,14 +58,33 @@ class Message(models.Model):
     reply_to = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='replies')
     content = models.TextField(blank=True, null=True)
     message_type = models.CharField(max_length=10, choices=MESSAGE_TYPES, default='text')
-    file = models.FileField(upload_to='chat_files/', blank=True, null=True)
+    file = models.FileField(upload_to='chat_files/', max_length=255, blank=True, null=True)
+    file_name = models.CharField(max_length=255, blank=True, help_text="Asl fayl nomi")
+    blob = models.ForeignKey(FileBlob, on_delete=models.SET_NULL, null=True, blank=True, related_name='messages')
     file_size = models.BigIntegerField(default=0, help_text="Fayl hajmi (bytes)")
     file_type = models.CharField(max_length=100, blank=True, null=True, help_text="MIME type")
+    preview = models.JSONField(blank=True, null=True, help_text="Rasm o'lchami va thumbnail fayllari")
+    seq = models.BigIntegerField(default=0, help_text="Xona ichidagi tartib raqami (qayta ulanishda replay uchun)")
     timestamp = models.DateTimeField(default=timezone.now)
+    edited_at = models.DateTimeField(blank=True, null=True)
     
     def __str__(self):
         return f"{self.user.username}: {self.content[:50] if self.content else 'File'}"
     
+    @property
+    def edit_version(self):
+        """Tahrir versiyasi: oxirgi tahrir vaqti (mikrosekund), tahrirlanmagan bo'lsa 0"""
+        if not self.edited_at:
+            return 0
+        return int(self.edited_at.timestamp() * 1000000)
+    
+    @property
+    def display_file_name(self):
+        """Foydalanuvchiga ko'rsatiladigan fayl nomi"""
+        if self.file_name:
+            return self.file_name
+        return self.file.name.split('/')[-1] if self.file else ''
+    
     def get_file_size_display(self):
         """Fayl hajmini human-readable formatda qaytaradi"""
         if self.file_size == 0:
@@ -51,6 +100,38 @@ class Message(models.Model):
     
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            # Xona tarixini keyset pagination bilan o'qish uchun
+            models.Index(fields=['room', 'timestamp', 'id'], name='chat_msg_room_ts_id_idx'),
+            models.Index(fields=['room', 'seq'], name='chat_msg_room_seq_idx'),
+        ]
+
+
+class RoomEvent(models.Model):
+    """
+    Xabar yaratilishidan boshqa hodisalar (tahrir, o'chirish, preview) jurnali.
+    Yangi xabarlarning tartib raqami Message.seq da, hodisalarniki shu
+    yerda - ikkalasi bitta Room.last_seq hisoblagichidan olinadi.
+    """
+    EVENT_TYPES = (
+        ('edit', 'Tahrir'),
+        ('delete', "O'chirish"),
+        ('preview', 'Preview tayyor'),
+    )
+
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='events')
+    seq = models.BigIntegerField()
+    event_type = models.CharField(max_length=10, choices=EVENT_TYPES)
+    message_id = models.BigIntegerField()
+    data = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['seq']
+        unique_together = ('room', 'seq')
+
+    def __str__(self):
+        return f"{self.room_id}#{self.seq} {self.event_type} {self.message_id}"
 
 
 class RoomMember(models.Model):
@@ -58,9 +139,27 @@ class RoomMember(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='room_memberships')
     joined_at = models.DateTimeField(default=timezone.now)
     is_admin = models.BooleanField(default=False)
+    last_read_seq = models.BigIntegerField(default=0, help_text="Shu seq gacha o'qilgan")
+    unread_count = models.PositiveIntegerField(default=0, help_text="O'qilmagan xabarlar (yangi xabarda oshiriladi)")
     
     class Meta:
         unique_together = ('room', 'user')
     
     def __str__(self):
-        return f"{self.user.username} in {self.room.name}"
\ No newline at end of file
+        return f"{self.user.username} in {self.room.name}"
+
+
+class ChunkedUpload(models.Model):
+    """Bo'laklab (resumable) yuklanayotgan fayl holati; ma'lumot diskdagi .part faylda"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='uploads')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chunked_uploads')
+    file_name = models.CharField(max_length=255)
+    file_size = models.BigIntegerField(help_text="Fayl hajmi (bytes)")
+    offset = models.BigIntegerField(default=0, help_text="Qabul qilingan bytes")
+    locked_until = models.DateTimeField(null=True, blank=True, help_text="Bo'lak yozilmoqda (shu vaqtgacha band)")
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.file_name} ({self.offset}/{self.file_size})"
@@ -0,0 +1,257 @@
+import asyncio
+import time
+import uuid
+from collections import Counter
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .broadcast import room_group_name, frame_event
+
+
+class BasePresenceBackend:
+    """
+    Online holat saqlovchi backend interfeysi.
+
+    Har bir WebSocket ulanish alohida yozuv (connection_id) sifatida
+    saqlanadi va `ttl` sekund ichida heartbeat kelmasa eskiradi. User bir
+    nechta tab'da ochiq bo'lsa, u ulanishlar soni (reference count) bilan
+    hisoblanadi.
+    """
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+
+    async def add(self, room_id, username, connection_id):
+        raise NotImplementedError
+
+    async def heartbeat(self, room_id, username, connection_id):
+        await self.add(room_id, username, connection_id)
+
+    async def remove(self, room_id, username, connection_id):
+        raise NotImplementedError
+
+    async def online_users(self, room_id):
+        """{username: ulanishlar soni} qaytaradi"""
+        raise NotImplementedError
+
+    async def claim_publisher(self, room_id, owner, lease):
+        """
+        Xona diff'larini yuboruvchi worker'ni tanlash: lease bo'sh yoki
+        allaqachon `owner`niki bo'lsa uni `lease` sekundga olib/uzaytirib
+        True qaytaradi
+        """
+        raise NotImplementedError
+
+    async def release_publisher(self, room_id, owner):
+        """`owner` lease'ni ushlab turgan bo'lsa, uni bo'shatish"""
+        raise NotImplementedError
+
+
+class InMemoryPresenceBackend(BasePresenceBackend):
+    """Development uchun: holat faqat joriy process xotirasida"""
+
+    def __init__(self, ttl=60):
+        super().__init__(ttl)
+        self._rooms = {}
+        self._publishers = {}
+
+    async def add(self, room_id, username, connection_id):
+        self._rooms.setdefault(room_id, {})[connection_id] = (username, time.time() + self.ttl)
+
+    async def remove(self, room_id, username, connection_id):
+        connections = self._rooms.get(room_id, {})
+        connections.pop(connection_id, None)
+        if not connections:
+            self._rooms.pop(room_id, None)
+
+    async def online_users(self, room_id):
+        now = time.time()
+        connections = self._rooms.get(room_id, {})
+        for connection_id in [key for key, (_, expires_at) in connections.items() if expires_at <= now]:
+            del connections[connection_id]
+        return Counter(username for username, _ in connections.values())
+
+    async def claim_publisher(self, room_id, owner, lease):
+        now = time.time()
+        holder, expires_at = self._publishers.get(room_id, (None, 0))
+        if holder not in (None, owner) and expires_at > now:
+            return False
+        self._publishers[room_id] = (owner, now + lease)
+        return True
+
+    async def release_publisher(self, room_id, owner):
+        if self._publishers.get(room_id, (None, 0))[0] == owner:
+            del self._publishers[room_id]
+
+
+class RedisPresenceBackend(BasePresenceBackend):
+    """
+    Production uchun: barcha worker'lar uchun umumiy holat Redis'da.
+    Har bir xona - sorted set, a'zo "username|connection_id", score -
+    eskirish vaqti. Diff yuboruvchi worker - "<prefix>publisher:<xona>"
+    kalitidagi lease egasi.
+    """
+
+    # Lease bo'sh bo'lsa olish, o'zimizniki bo'lsa uzaytirish - bitta atomik qadamda
+    CLAIM_SCRIPT = """
+        local holder = redis.call('GET', KEYS[1])
+        if holder and holder ~= ARGV[1] then
+            return 0
+        end
+        redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+        return 1
+    """
+    RELEASE_SCRIPT = """
+        if redis.call('GET', KEYS[1]) == ARGV[1] then
+            return redis.call('DEL', KEYS[1])
+        end
+        return 0
+    """
+
+    def __init__(self, ttl=60, url='redis://127.0.0.1:6379/0', prefix='chat:presence:'):
+        super().__init__(ttl)
+        import redis.asyncio as redis
+
+        self.prefix = prefix
+        self.redis = redis.from_url(url)
+        self._claim = self.redis.register_script(self.CLAIM_SCRIPT)
+        self._release = self.redis.register_script(self.RELEASE_SCRIPT)
+
+    def _key(self, room_id):
+        return f'{self.prefix}{room_id}'
+
+    def _publisher_key(self, room_id):
+        return f'{self.prefix}publisher:{room_id}'
+
+    async def add(self, room_id, username, connection_id):
+        key = self._key(room_id)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.zadd(key, {f'{username}|{connection_id}': time.time() + self.ttl})
+            pipe.expire(key, self.ttl * 2)
+            await pipe.execute()
+
+    async def remove(self, room_id, username, connection_id):
+        await self.redis.zrem(self._key(room_id), f'{username}|{connection_id}')
+
+    async def online_users(self, room_id):
+        key = self._key(room_id)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.zremrangebyscore(key, '-inf', time.time())
+            pipe.zrange(key, 0, -1)
+            _, members = await pipe.execute()
+        return Counter(member.decode().rsplit('|', 1)[0] for member in members)
+
+    async def claim_publisher(self, room_id, owner, lease):
+        claimed = await self._claim(keys=[self._publisher_key(room_id)], args=[owner, int(lease * 1000)])
+        return bool(claimed)
+
+    async def release_publisher(self, room_id, owner):
+        await self._release(keys=[self._publisher_key(room_id)], args=[owner])
+
+
+class PresenceService:
+    """
+    Worker ichidagi presence boshqaruvchisi.
+
+    Connect/disconnect darhol broadcast qilinmaydi: shu worker'da ulanishi
+    bor har bir xona uchun har `interval` sekundda online ro'yxat
+    olinadi va oldingisidan farqi bo'lsa bitta `presence_diff` yuboriladi.
+    Qisqa uzilish va qayta ulanish bitta interval ichida bo'lsa, hech
+    qanday diff chiqmaydi.
+
+    Ro'yxat backend'da umumiy, shuning uchun diff'ni xonaga faqat publisher
+    lease'ini ushlab turgan bitta worker yuboradi. Qolganlari ham oxirgi
+    ko'rgan ro'yxatni yangilab boradi - lease ularga o'tsa, faqat yangi
+    o'zgarishlar yuboriladi. Lease `interval`dan uzoqroq: egasi o'lsa,
+    bir necha interval ichida boshqa worker oladi.
+    """
+
+    def __init__(self, backend, interval=2.0):
+        self.backend = backend
+        self.interval = interval
+        self.lease = interval * 3
+        self.owner = uuid.uuid4().hex
+        self._local = Counter()
+        self._published = {}
+        self._tasks = {}
+
+    async def join(self, room_id, username, connection_id):
+        await self.backend.add(room_id, username, connection_id)
+        self._local[room_id] += 1
+        if room_id not in self._tasks:
+            self._tasks[room_id] = asyncio.ensure_future(self._run(room_id))
+
+    async def heartbeat(self, room_id, username, connection_id):
+        await self.backend.heartbeat(room_id, username, connection_id)
+
+    async def leave(self, room_id, username, connection_id):
+        await self.backend.remove(room_id, username, connection_id)
+        self._local[room_id] -= 1
+
+    async def snapshot(self, room_id):
+        return sorted(await self.backend.online_users(room_id))
+
+    async def _run(self, room_id):
+        try:
+            while True:
+                await asyncio.sleep(self.interval)
+                await self.tick(room_id)
+                if self._local[room_id] <= 0:
+                    # Bu worker'da xonaga ulanish qolmadi - lease boshqasiga qolsin
+                    del self._local[room_id]
+                    self._published.pop(room_id, None)
+                    await self.backend.release_publisher(room_id, self.owner)
+                    break
+        finally:
+            self._tasks.pop(room_id, None)
+
+    async def tick(self, room_id):
+        """Bitta interval: online ro'yxat farqini (publisher bo'lsak) yuborish"""
+        online = set(await self.backend.online_users(room_id))
+        previous = self._published.get(room_id, set())
+        self._published[room_id] = online
+        joined, left = online - previous, previous - online
+        if (joined or left) and await self.backend.claim_publisher(room_id, self.owner, self.lease):
+            await self.publish(room_id, joined, left, len(online))
+
+    async def publish(self, room_id, joined, left, online_count):
+        channel_layer = get_channel_layer()
+        await channel_layer.group_send(
+            room_group_name(room_id),
+            frame_event(
+                'presence_diff',
+                joined=sorted(joined),
+                left=sorted(left),
+                online_count=online_count,
+            ),
+        )
+
+
+_backend = None
+_services = {}
+
+
+def get_presence_backend():
+    global _backend
+    if _backend is None:
+        backend_class = import_string(
+            getattr(settings, 'CHAT_PRESENCE_BACKEND', 'chat.presence.InMemoryPresenceBackend')
+        )
+        _backend = backend_class(**getattr(settings, 'CHAT_PRESENCE_OPTIONS', {}))
+    return _backend
+
+
+def get_presence_service():
+    """Joriy event loop uchun (worker process'da bitta) presence service"""
+    loop = asyncio.get_running_loop()
+    service = _services.get(loop)
+    if service is None:
+        service = PresenceService(
+            get_presence_backend(),
+            interval=getattr(settings, 'CHAT_PRESENCE_INTERVAL_MS', 2000) / 1000,
+        )
+        _services.clear()
+        _services[loop] = service
+    return service
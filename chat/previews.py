@@ -0,0 +1,116 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from .broadcast import send_frame_to_room
+from .downloads import signed_file_url
+from .imaging import generate_preview
+from .models import Message
+from .writer import submit_write
+
+
+PREVIEW_PREFIX = 'chat_files/previews'
+PREVIEW_TYPES = ('image/jpeg', 'image/png', 'image/gif', 'image/webp', 'image/bmp')
+
+_executor = None
+
+
+def preview_names(key):
+    """Preview fayllari nomi: CAS hash bo'yicha, shuning uchun bir xil rasm uchun bir marta yaratiladi"""
+    base = f'{PREVIEW_PREFIX}/{key[:2]}/{key}'
+    return f'{base}.jpg', f'{base}.webp'
+
+
+def get_preview_executor():
+    global _executor
+    if _executor is None:
+        # spawn: worker'lar server process'ining thread/event loop holatini meros olmaydi
+        _executor = ProcessPoolExecutor(
+            max_workers=getattr(settings, 'CHAT_PREVIEW_WORKERS', 2),
+            mp_context=multiprocessing.get_context('spawn'),
+        )
+    return _executor
+
+
+def wants_preview(message):
+    return bool(message.file) and (message.file_type or '') in PREVIEW_TYPES
+
+
+def schedule_preview(message):
+    """
+    Rasm xabari uchun preview'ni transaction commit bo'lgach process pool'da
+    yaratishni rejalashtirish. So'rov thread'i kutib qolmaydi.
+    """
+    if not wants_preview(message):
+        return
+
+    key = message.blob_id or f'm{message.id}'
+    thumb_name, webp_name = preview_names(key)
+    args = (
+        message.file.path,
+        str(settings.MEDIA_ROOT),
+        thumb_name,
+        webp_name,
+        getattr(settings, 'CHAT_PREVIEW_MAX_SIZE', 320),
+        getattr(settings, 'CHAT_PREVIEW_QUALITY', 80),
+    )
+    callback = partial(preview_done, message.id, message.room_id)
+    transaction.on_commit(
+        lambda: get_preview_executor().submit(generate_preview, *args).add_done_callback(callback)
+    )
+
+
+def preview_done(message_id, room_id, future):
+    """
+    Process pool callback'i (pool'ning ichki thread'ida): natija yagona
+    writer navbatiga topshiriladi, bu yerda DB ishi qilinmaydi.
+    """
+    try:
+        preview = future.result()
+    except Exception:
+        # Rasm buzilgan yoki Pillow o'qiy olmaydi - xabar oddiy fayl bo'lib qoladi
+        return
+    submit_write(apply_preview, message_id, room_id, preview)
+
+
+def apply_preview(message_id, room_id, preview):
+    """
+    Writer thread'ida: xabarni 'image' qilib belgilash va hodisani jurnalga
+    yozish (qayta ulangan client preview'ni replay'da oladi), commit'dan
+    keyin xonaga preview_ready yuboriladi
+    """
+    # Circular import'dan qochish uchun (events -> rendering -> previews)
+    from .events import record_event
+
+    if not Message.objects.filter(id=message_id).update(message_type='image', preview=preview):
+        return None
+    seq = record_event(room_id, 'preview', message_id)
+    send_frame_to_room(room_id, 'preview_ready', message_id=message_id, preview=preview_urls(message_id, preview), seq=seq)
+    return seq
+
+
+def preview_urls(message_id, preview):
+    """
+    Client uchun preview ma'lumotlari (fayl nomlari o'rniga URL'lar).
+    Thumbnail'lar ham xabar fayli kabi imzolangan yuklash yo'lidan beriladi -
+    /media/ DEBUG'siz ochiq emas, ochiq bo'lsa ruxsat tekshiruvini chetlab o'tardi.
+    """
+    if not preview:
+        return None
+    return {
+        'width': preview['width'],
+        'height': preview['height'],
+        'thumb_width': preview['thumb_width'],
+        'thumb_height': preview['thumb_height'],
+        'thumb_url': signed_file_url(message_id, preview['thumb'], 'image/jpeg'),
+        'webp_url': signed_file_url(message_id, preview['webp'], 'image/webp'),
+    }
+
+
+def delete_previews(key):
+    for name in preview_names(key):
+        default_storage.delete(name)
@@ -0,0 +1,208 @@
+"""
+So'rov (HTTP yoki WebSocket event) bo'yicha SQL profili: so'rovlar soni,
+umumiy SQL vaqti va takrorlangan so'rov shakllari (N+1 belgisi).
+
+Har bir DB ulanishiga bitta doimiy execute wrapper qo'yiladi; u faqat
+ContextVar'da faol profil bo'lsa yozadi. asgiref sync_to_async context'ni
+thread'ga o'tkazadi, shuning uchun database_sync_to_async ichidagi
+so'rovlar ham consumer event'iga yoziladi. Yozuvlar (run_write/database_write)
+qaysi thread'da bajarilmasin, ularni yuborgan so'rov profiliga alohida
+hisob (`writes`) bo'lib tushadi. Tranzaksiya boshqaruvi (SAVEPOINT/RELEASE)
+sanalmaydi - yozuv joyida yoki writer batch'ida bajarilishidan qat'i nazar
+hisob bir xil.
+
+View'lar uchun `@query_budget(n, writes=m)`, consumer frame'lari uchun
+`ChatConsumer.query_budgets` / `write_budgets`: CHAT_QUERY_BUDGET_STRICT
+yoqilgan bo'lsa (testlar) byudjetdan oshish QueryBudgetExceeded bilan
+yiqiladi, aks holda log'ga yoziladi.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+_active_profile = ContextVar('chat_query_profile', default=None)
+_write_mode = ContextVar('chat_query_profile_writes', default=False)
+
+_NUMBER_RE = re.compile(r'\b\d+\b')
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_IN_LIST_RE = re.compile(r'\bIN \((?:%s|\?|\d+)(?:, ?(?:%s|\?|\d+))*\)', re.IGNORECASE)
+_SAVEPOINT_RE = re.compile(r'^\s*(?:SAVEPOINT|RELEASE SAVEPOINT|ROLLBACK TO SAVEPOINT)\b', re.IGNORECASE)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Byudjetdan ko'p so'rov - testlar shu xato bilan yiqiladi"""
+
+
+def query_shape(sql):
+    """Parametrlarsiz so'rov shakli: raqamlar, satrlar va IN (...) ro'yxatlari umumlashtiriladi"""
+    shape = _STRING_RE.sub('?', sql)
+    shape = _IN_LIST_RE.sub('IN (...)', shape)
+    return _NUMBER_RE.sub('?', shape)
+
+
+class QueryProfile:
+    def __init__(self, label, budget=None, write_budget=None):
+        self.label = label
+        self.budget = budget
+        self.write_budget = write_budget
+        self.count = 0
+        self.writes = 0
+        self.sql_time = 0.0
+        self.shapes = Counter()
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def record(self, sql, duration, write=False):
+        if write:
+            self.writes += 1
+        else:
+            self.count += 1
+        self.sql_time += duration
+        self.shapes[query_shape(sql)] += 1
+
+    def duplicates(self, limit=3):
+        """Eng ko'p takrorlangan shakllar: [(soni, shakl), ...]"""
+        return [(count, shape) for shape, count in self.shapes.most_common(limit) if count > 1]
+
+    def over_budget(self):
+        return (
+            (self.budget is not None and self.count > self.budget)
+            or (self.write_budget is not None and self.writes > self.write_budget)
+        )
+
+    def summary(self):
+        text = (
+            f"{self.label}: {self.count} ta so'rov, {self.writes} ta yozuv, "
+            f"SQL {self.sql_time * 1000:.1f} ms, jami {self.elapsed * 1000:.1f} ms"
+        )
+        if self.budget is not None or self.write_budget is not None:
+            text += f" (byudjet {self.budget}, yozuvlar {self.write_budget})"
+        for count, shape in self.duplicates():
+            text += f"\n  {count}x {shape[:200]}"
+        return text
+
+
+def profiling_enabled():
+    return getattr(settings, 'CHAT_PROFILING', False)
+
+
+def budget_strict():
+    return getattr(settings, 'CHAT_QUERY_BUDGET_STRICT', False)
+
+
+def _profile_wrapper(execute, sql, params, many, context):
+    profile = _active_profile.get()
+    if profile is None or _SAVEPOINT_RE.match(sql):
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.record(sql, time.perf_counter() - started, write=_write_mode.get())
+
+
+def install_profiler(sender, connection, **kwargs):
+    """connection_created signali: profil wrapper'ini (faqat bir marta) qo'shish"""
+    if _profile_wrapper not in connection.execute_wrappers:
+        # Boshiga: connection.execute_wrapper() context manager'lari oxirgisini pop qiladi
+        connection.execute_wrappers.insert(0, _profile_wrapper)
+
+
+def start_profile(label, budget=None, write_budget=None):
+    """Joriy context uchun profilni boshlash; finish_profile() ga token bilan qaytariladi"""
+    profile = QueryProfile(label, budget, write_budget)
+    return profile, _active_profile.set(profile)
+
+
+def finish_profile(profile, token):
+    """
+    Profilni yopish: chegaradan oshganlar log'ga yoziladi, byudjetdan
+    oshish strict rejimda QueryBudgetExceeded.
+    """
+    _active_profile.reset(token)
+    profile.elapsed = time.perf_counter() - profile.started
+
+    if profile.over_budget():
+        if budget_strict():
+            raise QueryBudgetExceeded(profile.summary())
+        logger.warning("Query byudjeti oshdi - %s", profile.summary())
+    elif (
+        profile.count + profile.writes >= getattr(settings, 'CHAT_PROFILING_LOG_QUERIES', 20)
+        or profile.sql_time * 1000 >= getattr(settings, 'CHAT_PROFILING_LOG_SQL_MS', 100)
+        or any(count >= getattr(settings, 'CHAT_PROFILING_LOG_DUPLICATES', 5) for count, _ in profile.duplicates(1))
+    ):
+        logger.warning("Og'ir so'rov - %s", profile.summary())
+    return profile
+
+
+def discard_profile(token):
+    """Xato bilan tugagan so'rov: profil tekshirilmasdan yopiladi"""
+    _active_profile.reset(token)
+
+
+@contextmanager
+def profiled(label, budget=None):
+    """start/finish_profile qobig'i; CHAT_PROFILING o'chiq bo'lsa hech narsa qilmaydi"""
+    if not profiling_enabled():
+        yield None
+        return
+    profile, token = start_profile(label, budget)
+    try:
+        yield profile
+    except BaseException:
+        discard_profile(token)
+        raise
+    finish_profile(profile, token)
+
+
+def current_profile():
+    return _active_profile.get()
+
+
+@contextmanager
+def profile_writes(profile):
+    """
+    Ichidagi so'rovlar `profile`ga yozuv sifatida tushadi. Writer thread'i
+    vazifani yuborgan so'rov profilini shu bilan o'rnatadi, run_write joyida
+    bajarganda ham hisob bir xil.
+    """
+    profile_token = _active_profile.set(profile)
+    mode_token = _write_mode.set(True)
+    try:
+        yield
+    finally:
+        _write_mode.reset(mode_token)
+        _active_profile.reset(profile_token)
+
+
+def annotate_profile(label=None, budget=None, write_budget=None):
+    """Joriy profilga nom yoki byudjet berish (masalan, frame turi ma'lum bo'lganda)"""
+    profile = _active_profile.get()
+    if profile is not None:
+        if label is not None:
+            profile.label = label
+        if budget is not None:
+            profile.budget = budget
+        if write_budget is not None:
+            profile.write_budget = write_budget
+
+
+def query_budget(max_queries, writes=None):
+    """
+    View uchun ruxsat etilgan SQL so'rovlar (o'qishlar) va yozuvlar soni
+    (ProfilingMiddleware tekshiradi). login_required kabi wraps ishlatuvchi
+    decorator'lar atributni o'tkazadi, shuning uchun tartib muhim emas.
+    """
+    def decorator(view_func):
+        view_func.query_budget = max_queries
+        view_func.write_budget = writes
+        return view_func
+    return decorator
@@ -0,0 +1,109 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .downloads import download_url
+from .mentions import prime_mentions
+from .previews import preview_urls
+
+
+def message_html_key(message):
+    """Kesh kaliti: xabar id va tahrir versiyasi bo'yicha"""
+    return f'chat:msg_html:{message.id}:{message.edit_version}'
+
+
+def render_message_html(content):
+    """
+    Xabar matnini HTML'ga aylantirish (format_message bilan bir xil qoidalar).
+    Matn avval escape qilinadi, shuning uchun foydalanuvchi HTML'i ishlamaydi.
+    """
+    # Circular import'dan qochish uchun shu yerda import qilinadi
+    from .templatetags.chat_tags import format_message
+
+    if not content:
+        return ''
+    return str(format_message(escape(content)))
+
+
+def cache_message_html(message):
+    """Xabar yaratilganda yoki tahrirlanganda HTML'ni oldindan hisoblab keshga yozish"""
+    html = render_message_html(message.content)
+    cache.set(message_html_key(message), html, getattr(settings, 'CHAT_MESSAGE_HTML_CACHE_TIMEOUT', 604800))
+    message.rendered_html = mark_safe(html)
+    return html
+
+
+def invalidate_message_html(message):
+    cache.delete(message_html_key(message))
+
+
+def attach_rendered_html(messages):
+    """
+    Sahifadagi xabarlarga `rendered_html` atributini qo'shish.
+
+    Tayyor fragmentlar keshdan bitta `get_many` bilan olinadi; faqat keshda
+    yo'qlari render qilinadi (ularning mention'lari bitta so'rovda yechiladi).
+    """
+    messages = [message for message in messages if message.content]
+    if not messages:
+        return
+
+    keys = {message_html_key(message): message for message in messages}
+    cached = cache.get_many(list(keys))
+
+    missing = []
+    for key, message in keys.items():
+        if key in cached:
+            message.rendered_html = mark_safe(cached[key])
+        else:
+            missing.append(message)
+
+    if missing:
+        cache_messages_html(missing)
+
+
+def cache_messages_html(messages):
+    """
+    Bir nechta xabar HTML'ini render qilib bitta `set_many` bilan keshlash
+    (mention'lar bitta so'rovda yechiladi) - sahifa va write-behind batch uchun.
+    """
+    messages = [message for message in messages if message.content]
+    if not messages:
+        return
+    prime_mentions(message.content for message in messages)
+    fresh = {}
+    for message in messages:
+        html = render_message_html(message.content)
+        message.rendered_html = mark_safe(html)
+        fresh[message_html_key(message)] = html
+    cache.set_many(fresh, getattr(settings, 'CHAT_MESSAGE_HTML_CACHE_TIMEOUT', 604800))
+
+
+def message_payload(message):
+    """WebSocket frame'lari va JSON javoblar uchun xabar ma'lumotlari"""
+    html = getattr(message, 'rendered_html', None)
+    if html is None and message.content:
+        html = cache_message_html(message)
+    
+    payload = {
+        'message_id': message.id,
+        'user': message.user.username,
+        'user_id': message.user_id,
+        'message': message.content or '',
+        'html': str(html or ''),
+        'timestamp': message.timestamp.strftime('%H:%M'),
+        'reply_to': message.reply_to_id,
+        'file': None,
+        'preview': preview_urls(message.id, message.preview),
+        'seq': message.seq,
+    }
+    if message.file:
+        payload['file'] = {
+            'name': message.display_file_name,
+            'size': message.file_size,
+            'size_display': message.get_file_size_display(),
+            'type': message.file_type,
+            'url': download_url(message),
+        }
+    return payload
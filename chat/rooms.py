@@ -0,0 +1,86 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+
+from .models import Room, Message, RoomMember
+from .storage import release_message_file
+from .unread import get_unread_counts
+
+
+ROOM_LIST_VERSION_KEY = 'chat:room_list:version'
+
+
+def get_room_list_version():
+    """Xonalar ro'yxati keshining joriy versiyasi"""
+    version = cache.get(ROOM_LIST_VERSION_KEY)
+    if version is None:
+        version = 1
+        cache.add(ROOM_LIST_VERSION_KEY, version, None)
+    return version
+
+
+def invalidate_room_list():
+    """Barcha userlar uchun xonalar ro'yxati keshini eskirgan deb belgilash"""
+    try:
+        cache.incr(ROOM_LIST_VERSION_KEY)
+    except ValueError:
+        cache.set(ROOM_LIST_VERSION_KEY, 1, None)
+
+
+def build_room_list():
+    """
+    Xonalarni bitta so'rovda olish: a'zolar soni, yaratuvchi va
+    oxirgi xabar ma'lumotlari annotate qilinadi
+    """
+    last_message = Message.objects.filter(room=OuterRef('pk')).order_by('-timestamp', '-id')
+    return (
+        Room.objects
+        .select_related('created_by')
+        .annotate(
+            member_count=Count('room_members'),
+            last_message_at=Subquery(last_message.values('timestamp')[:1]),
+            last_message_content=Subquery(last_message.values('content')[:1]),
+            last_message_user=Subquery(last_message.values('user__username')[:1]),
+        )
+        .order_by('-created_at')
+    )
+
+
+def get_room_list(user):
+    """
+    Sidebar va index uchun xonalar ro'yxati. Ro'yxat userga bog'liq emas -
+    har bir versiya uchun bitta kesh yozuvi, userga xos faqat o'qilmaganlar
+    """
+    key = f'chat:room_list:{get_room_list_version()}'
+    rooms = cache.get(key)
+    if rooms is None:
+        rooms = list(build_room_list())
+        cache.set(key, rooms, getattr(settings, 'CHAT_ROOM_LIST_CACHE_TIMEOUT', 300))
+    # O'qilmaganlar tez-tez o'zgaradi - keshga kirmaydi, alohida bitta so'rov
+    unread = get_unread_counts(user)
+    for room in rooms:
+        room.unread_count = unread.get(room.id, 0)
+    return rooms
+
+
+def create_room_with_owner(name, user):
+    """Yangi xona va yaratuvchisining a'zoligi - bitta tranzaksiyada (writer orqali)"""
+    with transaction.atomic():
+        room = Room.objects.create(name=name, created_by=user)
+        RoomMember.objects.create(room=room, user=user)
+    return room
+
+
+def delete_room_with_files(room_id):
+    """
+    Xonani o'chirish (writer orqali). CAS blob'lar cascade'da post_delete
+    signali orqali bo'shatiladi, bu yerda faqat eski (CAS'dan oldingi) fayllar.
+    """
+    room = Room.objects.filter(id=room_id).first()
+    if room is None:
+        return
+    with transaction.atomic():
+        for message in room.messages.filter(blob__isnull=True).exclude(file=''):
+            release_message_file(message)
+        room.delete()
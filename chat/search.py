@@ -0,0 +1,136 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.utils.html import escape
+
+from .models import Message
+
+
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+SNIPPET_LENGTH = 160
+
+
+def get_search_page_size(value=None):
+    default = getattr(settings, 'CHAT_SEARCH_PAGE_SIZE', 20)
+    try:
+        size = int(value) if value else default
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, 100))
+
+
+def clamp_search_page(page, limit=None):
+    """Sahifa raqami 1 dan rank oynasidagi oxirgi sahifagacha"""
+    window = getattr(settings, 'CHAT_SEARCH_RANK_WINDOW', 2000)
+    last_page = max(1, -(-window // get_search_page_size(limit)))
+    return max(1, min(page, last_page))
+
+
+def query_tokens(text):
+    return TOKEN_PATTERN.findall(text or '')[:10]
+
+
+def build_match_query(tokens):
+    """
+    So'zlarni xavfsiz FTS5 so'roviga aylantirish: har bir so'z qo'shtirnoqda
+    (operator sifatida talqin qilinmaydi), oxirgisi prefix - yozilayotgan
+    so'z ham topiladi
+    """
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def highlight_snippet(content, tokens):
+    """
+    Xabar matnidan topilgan so'z atrofidagi qismni olib, so'zlarni <mark>
+    bilan belgilash. Matn escape qilinadi, faqat <mark> HTML bo'ladi.
+    """
+    content = content or ''
+    words = [re.escape(token) + r'\b' for token in tokens[:-1]] + [re.escape(tokens[-1])]
+    pattern = re.compile(r'\b(?:' + '|'.join(words) + r')\w*', re.IGNORECASE | re.UNICODE)
+
+    first = pattern.search(content)
+    start = max(0, first.start() - SNIPPET_LENGTH // 4) if first else 0
+    fragment = content[start:start + SNIPPET_LENGTH]
+
+    parts = []
+    position = 0
+    for found in pattern.finditer(fragment):
+        parts.append(escape(fragment[position:found.start()]))
+        parts.append(f'<mark>{escape(found.group())}</mark>')
+        position = found.end()
+    parts.append(escape(fragment[position:]))
+
+    prefix = '…' if start > 0 else ''
+    suffix = '…' if start + SNIPPET_LENGTH < len(content) else ''
+    return prefix + ''.join(parts) + suffix
+
+
+def search_messages(user, text, room_id=None, page=1, limit=None):
+    """
+    User a'zo bo'lgan xonalardagi xabarlarni qidirish.
+
+    SQLite'da FTS5 indeksidan olinadi: eng yangi `CHAT_SEARCH_RANK_WINDOW`
+    ta mos xabar indeks tartibida (rowid DESC) o'qiladi va faqat ular bm25
+    bo'yicha saralanadi - juda ko'p xabarda uchraydigan so'zlar ham butun
+    jadvalni saralashga olib kelmaydi. Natija: (xabarlar, has_more),
+    xabarlarga `snippet` (HTML) atributi qo'shiladi.
+    """
+    limit = get_search_page_size(limit)
+    offset = (max(page, 1) - 1) * limit
+    tokens = query_tokens(text)
+    if not tokens:
+        return [], False
+
+    if connection.vendor != 'sqlite':
+        return _search_fallback(user, text, tokens, room_id, offset, limit)
+
+    sql = f"""
+        SELECT f.rowid, f.rank
+        FROM chat_message_fts f
+        JOIN chat_message m ON m.id = f.rowid
+        WHERE chat_message_fts MATCH %s
+          AND m.room_id IN (SELECT room_id FROM chat_roommember WHERE user_id = %s)
+          {'AND m.room_id = %s' if room_id else ''}
+        ORDER BY f.rowid DESC
+        LIMIT %s
+    """
+    params = [build_match_query(tokens), user.id]
+    if room_id:
+        params.append(room_id)
+    params.append(getattr(settings, 'CHAT_SEARCH_RANK_WINDOW', 2000))
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        candidates = cursor.fetchall()
+
+    # bm25: kichik qiymat - yaxshiroq moslik; teng bo'lsa yangisi oldin
+    candidates.sort(key=lambda row: (row[1], -row[0]))
+    page_ids = [row[0] for row in candidates[offset:offset + limit]]
+    has_more = len(candidates) > offset + limit
+
+    found = Message.objects.select_related('user', 'room').in_bulk(page_ids)
+    results = []
+    for message_id in page_ids:
+        message = found.get(message_id)
+        if message is not None:
+            message.snippet = highlight_snippet(message.content, tokens)
+            results.append(message)
+    return results, has_more
+
+
+def _search_fallback(user, text, tokens, room_id, offset, limit):
+    """FTS5 bo'lmagan DB uchun oddiy (sekin) qidiruv"""
+    queryset = Message.objects.filter(
+        room__room_members__user=user,
+        content__icontains=text.strip(),
+    ).select_related('user', 'room').order_by('-timestamp')
+    if room_id:
+        queryset = queryset.filter(room_id=room_id)
+
+    results = list(queryset[offset:offset + limit + 1])
+    for message in results:
+        message.snippet = highlight_snippet(message.content, tokens)
+    return results[:limit], len(results) > limit
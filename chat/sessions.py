@@ -0,0 +1,34 @@
+"""
+Kam yoziladigan session engine: cached_db (o'qish keshdan) + sliding
+expiry. Session faqat o'zgarganda yoki umrining CHAT_SESSION_REFRESH_FRACTION
+qismi o'tganda saqlanadi (qarang: chat.middleware.SlidingSessionMiddleware),
+shuning uchun oddiy sahifa ko'rishlar bazaga yozmaydi.
+
+Bir nechta process bo'lsa CACHES umumiy (masalan, Redis) bo'lishi kerak,
+aks holda logout boshqa process keshida kechikib ko'rinadi.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+
+from .writer import run_write
+
+
+REFRESHED_KEY = '_session_refreshed'
+
+
+class SessionStore(CachedDBStore):
+    def refresh_due(self):
+        """Muddatni uzaytirish (va cookie'ni yangilash) vaqti keldimi"""
+        refreshed = self.get(REFRESHED_KEY)
+        if refreshed is None:
+            # Bu rejimdan oldin yaratilgan session - bir marta belgilanadi
+            return True
+        fraction = getattr(settings, 'CHAT_SESSION_REFRESH_FRACTION', 0.25)
+        return time.time() - refreshed >= self.get_expiry_age() * fraction
+
+    def save(self, must_create=False):
+        self[REFRESHED_KEY] = int(time.time())
+        # SQLite'da chat yozuvlari bilan lock talashmasligi uchun yagona writer orqali
+        return run_write(super().save, must_create)
@@ -0,0 +1,156 @@
+from django.contrib.auth.models import User
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_init, pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .broadcast import send_to_room
+from .downloads import revoke_download_tokens
+from .events import allocate_seq
+from .metrics import install_query_timer
+from .profiling import install_profiler
+from .mentions import username_cache
+from .models import Room, Message, RoomMember
+from .previews import schedule_preview
+from .rendering import cache_message_html, invalidate_message_html
+from .rooms import invalidate_room_list
+from .stats import add_counter, add_room_totals
+from .storage import release_blob
+from .unread import increment_unread
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+@receiver(post_save, sender=RoomMember)
+@receiver(post_delete, sender=RoomMember)
+def room_list_changed(sender, **kwargs):
+    """Xona yoki a'zolik o'zgarganda sidebar keshini yangilash"""
+    invalidate_room_list()
+
+
+@receiver(post_save, sender=RoomMember)
+@receiver(post_delete, sender=RoomMember)
+def room_membership_changed(sender, instance, **kwargs):
+    """Ulangan consumer'lar keshlangan a'zolik holatini yangilasin"""
+    send_to_room(instance.room_id, {
+        'type': 'membership_changed',
+        'user_id': instance.user_id,
+    })
+
+
+@receiver(post_save, sender=Room)
+def room_changed(sender, instance, created=False, **kwargs):
+    """Xona ma'lumotlari (masalan, yaratuvchi) o'zgarsa barcha consumer'lar yangilansin"""
+    if not created:
+        send_to_room(instance.id, {
+            'type': 'membership_changed',
+            'user_id': None,
+        })
+
+
+@receiver(pre_save, sender=Message)
+def message_seq_assigned(sender, instance, raw=False, **kwargs):
+    """Yangi xabarga xona ichidagi tartib raqami (bulk_create uchun buffer o'zi ajratadi)"""
+    if instance.pk is None and not instance.seq and not raw:
+        instance.seq = allocate_seq(instance.room_id)
+
+
+@receiver(post_save, sender=Message)
+@receiver(post_delete, sender=Message)
+def room_last_message_changed(sender, **kwargs):
+    """Oxirgi xabar ma'lumoti o'zgarganda sidebar keshini yangilash"""
+    invalidate_room_list()
+
+
+@receiver(post_save, sender=Message)
+def message_html_saved(sender, instance, **kwargs):
+    """Yaratilgan/tahrirlangan xabar HTML'ini bir marta render qilib keshlash"""
+    cache_message_html(instance)
+
+
+@receiver(post_delete, sender=Message)
+def message_html_deleted(sender, instance, **kwargs):
+    invalidate_message_html(instance)
+
+
+@receiver(post_save, sender=Message)
+def message_stats_added(sender, instance, created, **kwargs):
+    """Xona totallari: xabarlar soni va fayllar hajmi (COUNT/SUM o'rniga)"""
+    if created:
+        add_room_totals(instance.room_id, messages=1, file_size=instance.file_size or 0)
+
+
+@receiver(post_delete, sender=Message)
+def message_stats_removed(sender, instance, **kwargs):
+    add_room_totals(instance.room_id, messages=-1, file_size=-(instance.file_size or 0))
+
+
+@receiver(post_save, sender=User)
+def user_stats_added(sender, instance, created, raw=False, **kwargs):
+    """Userlar soni StatCounter'da - index sahifasi User jadvalini COUNT qilmaydi"""
+    if created and not raw:
+        add_counter('users', 1)
+
+
+@receiver(post_delete, sender=User)
+def user_stats_removed(sender, instance, **kwargs):
+    add_counter('users', -1)
+
+
+@receiver(post_save, sender=Message)
+def message_unread_counted(sender, instance, created, **kwargs):
+    """Yangi xabar: boshqa a'zolarning o'qilmaganlar hisoblagichi (buffer batch'da o'zi oshiradi)"""
+    if created:
+        increment_unread(instance.room_id, instance.user_id)
+
+
+@receiver(post_save, sender=Message)
+def message_preview_scheduled(sender, instance, created, **kwargs):
+    """Yangi rasm xabari uchun thumbnail'lar fonda (process pool'da) yaratiladi"""
+    if created:
+        schedule_preview(instance)
+
+
+@receiver(post_delete, sender=Message)
+def message_blob_released(sender, instance, **kwargs):
+    """
+    Cascade bilan o'chgan xabarlar (xona, reply) ham blob havolasini bo'shatsin.
+    release_message_file() chaqirilgan bo'lsa blob_id allaqachon None.
+    """
+    if instance.file:
+        revoke_download_tokens(instance.pk)
+    if instance.blob_id:
+        release_blob(instance.blob_id)
+
+
+@receiver(post_init, sender=User)
+def mention_username_loaded(sender, instance, **kwargs):
+    """Saqlashda username o'zgarganini bilish uchun (deferred bo'lsa - so'rovsiz None)"""
+    instance._loaded_username = instance.__dict__.get('username')
+
+
+@receiver(post_save, sender=User)
+def mention_user_saved(sender, instance, created, **kwargs):
+    """
+    Yangi yoki nomi o'zgargan user mention keshida darhol ko'rinsin, eski
+    nom esa endi highlight qilinmasin. Boshqa saqlashlar (last_login va
+    h.k.) keshga tegmaydi.
+    """
+    old_username = getattr(instance, '_loaded_username', None)
+    if not created and old_username == instance.username:
+        return
+    if old_username and not created:
+        username_cache.invalidate(old_username)
+    username_cache.set_many({instance.username: True})
+    instance._loaded_username = instance.username
+
+
+@receiver(post_delete, sender=User)
+def mention_user_deleted(sender, instance, **kwargs):
+    """O'chirilgan user endi mention sifatida highlight qilinmasin"""
+    username_cache.invalidate(instance.username)
+
+
+# Har bir yangi DB ulanishida SQL so'rovlar vaqti metrikasi
+connection_created.connect(install_query_timer, dispatch_uid='chat_query_timer')
+# Profil (CHAT_PROFILING) faol bo'lmaganda wrapper faqat ContextVar'ni tekshiradi
+connection_created.connect(install_profiler, dispatch_uid='chat_query_profiler')
@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+
+# Production SQLite sozlamalari: WAL - o'quvchilar yozuvchini kutmaydi,
+# synchronous=NORMAL - WAL'da xavfsiz va har commit'da fsync yo'q
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,  # ~64MB (manfiy qiymat - KB)
+    'mmap_size': 268435456,  # 256MB
+    'temp_store': 'MEMORY',
+    'busy_timeout': 20000,  # ms
+    'foreign_keys': 'ON',
+}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite backend'i: har bir ulanishga PRAGMA'lar qo'llanadi va
+    tranzaksiyalar `BEGIN IMMEDIATE` bilan ochiladi.
+
+    Oddiy `BEGIN` (DEFERRED) tranzaksiya o'qishdan yozishga o'tayotganda
+    lock band bo'lsa busy_timeout'ni kutmasdan "database is locked"
+    beradi. IMMEDIATE yozish lock'ini boshida oladi va navbat kutadi.
+    """
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        pragmas = {**DEFAULT_PRAGMAS, **getattr(settings, 'CHAT_SQLITE_PRAGMAS', {})}
+        for name, value in pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
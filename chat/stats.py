@@ -0,0 +1,128 @@
+"""
+Statistika: userlar, xabarlar va fayllar hajmi jadvallarni to'liq COUNT
+qilmasdan. Xona bo'yicha totallar Room.message_count/file_size_total da,
+userlar soni StatCounter('users') da - signal'lar orqali F() bilan
+yuritiladi. Global qiymatlar keshdan beriladi; `recount_stats` buyrug'i
+vaqti-vaqti bilan aniq qayta hisoblaydi (drift bo'lsa tuzatadi).
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Count, F, Sum
+from django.utils.functional import cached_property
+
+from .models import Room, Message, StatCounter
+
+
+GLOBAL_STATS_KEY = 'chat:stats:global'
+
+
+def add_room_totals(room_id, messages=0, file_size=0):
+    """Xona totallarini bitta UPDATE bilan o'zgartirish (manfiy qiymat - kamaytirish)"""
+    if messages or file_size:
+        Room.objects.filter(id=room_id).update(
+            message_count=F('message_count') + messages,
+            file_size_total=F('file_size_total') + file_size,
+        )
+
+
+def add_room_totals_bulk(messages):
+    """Write-behind batch uchun: xona bo'yicha yig'ib, har xonaga bitta UPDATE"""
+    totals = {}
+    for message in messages:
+        count, size = totals.get(message.room_id, (0, 0))
+        totals[message.room_id] = (count + 1, size + (message.file_size or 0))
+    for room_id, (count, size) in totals.items():
+        add_room_totals(room_id, messages=count, file_size=size)
+
+
+def add_counter(name, delta):
+    updated = StatCounter.objects.filter(name=name).update(value=F('value') + delta)
+    if not updated:
+        # Birinchi marta (migratsiyadan oldin yaratilgan baza) - aniq qiymat bilan boshlash
+        StatCounter.objects.get_or_create(name=name, defaults={'value': count_exact(name)})
+
+
+def count_exact(name):
+    if name == 'users':
+        return User.objects.count()
+    raise KeyError(name)
+
+
+def compute_global_stats():
+    """Kichik jadvallardan yig'ish: xabarlar soni xonalar totallari yig'indisi"""
+    totals = Room.objects.aggregate(messages=Sum('message_count'), file_size=Sum('file_size_total'), rooms=Count('id'))
+    users = StatCounter.objects.filter(name='users').values_list('value', flat=True).first()
+    if users is None:
+        add_counter('users', 0)
+        users = StatCounter.objects.get(name='users').value
+    return {
+        'users': users,
+        'rooms': totals['rooms'],
+        'messages': totals['messages'] or 0,
+        'file_size': totals['file_size'] or 0,
+    }
+
+
+def get_global_stats():
+    """Index sahifasi uchun: keshdan, eskirganda qayta yig'iladi (bir necha soniya kechikish mumkin)"""
+    stats = cache.get(GLOBAL_STATS_KEY)
+    if stats is None:
+        stats = compute_global_stats()
+        cache.set(GLOBAL_STATS_KEY, stats, getattr(settings, 'CHAT_STATS_CACHE_TIMEOUT', 60))
+    return stats
+
+
+def invalidate_global_stats():
+    cache.delete(GLOBAL_STATS_KEY)
+
+
+def recount_stats():
+    """Barcha hisoblagichlarni aniq qayta hisoblash (davriy agregatsiya)"""
+    totals = {
+        row['room_id']: row
+        for row in Message.objects.values('room_id').annotate(count=Count('id'), size=Sum('file_size'))
+    }
+    changed = 0
+    for room in Room.objects.only('id', 'message_count', 'file_size_total'):
+        row = totals.get(room.id, {})
+        count, size = row.get('count', 0), row.get('size') or 0
+        if (room.message_count, room.file_size_total) != (count, size):
+            Room.objects.filter(id=room.id).update(message_count=count, file_size_total=size)
+            changed += 1
+    StatCounter.objects.update_or_create(name='users', defaults={'value': count_exact('users')})
+    invalidate_global_stats()
+    return changed
+
+
+def approximate_count(queryset):
+    """
+    Filtrsiz queryset uchun hisoblagichlardan olingan soni, aks holda None.
+    Qiymat keshdan - bir oz eskirgan bo'lishi mumkin.
+    """
+    if queryset.query.where:
+        return None
+    stats = get_global_stats()
+    if queryset.model is Message:
+        return stats['messages']
+    if queryset.model is User:
+        return stats['users']
+    if queryset.model is Room:
+        return stats['rooms']
+    return None
+
+
+class ApproximateCountPaginator(Paginator):
+    """
+    Katta jadvallar uchun admin paginator: filtrsiz ro'yxatda COUNT(*)
+    o'rniga hisoblagichlar ishlatiladi (CHAT_ADMIN_APPROXIMATE_COUNT).
+    """
+
+    @cached_property
+    def count(self):
+        if getattr(settings, 'CHAT_ADMIN_APPROXIMATE_COUNT', False) and hasattr(self.object_list, 'query'):
+            count = approximate_count(self.object_list)
+            if count is not None:
+                return count
+        return super().count
@@ -0,0 +1,218 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .downloads import revoke_download_tokens
+from .models import FileBlob
+from .previews import delete_previews
+from .stats import add_room_totals
+
+
+READ_BLOCK_SIZE = 64 * 1024
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Fayllarni SHA-256 bo'yicha saqlovchi storage: `<prefix>/ab/cd/<sha256>`.
+    Hash fayl oqim sifatida o'qilayotganda hisoblanadi, shuning uchun fayl
+    xotiraga to'liq yuklanmaydi. Bir xil kontent bitta yo'lga tushadi.
+    """
+
+    def __init__(self, prefix='chat_files/cas', **kwargs):
+        super().__init__(**kwargs)
+        self.prefix = prefix
+
+    def hashed_name(self, digest):
+        return f'{self.prefix}/{digest[:2]}/{digest[2:4]}/{digest}'
+
+    def spool(self, content):
+        """
+        Kontentni vaqtinchalik faylga yozib, bir vaqtda hash'ini hisoblash.
+        Natija: (vaqtinchalik fayl yo'li, sha256, hajm)
+        """
+        temp_dir = os.path.join(self.location, self.prefix, 'tmp')
+        os.makedirs(temp_dir, exist_ok=True)
+        hasher = hashlib.sha256()
+        size = 0
+
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        fd, temp_path = tempfile.mkstemp(dir=temp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as temp:
+                chunks = content.chunks(READ_BLOCK_SIZE) if hasattr(content, 'chunks') else iter(lambda: content.read(READ_BLOCK_SIZE), b'')
+                for chunk in chunks:
+                    hasher.update(chunk)
+                    temp.write(chunk)
+                    size += len(chunk)
+        except Exception:
+            os.remove(temp_path)
+            raise
+        return temp_path, hasher.hexdigest(), size
+
+    def hash_local_file(self, path):
+        """Diskdagi faylning hash'ini bloklab o'qib hisoblash"""
+        hasher = hashlib.sha256()
+        with open(path, 'rb') as local:
+            for block in iter(lambda: local.read(READ_BLOCK_SIZE), b''):
+                hasher.update(block)
+        return hasher.hexdigest()
+
+    def commit(self, temp_path, digest):
+        """Vaqtinchalik faylni hash yo'liga ko'chirish (allaqachon bo'lsa - tashlab yuborish)"""
+        name = self.hashed_name(digest)
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            os.remove(temp_path)
+        else:
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            shutil.move(temp_path, full_path)
+            if self.file_permissions_mode is not None:
+                os.chmod(full_path, self.file_permissions_mode)
+        return name
+
+
+cas_storage = ContentAddressedStorage(
+    prefix=getattr(settings, 'CHAT_CAS_PREFIX', 'chat_files/cas'),
+)
+
+
+def _acquire_blob(temp_path, digest, size):
+    """
+    Blob havolasini bittaga oshirish yoki yangi blob yaratish (chaqiruvchi
+    tranzaksiyasida). Ortiqcha vaqtinchalik fayl faqat commit'dan keyin
+    o'chiriladi - rollback bo'lsa qayta urinish mumkin.
+    """
+    with transaction.atomic():
+        if FileBlob.objects.filter(sha256=digest).update(ref_count=F('ref_count') + 1):
+            transaction.on_commit(lambda: _remove_temp(temp_path))
+            return FileBlob.objects.get(sha256=digest)
+
+        # CAS'ga ko'chirish idempotent: rollback bo'lsa fayl keyingi shu kontentli yuklashda ishlatiladi
+        name = cas_storage.commit(temp_path, digest)
+        try:
+            with transaction.atomic():
+                return FileBlob.objects.create(sha256=digest, file=name, size=size, ref_count=1)
+        except IntegrityError:
+            # Parallel yuklash bir vaqtda yaratib qo'ygan
+            FileBlob.objects.filter(sha256=digest).update(ref_count=F('ref_count') + 1)
+            return FileBlob.objects.get(sha256=digest)
+
+
+def _remove_temp(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def attach_file(message, content, file_name):
+    """
+    Fayl obyektini (UploadedFile, File) xabarga tayyorlash: kontent
+    vaqtinchalik faylga yoziladi va hash hisoblanadi. Blob havolasi
+    save_with_file() da xabar bilan bitta tranzaksiyada olinadi.
+    """
+    temp_path, digest, size = cas_storage.spool(content)
+    message._pending_file = (temp_path, digest, size, True)
+    message.file_name = file_name[:255]
+    message.file_size = size
+
+
+def attach_local_file(message, path, file_name):
+    """
+    Diskdagi tayyor faylni (masalan, resumable yuklash .part fayli) xabarga
+    tayyorlash - nusxa olinmaydi, faqat hash hisoblanadi, saqlashda rename qilinadi
+    """
+    digest = cas_storage.hash_local_file(path)
+    message._pending_file = (path, digest, os.path.getsize(path), False)
+    message.file_name = file_name[:255]
+    message.file_size = os.path.getsize(path)
+
+
+def save_with_file(message):
+    """
+    Xabarni saqlash (run_write orqali chaqiriladi): attach_file'dagi blob
+    havolasi va INSERT bitta tranzaksiyada - saqlash bekor bo'lsa ref_count
+    ham oshmaydi. Muvaffaqiyatsizlikda spool qilingan vaqtinchalik fayl
+    o'chiriladi (.part fayli qayta urinish uchun qoladi).
+    """
+    pending = getattr(message, '_pending_file', None)
+    if pending is None:
+        message.save()
+        return message
+
+    temp_path, digest, size, owned = pending
+    try:
+        with transaction.atomic():
+            blob = _acquire_blob(temp_path, digest, size)
+            message.blob = blob
+            message.file.name = blob.file.name
+            message.file_size = blob.size
+            message.save()
+    except Exception:
+        if owned:
+            _remove_temp(temp_path)
+        message.blob = None
+        message.file = None
+        raise
+    message._pending_file = None
+    return message
+
+
+def release_blob(blob_id):
+    """
+    Havolani bittaga kamaytirish; boshqa xabar ishlatmasa blob yozuvi
+    o'chiriladi, fayllar esa faqat tranzaksiya commit bo'lgandan keyin
+    (rollback bo'lsa yozuv ham, fayl ham qoladi)
+    """
+    with transaction.atomic():
+        FileBlob.objects.filter(sha256=blob_id).update(ref_count=F('ref_count') - 1)
+        orphan = FileBlob.objects.filter(sha256=blob_id, ref_count__lte=0).first()
+        if orphan is not None:
+            name = orphan.file.name
+            orphan.delete()
+            transaction.on_commit(lambda: _delete_blob_files(blob_id, name))
+
+
+def _delete_blob_files(blob_id, name):
+    # Shu orada xuddi shu kontent qayta yuklangan bo'lsa fayl kerak
+    if FileBlob.objects.filter(sha256=blob_id).exists():
+        return
+    cas_storage.delete(name)
+    delete_previews(blob_id)
+
+
+def release_message_file(message):
+    """
+    Xabar faylini bo'shatish. CAS blob bo'lsa faqat havola kamayadi,
+    eski (CAS'dan oldingi) fayllar avvalgidek diskdan o'chiriladi.
+    Xabar obyektidagi fayl maydonlari tozalanadi (saqlanmaydi).
+    """
+    revoke_download_tokens(message.id)
+    if message.blob_id:
+        release_blob(message.blob_id)
+    elif message.file:
+        try:
+            message.file.delete(save=False)
+        except OSError:
+            pass
+        if message.preview:
+            delete_previews(f'm{message.id}')
+    if message.pk and message.file_size:
+        # Xabar qoladi (yoki keyin o'chadi) - fayl hajmi xona totalidan hozir ayriladi
+        add_room_totals(message.room_id, file_size=-message.file_size)
+
+    message.blob = None
+    message.file = None
+    message.file_name = ''
+    message.file_size = 0
+    message.file_type = None
+    message.preview = None
+    if message.message_type == 'image':
+        message.message_type = 'text'
@@ -2,6 +2,9 @@ from django import template
 from django.utils.safestring import mark_safe
 from django.contrib.auth.models import User
 import re
+from chat.downloads import download_url as signed_download_url
+from chat.mentions import MENTION_PATTERN, find_mentions, resolve_mentions
+from chat.previews import preview_urls as build_preview_urls
 
 register = template.Library()
 
@@ -11,16 +14,17 @@ def highlight_mentions(text):
     if not text:
         return text
     
+    # Barcha nomzodlar bitta so'rov (yoki keshdan) bilan tekshiriladi
+    existing = resolve_mentions(find_mentions(text))
+    
     def replace_mention(match):
         username = match.group(1)
-        try:
-            user = User.objects.get(username=username)
+        if username in existing:
             return f'<span style="color: #67a3ff; font-weight: 600; background: rgba(103, 163, 255, 0.1); padding: 2px 6px; border-radius: 12px;">@{username}</span>'
-        except User.DoesNotExist:
-            return f'@{username}'
+        return f'@{username}'
     
     # @username pattern ni topib, highlight qilish
-    highlighted_text = re.sub(r'@(\w+)', replace_mention, text)
+    highlighted_text = MENTION_PATTERN.sub(replace_mention, text)
     return mark_safe(highlighted_text)
 
 @register.filter
@@ -50,6 +54,16 @@ def format_message(text):
     
     return mark_safe(text)
 
+@register.filter
+def download_url(message):
+    """Xabar faylining imzolangan (DB tekshiruvisiz) yuklash havolasi"""
+    return signed_download_url(message)
+
+@register.filter
+def preview_urls(message):
+    """Rasm xabari thumbnail URL'lari (preview hali tayyor bo'lmasa None)"""
+    return build_preview_urls(message.id, message.preview)
+
 @register.simple_tag
 def get_room_members(room):
     """Xona a'zolarini olish"""
@@ -0,0 +1,60 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from chat.buffer import MessageWriteBuffer
+from chat.models import Message, Room, RoomMember
+from chat.rendering import message_html_key
+from chat.rooms import get_room_list_version
+
+
+class WriteBehindBatchTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', password='x')
+        self.bob = User.objects.create_user('bob', password='x')
+        self.carol = User.objects.create_user('carol', password='x')
+        self.room = Room.objects.create(name='umumiy', created_by=self.alice)
+        self.other = Room.objects.create(name='boshqa', created_by=self.alice)
+        for user in (self.alice, self.bob, self.carol):
+            RoomMember.objects.create(room=self.room, user=user)
+        RoomMember.objects.create(room=self.other, user=self.alice)
+        RoomMember.objects.create(room=self.other, user=self.bob)
+
+    def batch(self, count):
+        senders = [self.alice, self.bob]
+        messages = [
+            Message(room=self.room, user=senders[i % 2], content=f'xabar {i}', message_type='text')
+            for i in range(count)
+        ]
+        messages.append(Message(room=self.other, user=self.alice, content='boshqa xona', message_type='text'))
+        return messages
+
+    def unread(self, room, user):
+        return RoomMember.objects.get(room=room, user=user).unread_count
+
+    def test_batch_side_effects_are_aggregated(self):
+        version = get_room_list_version()
+        messages = self.batch(5)
+
+        MessageWriteBuffer._write(messages)
+
+        self.room.refresh_from_db()
+        self.assertEqual((self.room.message_count, self.room.last_seq), (5, 5))
+        self.assertEqual([m.seq for m in messages[:5]], [1, 2, 3, 4, 5])
+        # alice 3 ta, bob 2 ta yubordi - har kim faqat boshqalarnikini o'qimagan
+        self.assertEqual(self.unread(self.room, self.alice), 2)
+        self.assertEqual(self.unread(self.room, self.bob), 3)
+        self.assertEqual(self.unread(self.room, self.carol), 5)
+        self.assertEqual(self.unread(self.other, self.bob), 1)
+        self.assertEqual(cache.get(message_html_key(messages[0])), str(messages[0].rendered_html))
+        self.assertEqual(get_room_list_version(), version + 1)
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        with CaptureQueriesContext(connection) as small:
+            MessageWriteBuffer._write(self.batch(2))
+        with CaptureQueriesContext(connection) as large:
+            MessageWriteBuffer._write(self.batch(20))
+
+        self.assertEqual(len(large), len(small))
@@ -0,0 +1,155 @@
+from channels.db import database_sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import User
+from django.test import Client, TransactionTestCase
+
+from asosiy.asgi import application
+from chat.models import Message, Room, RoomMember
+from chat.writer import get_writer
+
+
+class ConsumerTestCase(TransactionTestCase):
+    """Haqiqiy ASGI stack (sessiya cookie'si bilan auth) orqali WebSocket testlari"""
+
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', password='x')
+        self.bob = User.objects.create_user('bob', password='x')
+        self.room = Room.objects.create(name='umumiy', created_by=self.alice)
+        RoomMember.objects.create(room=self.room, user=self.alice)
+        RoomMember.objects.create(room=self.room, user=self.bob)
+
+    def tearDown(self):
+        # Writer navbatidagi yozuvlar jadvallar tozalanishidan oldin tugasin
+        get_writer().run(lambda: None)
+
+    def session_cookie(self, user):
+        client = Client()
+        client.force_login(user)
+        return client.cookies['sessionid'].value
+
+    def communicator(self, cookie, room=None):
+        room = room or self.room
+        return WebsocketCommunicator(
+            application,
+            f'/ws/chat/{room.id}/',
+            headers=[(b'cookie', f'sessionid={cookie}'.encode()), (b'origin', b'http://localhost')],
+        )
+
+    async def connect(self, user):
+        communicator = self.communicator(await database_sync_to_async(self.session_cookie)(user))
+        self.assertTrue((await communicator.connect())[0])
+        return communicator
+
+    async def receive_frame(self, communicator, frame_type):
+        """Boshqa (presence va h.k.) frame'larni o'tkazib, kerakli turdagisini kutish"""
+        while True:
+            frame = await communicator.receive_json_from(timeout=3)
+            if frame['type'] == frame_type:
+                return frame
+
+
+class ChatMessageFrameTests(ConsumerTestCase):
+    async def test_live_frame_carries_rendered_html(self):
+        alice = self.communicator(await database_sync_to_async(self.session_cookie)(self.alice))
+        bob = self.communicator(await database_sync_to_async(self.session_cookie)(self.bob))
+        self.assertTrue((await alice.connect())[0])
+        self.assertTrue((await bob.connect())[0])
+
+        await alice.send_json_to({'type': 'chat_message', 'message': '**qalin** <b>x</b>'})
+        frame = await self.receive_frame(bob, 'chat_message')
+
+        # Sahifa, tahrir va replay bilan bir xil format_message natijasi
+        self.assertEqual(frame['message'], '**qalin** <b>x</b>')
+        self.assertIn('<strong>qalin</strong>', frame['html'])
+        self.assertIn('&lt;b&gt;', frame['html'])
+        message = await database_sync_to_async(Message.objects.get)(id=frame['message_id'])
+        self.assertEqual(message.content, '**qalin** <b>x</b>')
+
+        await alice.disconnect()
+        await bob.disconnect()
+
+
+class EditMessageFrameTests(ConsumerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.message = Message.objects.create(room=self.room, user=self.alice, content='asl matn')
+        other_room = Room.objects.create(name='boshqa', created_by=self.bob)
+        self.foreign = Message.objects.create(room=other_room, user=self.bob, content='boshqa xona')
+
+    async def content_of(self, message):
+        await database_sync_to_async(message.refresh_from_db)()
+        return message.content
+
+    async def test_author_edit_is_broadcast_as_delta(self):
+        alice = await self.connect(self.alice)
+        bob = await self.connect(self.bob)
+
+        await alice.send_json_to({'type': 'edit_message', 'message_id': self.message.id, 'content': '*yangi*'})
+        frame = await self.receive_frame(bob, 'message_edited')
+
+        self.assertEqual((frame['message_id'], frame['message']), (self.message.id, '*yangi*'))
+        self.assertIn('<em>yangi</em>', frame['html'])
+        self.assertEqual(await self.content_of(self.message), '*yangi*')
+        await alice.disconnect()
+        await bob.disconnect()
+
+    async def test_non_author_cannot_edit(self):
+        bob = await self.connect(self.bob)
+
+        await bob.send_json_to({'type': 'edit_message', 'message_id': self.message.id, 'content': 'buzildi'})
+        frame = await self.receive_frame(bob, 'error')
+
+        self.assertEqual((frame['action'], frame['message_id']), ('edit_message', self.message.id))
+        self.assertEqual(await self.content_of(self.message), 'asl matn')
+        await bob.disconnect()
+
+    async def test_message_from_another_room_cannot_be_edited(self):
+        # Bob - boshqa xonadagi xabar muallifi, lekin ulanish shu xonaga
+        bob = await self.connect(self.bob)
+
+        await bob.send_json_to({'type': 'edit_message', 'message_id': self.foreign.id, 'content': 'buzildi'})
+        await self.receive_frame(bob, 'error')
+
+        self.assertEqual(await self.content_of(self.foreign), 'boshqa xona')
+        await bob.disconnect()
+
+
+class DeleteMessageFrameTests(ConsumerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.message = Message.objects.create(room=self.room, user=self.alice, content='asl matn')
+
+    async def exists(self, message):
+        return await database_sync_to_async(Message.objects.filter(id=message.id).exists)()
+
+    async def test_author_delete_is_broadcast(self):
+        alice = await self.connect(self.alice)
+        bob = await self.connect(self.bob)
+
+        await alice.send_json_to({'type': 'delete_message', 'message_id': str(self.message.id)})
+        frame = await self.receive_frame(bob, 'message_deleted')
+
+        self.assertEqual(frame['message_id'], self.message.id)
+        self.assertFalse(await self.exists(self.message))
+        await alice.disconnect()
+        await bob.disconnect()
+
+    async def test_non_numeric_id_is_rejected(self):
+        alice = await self.connect(self.alice)
+
+        await alice.send_json_to({'type': 'delete_message', 'message_id': 'abc'})
+        frame = await self.receive_frame(alice, 'error')
+
+        self.assertEqual((frame['action'], frame['message_id']), ('delete_message', None))
+        self.assertTrue(await self.exists(self.message))
+        await alice.disconnect()
+
+    async def test_non_author_cannot_delete(self):
+        bob = await self.connect(self.bob)
+
+        await bob.send_json_to({'type': 'delete_message', 'message_id': self.message.id})
+        frame = await self.receive_frame(bob, 'error')
+
+        self.assertEqual((frame['action'], frame['message_id']), ('delete_message', self.message.id))
+        self.assertTrue(await self.exists(self.message))
+        await bob.disconnect()
@@ -0,0 +1,187 @@
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from chat.downloads import download_url, parse_range, revoke_download_tokens
+from chat.events import delete_message
+from chat.models import Message, Room, RoomMember
+from chat.previews import preview_urls
+
+
+def use_temp_media(test):
+    """Test davomida fayllar vaqtinchalik MEDIA_ROOT'ga yoziladi"""
+    media_root = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+    media_override = override_settings(MEDIA_ROOT=media_root)
+    media_override.enable()
+    test.addCleanup(media_override.disable)
+    test.addCleanup(cache.clear)
+
+
+class PreviewUrlTests(TestCase):
+    def setUp(self):
+        use_temp_media(self)
+
+        alice = User.objects.create_user('alice', password='x')
+        room = Room.objects.create(name='umumiy', created_by=alice)
+        self.message = Message.objects.create(room=room, user=alice, content='rasm')
+        self.preview = {
+            'width': 800, 'height': 600, 'thumb_width': 320, 'thumb_height': 240,
+            'thumb': default_storage.save('chat_files/previews/ab/abc.jpg', ContentFile(b'jpeg')),
+            'webp': default_storage.save('chat_files/previews/ab/abc.webp', ContentFile(b'webp')),
+        }
+
+    @override_settings(DEBUG=False)
+    def test_thumbnails_are_served_through_signed_download(self):
+        urls = preview_urls(self.message.id, self.preview)
+
+        self.assertNotIn('/media/', urls['thumb_url'])
+        response = self.client.get(urls['webp_url'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertEqual(b''.join(response.streaming_content), b'webp')
+
+    def test_revoked_message_thumbnails_fall_back_to_permission_check(self):
+        urls = preview_urls(self.message.id, self.preview)
+
+        revoke_download_tokens(self.message.id)
+
+        response = self.client.get(urls['thumb_url'])
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(f'/download/{self.message.id}/', response['Location'])
+
+
+class ParseRangeTests(SimpleTestCase):
+    def test_single_ranges(self):
+        self.assertEqual(parse_range('bytes=0-99', 1000), (0, 99))
+        self.assertEqual(parse_range('bytes=500-', 1000), (500, 999))
+        self.assertEqual(parse_range('bytes=-100', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=-5000', 1000), (0, 999))
+        self.assertEqual(parse_range('bytes=900-5000', 1000), (900, 999))
+
+    def test_missing_multi_and_malformed_ranges_mean_full_file(self):
+        for header in (None, '', 'bytes=-', 'bytes=0-1,5-6', 'items=0-1', 'bytes=a-b'):
+            self.assertIsNone(parse_range(header, 1000), header)
+
+    def test_unsatisfiable_ranges(self):
+        for header in ('bytes=1000-', 'bytes=5-2', 'bytes=-0'):
+            with self.assertRaises(ValueError):
+                parse_range(header, 1000)
+
+
+class FileServingTests(TestCase):
+    def setUp(self):
+        use_temp_media(self)
+        alice = User.objects.create_user('alice', password='x')
+        room = Room.objects.create(name='umumiy', created_by=alice)
+        RoomMember.objects.create(room=room, user=alice)
+        name = default_storage.save('chat_files/raqamlar.txt', ContentFile(b'0123456789'))
+        self.message = Message.objects.create(room=room, user=alice, file=name, file_name='raqamlar.txt')
+        self.url = reverse('chat:download_file', args=[self.message.id])
+        self.client.force_login(alice)
+
+    def get(self, **headers):
+        return self.client.get(self.url, **headers)
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_full_download_has_validators(self):
+        response = self.get()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), b'0123456789')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertIn('Last-Modified', response)
+
+    def test_conditional_requests(self):
+        etag = self.get()['ETag']
+
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH='"boshqa"').status_code, 200)
+        self.assertEqual(self.get(HTTP_IF_MATCH='"boshqa"').status_code, 412)
+
+    def test_range_request(self):
+        response = self.get(HTTP_RANGE='bytes=2-4')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.body(response), b'234')
+        self.assertEqual((response['Content-Range'], response['Content-Length']), ('bytes 2-4/10', '3'))
+
+    def test_unsatisfiable_range(self):
+        response = self.get(HTTP_RANGE='bytes=20-')
+
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_multi_range_gets_full_file(self):
+        response = self.get(HTTP_RANGE='bytes=0-1,4-5')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), b'0123456789')
+
+    def test_stale_if_range_gets_full_file(self):
+        etag = self.get()['ETag']
+
+        self.assertEqual(self.get(HTTP_RANGE='bytes=0-0', HTTP_IF_RANGE=etag).status_code, 206)
+        self.assertEqual(self.get(HTTP_RANGE='bytes=0-0', HTTP_IF_RANGE='"eski"').status_code, 200)
+
+    @override_settings(CHAT_DOWNLOAD_OFFLOAD='x-accel-redirect', CHAT_DOWNLOAD_ACCEL_PREFIX='/protected-media/')
+    def test_offload_leaves_bytes_to_proxy(self):
+        response = self.get()
+
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/chat_files/raqamlar.txt')
+        self.assertEqual(response.content, b'')
+
+
+class SignedDownloadTests(TestCase):
+    def setUp(self):
+        use_temp_media(self)
+        self.alice = User.objects.create_user('alice', password='x')
+        room = Room.objects.create(name='umumiy', created_by=self.alice)
+        RoomMember.objects.create(room=room, user=self.alice)
+        name = default_storage.save('chat_files/hujjat.txt', ContentFile(b'hujjat'))
+        self.message = Message.objects.create(room=room, user=self.alice, file=name, file_name='hujjat.txt')
+        self.url = download_url(self.message)
+
+    def assertFallsBack(self, url):
+        response = self.client.get(url)
+        self.assertRedirects(response, reverse('chat:download_file', args=[self.message.id]), fetch_redirect_response=False)
+
+    def test_valid_token_is_served_without_queries(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'hujjat')
+        self.assertIn("filename*=UTF-8''hujjat.txt", response['Content-Disposition'])
+
+    def test_tampered_or_foreign_token_falls_back(self):
+        token = self.url.rstrip('/').rsplit('/', 1)[1]
+        other = Message.objects.create(room=self.message.room, user=self.alice, content='boshqa')
+
+        self.assertFallsBack(reverse('chat:download_signed', args=[self.message.id, token[:-2] + 'xx']))
+        response = self.client.get(reverse('chat:download_signed', args=[other.id, token]))
+        self.assertRedirects(response, reverse('chat:download_file', args=[other.id]), fetch_redirect_response=False)
+
+    def test_expired_token_falls_back(self):
+        with override_settings(CHAT_DOWNLOAD_TOKEN_TTL=-1):
+            self.assertFallsBack(self.url)
+
+    def test_deleting_the_file_revokes_issued_tokens(self):
+        delete_message(self.message.id, 'file', self.alice.id)
+
+        self.assertFallsBack(self.url)
+
+    @override_settings(CHAT_DOWNLOAD_TOKEN_REVOCATION=False)
+    def test_revocation_can_be_disabled(self):
+        revoke_download_tokens(self.message.id)
+
+        self.assertEqual(self.client.get(self.url).status_code, 200)
@@ -0,0 +1,129 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from chat.events import delete_message, edit_message_content, get_replay
+from chat.models import Message, Room, RoomEvent, RoomMember
+from chat.previews import apply_preview
+
+
+PREVIEW = {
+    'width': 800, 'height': 600, 'thumb_width': 320, 'thumb_height': 240,
+    'thumb': 'chat_files/previews/ab/abc.jpg', 'webp': 'chat_files/previews/ab/abc.webp',
+}
+
+
+class PreviewReplayTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', password='x')
+        self.room = Room.objects.create(name='umumiy', created_by=self.alice)
+        RoomMember.objects.create(room=self.room, user=self.alice)
+        self.message = Message.objects.create(room=self.room, user=self.alice, content='rasm')
+        self.room.refresh_from_db()
+
+    def test_preview_is_journalled_and_replayed(self):
+        last_seen = self.room.last_seq
+
+        seq = apply_preview(self.message.id, self.room.id, PREVIEW)
+
+        self.assertEqual(RoomEvent.objects.get(seq=seq).event_type, 'preview')
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.message_type, 'image')
+
+        frames, current_seq = get_replay(self.room.id, last_seen)
+        self.assertEqual(current_seq, seq)
+        self.assertEqual([(frame['type'], frame['message_id']) for frame in frames], [('preview_ready', self.message.id)])
+        self.assertEqual(frames[0]['preview']['thumb_width'], 320)
+
+    def test_deleted_message_is_ignored(self):
+        message_id = self.message.id
+        self.message.delete()
+
+        self.assertIsNone(apply_preview(message_id, self.room.id, PREVIEW))
+        self.assertFalse(RoomEvent.objects.filter(event_type='preview').exists())
+
+
+class ReplayTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', password='x')
+        self.room = Room.objects.create(name='umumiy', created_by=self.alice)
+        RoomMember.objects.create(room=self.room, user=self.alice)
+        self.first = Message.objects.create(room=self.room, user=self.alice, content='birinchi')
+        self.room.refresh_from_db()
+        self.last_seen = self.room.last_seq
+
+    def replay(self):
+        frames, current_seq = get_replay(self.room.id, self.last_seen)
+        return [(frame['type'], frame['message_id']) for frame in frames], current_seq
+
+    def test_messages_edits_and_deletes_are_replayed_in_order(self):
+        second = Message.objects.create(room=self.room, user=self.alice, content='ikkinchi')
+        third = Message.objects.create(room=self.room, user=self.alice, content='uchinchi')
+        edit_message_content(self.room.id, self.first.id, 'tahrirlangan', self.alice.id)
+        delete_message(third.id, 'all', self.alice.id)
+
+        frames, current_seq = self.replay()
+
+        # O'chirilgan xabarning o'zi qaytmaydi, faqat uning delete hodisasi
+        self.assertEqual(frames, [
+            ('chat_message', second.id),
+            ('message_edited', self.first.id),
+            ('message_deleted', third.id),
+        ])
+        self.assertEqual(current_seq, self.last_seen + 4)
+
+    def test_edit_replays_current_text(self):
+        edit_message_content(self.room.id, self.first.id, '*yangi*', self.alice.id)
+
+        frames, _ = get_replay(self.room.id, self.last_seen)
+
+        self.assertEqual(frames[0]['message'], '*yangi*')
+        self.assertIn('<em>yangi</em>', frames[0]['html'])
+        self.assertTrue(frames[0]['edited'])
+
+    def test_text_delete_replays_remaining_state(self):
+        delete_message(self.first.id, 'text', self.alice.id)
+
+        frames, _ = get_replay(self.room.id, self.last_seen)
+
+        self.assertEqual((frames[0]['type'], frames[0]['delete_type'], frames[0]['message']), ('message_deleted', 'text', ''))
+
+    @override_settings(CHAT_RESUME_MAX_EVENTS=2)
+    def test_gap_beyond_limit_asks_for_resync(self):
+        for i in range(3):
+            Message.objects.create(room=self.room, user=self.alice, content=f'xabar {i}')
+
+        self.assertEqual(get_replay(self.room.id, self.last_seen), (None, self.last_seen + 3))
+        self.assertEqual(get_replay(self.room.id, self.last_seen + 10)[0], None)
+
+
+class SequenceBackfillTests(TransactionTestCase):
+    """0013: seq ustuni qo'shilganda mavjud xabarlar xona ichida raqamlanadi"""
+
+    before = [('chat', '0012_message_fts')]
+    after = [('chat', '0013_room_sequence')]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_existing_messages_are_numbered_per_room(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        apps = executor.loader.project_state(self.before).apps
+        user = apps.get_model('auth', 'User').objects.create(username='alice')
+        Room = apps.get_model('chat', 'Room')
+        Message = apps.get_model('chat', 'Message')
+        first, second = Room.objects.create(name='a', created_by_id=user.id), Room.objects.create(name='b', created_by_id=user.id)
+        ids = [Message.objects.create(room_id=room.id, user_id=user.id, content='x').id for room in (first, second, first)]
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+        apps = executor.loader.project_state(self.after).apps
+        Room = apps.get_model('chat', 'Room')
+        Message = apps.get_model('chat', 'Message')
+
+        self.assertEqual(dict(Message.objects.filter(id__in=ids).values_list('id', 'seq')), {ids[0]: 1, ids[1]: 1, ids[2]: 2})
+        self.assertEqual(dict(Room.objects.values_list('id', 'last_seq')), {first.id: 2, second.id: 1})
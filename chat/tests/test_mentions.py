@@ -0,0 +1,52 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+
+from chat.mentions import UsernameCache, resolve_mentions, username_cache
+
+
+class UsernameCacheTests(SimpleTestCase):
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = UsernameCache(max_size=2, ttl=60)
+        cache.set_many({'alice': True, 'bob': False})
+
+        cache.get_many(['alice'])
+        cache.set_many({'carol': True})
+
+        self.assertEqual(cache.get_many(['alice', 'bob', 'carol']), {'alice': True, 'carol': True})
+
+    def test_expired_entries_are_dropped(self):
+        cache = UsernameCache(max_size=10, ttl=60)
+        with mock.patch('chat.mentions.time.monotonic', return_value=1000):
+            cache.set_many({'alice': True})
+        with mock.patch('chat.mentions.time.monotonic', return_value=1061):
+            self.assertEqual(cache.get_many(['alice']), {})
+        self.assertEqual(len(cache._data), 0)
+
+
+class MentionCacheSignalTests(TestCase):
+    def setUp(self):
+        username_cache.clear()
+        self.addCleanup(username_cache.clear)
+
+    def test_rename_evicts_old_username(self):
+        user = User.objects.create_user('alice', password='x')
+        self.assertEqual(resolve_mentions(['alice', 'alisa']), {'alice'})
+
+        user.username = 'alisa'
+        user.save()
+
+        self.assertEqual(username_cache.get_many(['alice', 'alisa']), {'alisa': True})
+        with self.assertNumQueries(1):
+            self.assertEqual(resolve_mentions(['alice', 'alisa']), {'alisa'})
+
+    def test_other_saves_leave_cache_alone(self):
+        user = User.objects.create_user('alice', password='x')
+        username_cache.clear()
+
+        user.first_name = 'Alisa'
+        user.save()
+        User.objects.get(id=user.id).save(update_fields=['last_login'])
+
+        self.assertEqual(username_cache.get_many(['alice']), {})
@@ -0,0 +1,27 @@
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+
+@override_settings(DEBUG=False, CHAT_METRICS_ENABLED=True, CHAT_METRICS_TOKEN='maxfiy', CHAT_METRICS_ALLOWED_IPS=['10.0.0.5'])
+class MetricsAccessTests(TestCase):
+    def setUp(self):
+        self.url = reverse('chat:metrics')
+
+    def test_anonymous_gets_404(self):
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION='Bearer notogri').status_code, 404)
+
+    def test_non_staff_user_gets_404(self):
+        self.client.force_login(User.objects.create_user('alice', password='x'))
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_token_staff_and_internal_ip_are_allowed(self):
+        self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION='Bearer maxfiy').status_code, 200)
+        self.assertEqual(self.client.get(self.url, REMOTE_ADDR='10.0.0.5').status_code, 200)
+        self.client.force_login(User.objects.create_user('admin', password='x', is_staff=True))
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    @override_settings(CHAT_METRICS_TOKEN=None)
+    def test_no_token_is_not_public(self):
+        self.assertEqual(self.client.get(self.url).status_code, 404)
@@ -0,0 +1,59 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from chat.presence import InMemoryPresenceBackend, PresenceService
+
+
+class PresencePublisherTests(SimpleTestCase):
+    """Bitta umumiy backend'dagi ikki service - ikki worker process o'rnida"""
+
+    def setUp(self):
+        self.backend = InMemoryPresenceBackend()
+        self.workers = [PresenceService(self.backend, interval=60) for _ in range(2)]
+        self.published = []
+        for worker in self.workers:
+            patcher = mock.patch.object(worker, 'publish', side_effect=self.record(worker))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def record(self, worker):
+        async def publish(room_id, joined, left, online_count):
+            self.published.append((worker, sorted(joined), sorted(left)))
+        return publish
+
+    async def tick_all(self):
+        for worker in self.workers:
+            await worker.tick(1)
+
+    async def test_diff_is_published_once_across_workers(self):
+        first, second = self.workers
+        await self.backend.add(1, 'alice', 'c1')
+        await self.backend.add(1, 'bob', 'c2')
+
+        await self.tick_all()
+        await self.backend.remove(1, 'bob', 'c2')
+        await self.tick_all()
+
+        self.assertEqual(self.published, [(first, ['alice', 'bob'], []), (first, [], ['bob'])])
+
+    async def test_lease_moves_when_publisher_releases(self):
+        first, second = self.workers
+        await self.backend.add(1, 'alice', 'c1')
+        await self.tick_all()
+
+        await self.backend.release_publisher(1, first.owner)
+        await self.backend.add(1, 'bob', 'c2')
+        await second.tick(1)
+        await first.tick(1)
+
+        # Yangi publisher faqat o'zgarishni yuboradi, butun ro'yxatni emas
+        self.assertEqual(self.published, [(first, ['alice'], []), (second, ['bob'], [])])
+
+    async def test_expired_lease_can_be_taken_over(self):
+        first, second = self.workers
+
+        self.assertTrue(await self.backend.claim_publisher(1, first.owner, lease=60))
+        self.assertFalse(await self.backend.claim_publisher(1, second.owner, lease=60))
+        self.assertTrue(await self.backend.claim_publisher(1, first.owner, lease=-1))
+        self.assertTrue(await self.backend.claim_publisher(1, second.owner, lease=60))
@@ -0,0 +1,102 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from channels.db import database_sync_to_async
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from chat import profiling, views
+from chat.models import Message, Room, RoomMember
+from chat.profiling import QueryBudgetExceeded
+from chat.storage import attach_file, save_with_file
+
+from .test_consumers import ConsumerTestCase
+
+
+STRICT_BUDGETS = override_settings(CHAT_PROFILING=True, CHAT_QUERY_BUDGET_STRICT=True)
+
+
+@STRICT_BUDGETS
+class ViewQueryBudgetTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media_override = override_settings(MEDIA_ROOT=media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+
+        self.alice = User.objects.create_user('alice', password='x')
+        self.bob = User.objects.create_user('bob', password='x')
+        self.room = Room.objects.create(name='umumiy', created_by=self.alice)
+        RoomMember.objects.create(room=self.room, user=self.alice)
+        RoomMember.objects.create(room=self.room, user=self.bob)
+        for i in range(20):
+            Message.objects.create(room=self.room, user=self.alice if i % 2 else self.bob, content=f'xabar @bob {i}')
+        self.file_message = Message(room=self.room, user=self.alice, message_type='file')
+        attach_file(self.file_message, ContentFile(b'fayl kontenti'), 'a.txt')
+        save_with_file(self.file_message)
+        self.client.force_login(self.bob)
+
+    def test_room_within_budget(self):
+        # Birinchi (sovuq kesh) va keyingi so'rov ham byudjetga sig'adi
+        for _ in range(2):
+            self.assertEqual(self.client.get(reverse('chat:room', args=[self.room.id])).status_code, 200)
+
+    def test_room_post_within_write_budget(self):
+        url = reverse('chat:room', args=[self.room.id])
+        self.assertEqual(self.client.post(url, {'content': 'yangi xabar'}).status_code, 302)
+        upload = SimpleUploadedFile('b.txt', b'boshqa fayl')
+        self.assertEqual(self.client.post(url, {'content': 'fayl', 'file': upload}).status_code, 302)
+
+    def test_download_file_within_budget(self):
+        response = self.client.get(reverse('chat:download_file', args=[self.file_message.id]))
+        self.assertEqual(response.status_code, 200)
+
+    def test_over_budget_raises(self):
+        with mock.patch.object(views.room, 'query_budget', 1):
+            with self.assertRaises(QueryBudgetExceeded) as raised:
+                self.client.get(reverse('chat:room', args=[self.room.id]))
+        self.assertIn('chat:room', str(raised.exception))
+
+    def test_write_overrun_raises(self):
+        # Writer thread'ida bajarilsa ham yozuvlar so'rov profiliga tushadi
+        with mock.patch.object(views.room, 'write_budget', 0):
+            with self.assertRaises(QueryBudgetExceeded) as raised:
+                self.client.post(reverse('chat:room', args=[self.room.id]), {'content': 'yangi xabar'})
+        self.assertIn('yozuv', str(raised.exception))
+
+    @override_settings(CHAT_QUERY_BUDGET_STRICT=False)
+    def test_over_budget_only_logs_when_not_strict(self):
+        with mock.patch.object(views.room, 'query_budget', 1):
+            with self.assertLogs('chat.profiling', 'WARNING'):
+                response = self.client.get(reverse('chat:room', args=[self.room.id]))
+        self.assertEqual(response.status_code, 200)
+
+
+@STRICT_BUDGETS
+class FrameQueryBudgetTests(ConsumerTestCase):
+    async def test_chat_message_frame_within_budget(self):
+        finished = []
+        finish_profile = profiling.finish_profile
+
+        def record(profile, token):
+            finished.append(profile)
+            return finish_profile(profile, token)
+
+        alice = self.communicator(await database_sync_to_async(self.session_cookie)(self.alice))
+        self.assertTrue((await alice.connect())[0])
+        with mock.patch('chat.profiling.finish_profile', side_effect=record):
+            await alice.send_json_to({'type': 'chat_message', 'message': 'salom'})
+            await self.receive_frame(alice, 'chat_message')
+        await alice.disconnect()
+
+        frames = [profile for profile in finished if profile.label == 'ws chat_message']
+        self.assertEqual(len(frames), 1)
+        self.assertEqual((frames[0].budget, frames[0].write_budget), (2, 5))
+        # INSERT writer thread'ida bajariladi, lekin shu frame'ning yozuvlari sifatida sanaladi
+        self.assertGreater(frames[0].writes, 0)
+        self.assertFalse(frames[0].over_budget())
@@ -0,0 +1,28 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+
+from chat.models import Message, Room, RoomMember
+from chat.rooms import get_room_list
+
+
+class RoomListCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user('alice', password='x')
+        self.bob = User.objects.create_user('bob', password='x')
+        self.room = Room.objects.create(name='umumiy', created_by=self.alice)
+        RoomMember.objects.create(room=self.room, user=self.alice)
+        RoomMember.objects.create(room=self.room, user=self.bob)
+        Message.objects.create(room=self.room, user=self.alice, content='salom')
+
+    def test_list_is_shared_between_users(self):
+        get_room_list(self.alice)
+
+        # Boshqa user uchun ro'yxat qayta qurilmaydi - faqat o'qilmaganlar so'rovi
+        with self.assertNumQueries(1):
+            rooms = get_room_list(self.bob)
+
+        self.assertEqual([room.member_count for room in rooms], [2])
+        self.assertEqual(rooms[0].unread_count, 1)
+        self.assertEqual(get_room_list(self.alice)[0].unread_count, 0)
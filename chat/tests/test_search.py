@@ -0,0 +1,79 @@
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from chat.events import edit_message_content
+from chat.models import Message, Room, RoomMember
+from chat.search import search_messages
+
+
+class SearchIndexSyncTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', password='x')
+        self.room = Room.objects.create(name='umumiy', created_by=self.alice)
+        RoomMember.objects.create(room=self.room, user=self.alice)
+
+    def found(self, text):
+        results, _ = search_messages(self.alice, text)
+        return [message.id for message in results]
+
+    def test_insert_edit_and_delete_keep_the_index_in_sync(self):
+        message = Message.objects.create(room=self.room, user=self.alice, content='olma pishdi')
+        self.assertEqual(self.found('olma'), [message.id])
+
+        # Tahrir bitta .update() bilan (WebSocket va HTTP yo'li)
+        edit_message_content(self.room.id, message.id, 'nok pishdi', self.alice.id)
+        self.assertEqual(self.found('olma'), [])
+        self.assertEqual(self.found('nok'), [message.id])
+
+        # Oddiy save() (masalan, matnni o'chirish)
+        message.refresh_from_db()
+        message.content = 'behi'
+        message.save()
+        self.assertEqual(self.found('nok'), [])
+        self.assertEqual(self.found('beh'), [message.id])
+
+        message.delete()
+        self.assertEqual(self.found('behi'), [])
+
+    def test_only_member_rooms_are_searched(self):
+        bob = User.objects.create_user('bob', password='x')
+        Message.objects.create(room=self.room, user=self.alice, content='maxfiy reja')
+
+        self.assertEqual(search_messages(bob, 'maxfiy')[0], [])
+
+
+@override_settings(CHAT_HISTORY_PAGE_SIZE=4, CHAT_SEARCH_PAGE_SIZE=2, CHAT_SEARCH_RANK_WINDOW=10)
+class SearchViewTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', password='x')
+        self.room = Room.objects.create(name='umumiy', created_by=self.alice)
+        RoomMember.objects.create(room=self.room, user=self.alice)
+        self.hit = Message.objects.create(room=self.room, user=self.alice, content='eski topilma')
+        for i in range(10):
+            Message.objects.create(room=self.room, user=self.alice, content=f'keyingi {i}')
+        self.client.force_login(self.alice)
+
+    def search(self, **params):
+        return self.client.get(reverse('chat:search'), params).json()
+
+    def test_result_url_opens_history_around_the_hit(self):
+        url = self.search(q='topilma')['results'][0]['url']
+
+        self.assertTrue(url.endswith(f'#message-text-{self.hit.id}'))
+        response = self.client.get(url.split('#')[0])
+        ids = [message.id for message in response.context['messages']]
+        self.assertIn(self.hit.id, ids)
+        self.assertTrue(response.context['has_newer'])
+        self.assertContains(response, f'id="message-text-{self.hit.id}"')
+
+    def test_bad_position_falls_back_to_newest_page(self):
+        response = self.client.get(reverse('chat:room', args=[self.room.id]), {'at': 'buzuq'})
+
+        self.assertNotIn(self.hit.id, [message.id for message in response.context['messages']])
+        self.assertFalse(response.context['has_newer'])
+
+    def test_page_is_clamped(self):
+        self.assertEqual(self.search(q='keyingi', page=-5)['page'], 1)
+        # 10 ta natija oynasi, sahifada 2 ta - oxirgi sahifa 5
+        self.assertEqual(self.search(q='keyingi', page=999)['page'], 5)
@@ -0,0 +1,52 @@
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from chat.sessions import REFRESHED_KEY, SessionStore
+
+
+class SlidingSessionTests(TestCase):
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        User.objects.create_user('alice', password='x')
+        self.client.login(username='alice', password='x')
+        self.session_key = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+
+    def expire_date(self):
+        return Session.objects.get(session_key=self.session_key).expire_date
+
+    def visit(self):
+        return self.client.get(reverse('chat:index'))
+
+    def test_ordinary_request_does_not_save_session(self):
+        expire_date = self.expire_date()
+
+        response = self.visit()
+
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        self.assertEqual(self.expire_date(), expire_date)
+
+    def test_session_is_extended_once_refresh_is_due(self):
+        expire_date = self.expire_date()
+        later = time.time() + settings.SESSION_COOKIE_AGE * settings.CHAT_SESSION_REFRESH_FRACTION + 1
+
+        with mock.patch('chat.sessions.time.time', return_value=later):
+            response = self.visit()
+
+        self.assertIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        self.assertGreater(self.expire_date(), expire_date)
+        self.assertEqual(SessionStore(self.session_key)[REFRESHED_KEY], int(later))
+
+    def test_session_without_marker_is_refreshed(self):
+        session = SessionStore()
+        session['foo'] = 'bar'
+
+        self.assertTrue(session.refresh_due())
+        session[REFRESHED_KEY] = int(time.time())
+        self.assertFalse(session.refresh_due())
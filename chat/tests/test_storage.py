@@ -0,0 +1,63 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, transaction
+from django.test import TestCase, override_settings
+
+from chat.models import FileBlob, Message, Room
+from chat.storage import attach_file, cas_storage, release_blob, save_with_file
+
+
+class BlobRefCountTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.alice = User.objects.create_user('alice', password='x')
+        self.room = Room.objects.create(name='umumiy', created_by=self.alice)
+
+    def file_message(self):
+        message = Message(room=self.room, user=self.alice, message_type='file')
+        attach_file(message, ContentFile(b'bir xil kontent'), 'a.txt')
+        return message
+
+    def test_failed_save_does_not_take_a_reference(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            save_with_file(self.file_message())
+        blob = FileBlob.objects.get()
+        self.assertEqual(blob.ref_count, 1)
+
+        failing = self.file_message()
+        with mock.patch.object(Message, 'save', side_effect=IntegrityError):
+            with self.assertRaises(IntegrityError):
+                save_with_file(failing)
+
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+        self.assertIsNone(failing.blob)
+
+    def test_release_keeps_file_when_transaction_rolls_back(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            message = save_with_file(self.file_message())
+        blob = message.blob
+
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    release_blob(blob.sha256)
+                    raise IntegrityError
+            except IntegrityError:
+                pass
+        self.assertTrue(FileBlob.objects.filter(sha256=blob.sha256).exists())
+        self.assertTrue(cas_storage.exists(blob.file.name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            release_blob(blob.sha256)
+        self.assertFalse(FileBlob.objects.filter(sha256=blob.sha256).exists())
+        self.assertFalse(cas_storage.exists(blob.file.name))
@@ -0,0 +1,51 @@
+import asyncio
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from chat.typing import TypingAggregator
+
+
+class TypingAggregatorTests(SimpleTestCase):
+    def setUp(self):
+        self.aggregator = TypingAggregator(interval=0.01, ttl=60)
+        self.snapshots = []
+        patcher = mock.patch.object(self.aggregator, 'publish', side_effect=self.record)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def record(self, room_id, users):
+        self.snapshots.append((room_id, users))
+
+    async def finish(self, room_id):
+        task = self.aggregator._tasks.get(room_id)
+        if task is not None:
+            await asyncio.wait_for(task, timeout=1)
+
+    async def test_stop_without_typing_leaves_no_state(self):
+        # Disconnect'dagi update(..., False) - xona yozuvi ham, task ham yo'q
+        self.aggregator.update(1, 'alice', False)
+
+        self.assertEqual((self.aggregator._rooms, self.aggregator._tasks), ({}, {}))
+
+    async def test_last_typer_stopping_removes_room(self):
+        self.aggregator.update(1, 'alice', True)
+        self.aggregator.update(1, 'bob', True)
+        self.aggregator.update(1, 'alice', False)
+        self.assertEqual(self.aggregator.typing_users(1), ['bob'])
+
+        self.aggregator.update(1, 'bob', False)
+        self.assertNotIn(1, self.aggregator._rooms)
+
+        await self.finish(1)
+        self.assertEqual(self.snapshots, [(1, [])])
+        self.assertEqual((self.aggregator._rooms, self.aggregator._tasks), ({}, {}))
+
+    async def test_snapshot_is_sent_per_interval_not_per_frame(self):
+        for _ in range(20):
+            self.aggregator.update(1, 'alice', True)
+        await asyncio.sleep(0.015)
+        self.aggregator.update(1, 'alice', False)
+
+        await self.finish(1)
+        self.assertEqual(self.snapshots, [(1, ['alice']), (1, [])])
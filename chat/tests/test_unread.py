@@ -0,0 +1,72 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from chat.models import Message, Room, RoomMember
+from chat.unread import mark_read
+
+
+class MarkReadTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', password='x')
+        self.bob = User.objects.create_user('bob', password='x')
+        self.room = Room.objects.create(name='umumiy', created_by=self.alice)
+        RoomMember.objects.create(room=self.room, user=self.alice)
+        self.member = RoomMember.objects.create(room=self.room, user=self.bob)
+        for i in range(3):
+            Message.objects.create(room=self.room, user=self.alice, content=f'xabar {i}')
+        self.room.refresh_from_db()
+
+    def test_mark_read_resets_counter(self):
+        self.member.refresh_from_db()
+        self.assertEqual(self.member.unread_count, 3)
+
+        self.assertTrue(mark_read(self.room.id, self.bob.id, self.room.last_seq))
+
+        self.member.refresh_from_db()
+        self.assertEqual((self.member.last_read_seq, self.member.unread_count), (self.room.last_seq, 0))
+
+    def test_future_seq_is_clamped_to_room_last_seq(self):
+        mark_read(self.room.id, self.bob.id, 1000000)
+
+        self.member.refresh_from_db()
+        self.assertEqual(self.member.last_read_seq, self.room.last_seq)
+
+        # Keyingi xabarlar yana hisoblanadi va o'qilganda tiklanadi
+        Message.objects.create(room=self.room, user=self.alice, content='yangi')
+        self.room.refresh_from_db()
+        self.member.refresh_from_db()
+        self.assertEqual(self.member.unread_count, 1)
+
+        self.assertTrue(mark_read(self.room.id, self.bob.id, self.room.last_seq))
+        self.member.refresh_from_db()
+        self.assertEqual(self.member.unread_count, 0)
+
+    def test_pointer_past_room_last_seq_is_repaired(self):
+        RoomMember.objects.filter(id=self.member.id).update(last_read_seq=1000000, unread_count=2)
+
+        self.assertTrue(mark_read(self.room.id, self.bob.id, self.room.last_seq))
+
+        self.member.refresh_from_db()
+        self.assertEqual((self.member.last_read_seq, self.member.unread_count), (self.room.last_seq, 0))
+
+
+class RoomViewReadTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', password='x')
+        self.bob = User.objects.create_user('bob', password='x')
+        self.room = Room.objects.create(name='umumiy', created_by=self.alice)
+        RoomMember.objects.create(room=self.room, user=self.alice)
+        RoomMember.objects.create(room=self.room, user=self.bob)
+        Message.objects.create(room=self.room, user=self.alice, content='salom')
+        self.client.force_login(self.bob)
+
+    def test_mark_read_only_when_something_is_unread(self):
+        url = reverse('chat:room', args=[self.room.id])
+        with mock.patch('chat.views.mark_read', wraps=mark_read) as spy:
+            self.client.get(url)
+            self.client.get(url)
+        self.assertEqual(spy.call_count, 1)
+        self.assertEqual(RoomMember.objects.get(room=self.room, user=self.bob).unread_count, 0)
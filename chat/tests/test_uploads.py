@@ -0,0 +1,94 @@
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from chat.models import ChunkedUpload, Message, Room, RoomMember
+from chat.uploads import claim_chunk, get_part_path
+
+
+@override_settings(CHAT_UPLOAD_CHUNK_SIZE=4)
+class ChunkedUploadTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media_override = override_settings(MEDIA_ROOT=media_root, CHAT_UPLOAD_TEMP_DIR=Path(media_root) / 'chunked_uploads')
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        send = mock.patch('chat.views.send_frame_to_room')
+        self.send = send.start()
+        self.addCleanup(send.stop)
+
+        self.alice = User.objects.create_user('alice', password='x')
+        self.room = Room.objects.create(name='umumiy', created_by=self.alice)
+        self.member = RoomMember.objects.create(room=self.room, user=self.alice)
+        self.client.force_login(self.alice)
+
+    def create(self, data=b'salom dunyo'):
+        response = self.client.post(reverse('chat:upload_create', args=[self.room.id]), {'name': 'a.txt', 'size': len(data)})
+        self.assertEqual(response.status_code, 201)
+        return response.json()['upload_id']
+
+    def patch(self, upload_id, offset, chunk):
+        return self.client.generic(
+            'PATCH', reverse('chat:upload_detail', args=[upload_id]), chunk,
+            content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def finalize(self, upload_id):
+        return self.client.post(reverse('chat:upload_finalize', args=[upload_id]), {'content': 'fayl'})
+
+    def test_chunks_resume_and_finalize(self):
+        data = b'salom dunyo'
+        upload_id = self.create(data)
+
+        self.assertEqual(self.patch(upload_id, 0, data[:4])['Upload-Offset'], '4')
+        # Uzilib qayta yuborilgan (allaqachon qabul qilingan) bo'lak - 409 va server offset'i
+        response = self.patch(upload_id, 0, data[:4])
+        self.assertEqual((response.status_code, response.json()['offset']), (409, 4))
+        self.assertEqual(self.client.get(reverse('chat:upload_detail', args=[upload_id])).json()['offset'], 4)
+        self.assertEqual(self.finalize(upload_id).status_code, 409)
+
+        for offset in range(4, len(data), 4):
+            self.assertEqual(self.patch(upload_id, offset, data[offset:offset + 4]).status_code, 200)
+        response = self.finalize(upload_id)
+
+        self.assertEqual(response.status_code, 200)
+        message = Message.objects.get(id=response.json()['message']['message_id'])
+        with message.file.open('rb') as stored:
+            self.assertEqual(stored.read(), data)
+        self.assertFalse(ChunkedUpload.objects.filter(id=upload_id).exists())
+        self.assertEqual(self.send.call_args.args[1], 'file_message')
+
+    def test_concurrent_patch_for_same_offset_is_rejected(self):
+        upload_id = self.create()
+        # Boshqa so'rov shu offset'ni band qilgan (hali yozmoqda)
+        self.assertTrue(claim_chunk(upload_id, 0))
+
+        response = self.patch(upload_id, 0, b'sal')
+
+        self.assertEqual(response.status_code, 423)
+        self.assertFalse(get_part_path(ChunkedUpload(id=upload_id)).exists())
+        self.assertEqual(ChunkedUpload.objects.get(id=upload_id).offset, 0)
+
+    def test_expired_claim_truncates_unconfirmed_bytes(self):
+        upload_id = self.create(b'abcd')
+        with override_settings(CHAT_UPLOAD_LOCK_TIMEOUT=-1):
+            claim_chunk(upload_id, 0)
+        # Uzilib qolgan yozuvdan diskda tasdiqlanmagan qoldiq
+        get_part_path(ChunkedUpload(id=upload_id)).write_bytes(b'xx')
+
+        self.assertEqual(self.patch(upload_id, 0, b'abcd').status_code, 200)
+        self.assertEqual(get_part_path(ChunkedUpload(id=upload_id)).read_bytes(), b'abcd')
+
+    def test_finalize_requires_room_membership(self):
+        upload_id = self.create(b'abcd')
+        self.patch(upload_id, 0, b'abcd')
+        self.member.delete()
+
+        self.assertEqual(self.finalize(upload_id).status_code, 403)
+        self.assertFalse(Message.objects.exists())
@@ -0,0 +1,98 @@
+import re
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from chat.history import get_history_page
+from chat.models import Message, Room, RoomEvent, RoomMember
+
+
+class DeleteMessageContentTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', password='x')
+        self.bob = User.objects.create_user('bob', password='x')
+        self.mallory = User.objects.create_user('mallory', password='x')
+        self.room = Room.objects.create(name='umumiy', created_by=self.alice)
+        RoomMember.objects.create(room=self.room, user=self.alice)
+        RoomMember.objects.create(room=self.room, user=self.bob)
+        self.message = Message.objects.create(room=self.room, user=self.bob, content='salom')
+
+    def delete(self, user, content_type='all'):
+        self.client.force_login(user)
+        with mock.patch('chat.views.send_frame_to_room') as send:
+            response = self.client.post(reverse('chat:delete_content', args=[self.message.id, content_type]))
+        return response, send
+
+    def test_non_member_cannot_delete(self):
+        response, send = self.delete(self.mallory)
+
+        self.assertRedirects(response, reverse('chat:room', args=[self.room.id]), fetch_redirect_response=False)
+        self.assertTrue(Message.objects.filter(id=self.message.id).exists())
+        self.assertFalse(RoomEvent.objects.exists())
+        send.assert_not_called()
+
+    def test_member_cannot_delete_someone_elses_message(self):
+        RoomMember.objects.create(room=self.room, user=self.mallory)
+
+        self.delete(self.mallory, 'text')
+
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.content, 'salom')
+        self.assertFalse(RoomEvent.objects.exists())
+
+    def test_author_and_room_creator_can_delete(self):
+        self.delete(self.bob, 'text')
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.content, '')
+
+        _, send = self.delete(self.alice, 'all')
+        self.assertFalse(Message.objects.filter(id=self.message.id).exists())
+        self.assertEqual(send.call_args.args[1], 'message_deleted')
+
+
+@override_settings(CHAT_HISTORY_PAGE_SIZE=3)
+class RoomHistoryTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', password='x')
+        self.room = Room.objects.create(name='umumiy', created_by=self.alice)
+        RoomMember.objects.create(room=self.room, user=self.alice)
+        # Bir xil timestamp - tartibni id hal qiladi
+        timestamp = timezone.now()
+        self.messages = [
+            Message.objects.create(room=self.room, user=self.alice, content=f'xabar {i}', timestamp=timestamp)
+            for i in range(7)
+        ]
+        self.client.force_login(self.alice)
+
+    def history(self, **params):
+        return self.client.get(reverse('chat:room_history', args=[self.room.id]), params).json()
+
+    def test_pages_walk_back_without_gaps_or_duplicates(self):
+        first_page, next_cursor, has_more = get_history_page(self.room)
+        seen = [message.id for message in first_page]
+        while has_more:
+            page = self.history(before=next_cursor)
+            next_cursor, has_more = page['next_cursor'], page['has_more']
+            seen = re.findall(r'id="message-text-(\d+)"', page['html']) + seen
+
+        self.assertEqual([int(message_id) for message_id in seen], [message.id for message in self.messages])
+        self.assertIsNone(next_cursor)
+
+    def test_bad_cursor_falls_back_to_newest_page(self):
+        for cursor in ('buzuq', '12:abc', '99999999999999999999999:1'):
+            page = self.history(before=cursor)
+            self.assertEqual(page['count'], 3)
+            self.assertIn(f'id="message-text-{self.messages[-1].id}"', page['html'])
+
+    def test_limit_is_clamped(self):
+        self.assertEqual(self.history(limit=0)['count'], 1)
+        self.assertEqual(self.history(limit='x')['count'], 3)
+
+    def test_non_member_is_forbidden(self):
+        self.client.force_login(User.objects.create_user('mallory', password='x'))
+
+        response = self.client.get(reverse('chat:room_history', args=[self.room.id]))
+        self.assertEqual(response.status_code, 403)
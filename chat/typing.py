@@ -0,0 +1,97 @@
+import asyncio
+import time
+import uuid
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from .broadcast import room_group_name, frame_event
+
+
+# Har bir worker process'ning snapshot'lari client'da alohida birlashtiriladi
+WORKER_ID = uuid.uuid4().hex[:12]
+
+
+class TypingAggregator:
+    """
+    Xona bo'yicha "kim yozmoqda" holatini yig'uvchi.
+
+    Client'dan kelgan har bir `typing` frame faqat xotiradagi holatni
+    yangilaydi. Xonada kimdir yozayotgan paytda har `interval` sekundda
+    bitta umumiy snapshot yuboriladi, `ttl` dan eski yozuvlar o'zi
+    o'chadi. Shunday qilib channel layer trafigi tugmalar soniga emas,
+    faol xonalar soniga bog'liq bo'ladi.
+    """
+
+    def __init__(self, interval=1.0, ttl=4.0):
+        self.interval = interval
+        self.ttl = ttl
+        self._rooms = {}
+        self._tasks = {}
+
+    def update(self, room_id, username, is_typing):
+        if is_typing:
+            self._rooms.setdefault(room_id, {})[username] = time.monotonic() + self.ttl
+        else:
+            # To'xtash (va har bir disconnect) bo'sh xona yozuvini yaratmaydi
+            typers = self._rooms.get(room_id)
+            if not typers or typers.pop(username, None) is None:
+                return
+            if not typers:
+                # Oxirgi yozuvchi to'xtadi - bo'sh snapshot'ni task yuboradi
+                del self._rooms[room_id]
+
+        if room_id not in self._tasks:
+            self._tasks[room_id] = asyncio.ensure_future(self._run(room_id))
+
+    def typing_users(self, room_id):
+        return sorted(self._rooms.get(room_id, {}))
+
+    def _expire(self, room_id):
+        now = time.monotonic()
+        typers = self._rooms.get(room_id, {})
+        for username in [name for name, expires_at in typers.items() if expires_at <= now]:
+            del typers[username]
+
+    async def _run(self, room_id):
+        try:
+            while True:
+                await asyncio.sleep(self.interval)
+                self._expire(room_id)
+                users = self.typing_users(room_id)
+                await self.publish(room_id, users)
+                if not self._rooms.get(room_id):
+                    # Oxirgi (bo'sh) snapshot yuborildi - xona uchun task to'xtaydi
+                    self._rooms.pop(room_id, None)
+                    break
+        finally:
+            self._tasks.pop(room_id, None)
+
+    async def publish(self, room_id, users):
+        channel_layer = get_channel_layer()
+        await channel_layer.group_send(
+            room_group_name(room_id),
+            frame_event(
+                'typing_snapshot',
+                users=users,
+                origin=WORKER_ID,
+                interval=int(self.interval * 1000),
+            ),
+        )
+
+
+_aggregators = {}
+
+
+def get_typing_aggregator():
+    """Joriy event loop uchun (worker process'da bitta) aggregator"""
+    loop = asyncio.get_running_loop()
+    aggregator = _aggregators.get(loop)
+    if aggregator is None:
+        aggregator = TypingAggregator(
+            interval=getattr(settings, 'CHAT_TYPING_INTERVAL_MS', 1000) / 1000,
+            ttl=getattr(settings, 'CHAT_TYPING_TTL', 4),
+        )
+        _aggregators.clear()
+        _aggregators[loop] = aggregator
+    return aggregator
@@ -0,0 +1,65 @@
+from django.db.models import Case, F, Q, Value, When
+
+from .models import Message, Room, RoomMember
+
+
+def increment_unread(room_id, sender_id, count=1):
+    """Yangi xabar(lar): yuboruvchidan boshqa barcha a'zolarda bitta UPDATE bilan oshirish"""
+    return (
+        RoomMember.objects
+        .filter(room_id=room_id)
+        .exclude(user_id=sender_id)
+        .update(unread_count=F('unread_count') + count)
+    )
+
+
+def increment_unread_bulk(messages):
+    """
+    Write-behind batch uchun: har xonaga bitta UPDATE. A'zo xonadagi
+    batch xabarlari sonidan o'zi yuborganlarini ayirib oladi.
+    """
+    counts = {}
+    for message in messages:
+        senders = counts.setdefault(message.room_id, {})
+        senders[message.user_id] = senders.get(message.user_id, 0) + 1
+    for room_id, senders in counts.items():
+        total = sum(senders.values())
+        increment = Case(
+            *[When(user_id=sender_id, then=Value(total - count)) for sender_id, count in senders.items()],
+            default=Value(total),
+        )
+        RoomMember.objects.filter(room_id=room_id).update(unread_count=F('unread_count') + increment)
+
+
+def mark_read(room_id, user_id, seq):
+    """
+    "Shu seq gacha o'qildi": ko'rsatkich faqat oldinga suriladi, hisoblagich
+    undan keyingi (boshqalarning) xabarlari soniga tenglanadi - odatda 0.
+    Client yuborgan seq xonaning joriy last_seq'i bilan cheklanadi, aks holda
+    kelajakdagi seq ko'rsatkichni muzlatib qo'yardi. O'zgargan bo'lsa True.
+    """
+    last_seq = Room.objects.filter(id=room_id).values_list('last_seq', flat=True).first()
+    if last_seq is None:
+        return False
+    seq = min(seq, last_seq)
+    remaining = (
+        Message.objects
+        .filter(room_id=room_id, seq__gt=seq)
+        .exclude(user_id=user_id)
+        .count()
+    )
+    return bool(
+        RoomMember.objects
+        # last_read_seq > last_seq - avval cheklovsiz yozilgan noto'g'ri qiymat, tuzatiladi
+        .filter(Q(last_read_seq__lt=seq) | Q(last_read_seq__gt=last_seq), room_id=room_id, user_id=user_id)
+        .update(last_read_seq=seq, unread_count=remaining)
+    )
+
+
+def get_unread_counts(user):
+    """Barcha xonalar uchun o'qilmaganlar: bitta indeksli so'rov, {room_id: count}"""
+    return dict(
+        RoomMember.objects
+        .filter(user=user, unread_count__gt=0)
+        .values_list('room_id', 'unread_count')
+    )
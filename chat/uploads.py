@@ -0,0 +1,138 @@
+import mimetypes
+import os
+from pathlib import Path
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from .models import ChunkedUpload, Message, RoomMember
+from .storage import attach_local_file, save_with_file
+from .writer import run_write
+
+
+READ_BLOCK_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    """Yuklash protokoli xatosi (HTTP status bilan)"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def get_chunk_size():
+    return getattr(settings, 'CHAT_UPLOAD_CHUNK_SIZE', 5 * 1024 * 1024)
+
+
+def get_max_file_size():
+    return getattr(settings, 'CHAT_UPLOAD_MAX_SIZE', 100 * 1024 * 1024)
+
+
+def get_lock_timeout():
+    return getattr(settings, 'CHAT_UPLOAD_LOCK_TIMEOUT', 300)
+
+
+def get_part_path(upload):
+    """Yuklanayotgan faylning vaqtinchalik .part fayli"""
+    temp_dir = Path(getattr(settings, 'CHAT_UPLOAD_TEMP_DIR', Path(settings.MEDIA_ROOT) / 'chunked_uploads'))
+    temp_dir.mkdir(parents=True, exist_ok=True)
+    return temp_dir / f'{upload.id}.part'
+
+
+def current_offset(upload):
+    """Tasdiqlangan (to'liq yozilgan bo'laklar) bytes soni - DB'dagi offset"""
+    return ChunkedUpload.objects.filter(id=upload.id).values_list('offset', flat=True).first() or 0
+
+
+def claim_chunk(upload_id, offset):
+    """
+    Offset'ni band qilish: bitta shartli UPDATE - DB'dagi offset kutilganga
+    teng va boshqa PATCH yozmayotgan bo'lsagina. Bir xil offset'li ikki
+    parallel so'rovdan faqat bittasi o'tadi.
+    """
+    now = timezone.now()
+    return bool(
+        ChunkedUpload.objects
+        .filter(id=upload_id, offset=offset)
+        .filter(Q(locked_until__isnull=True) | Q(locked_until__lt=now))
+        .update(locked_until=now + timedelta(seconds=get_lock_timeout()))
+    )
+
+
+def release_chunk(upload_id, offset):
+    """Yozilgan bytes'ni tasdiqlash va band qilishni bo'shatish"""
+    ChunkedUpload.objects.filter(id=upload_id).update(offset=offset, locked_until=None, updated_at=timezone.now())
+
+
+def append_chunk(upload, stream, offset, length):
+    """
+    Bo'lakni `stream` dan to'g'ridan-to'g'ri diskka yozish.
+
+    Xotirada bir vaqtda faqat READ_BLOCK_SIZE bytes turadi. `offset`
+    tasdiqlangan hajmga teng bo'lishi shart (aks holda 409), shunda
+    uzilgan bo'lak xavfsiz qayta yuborilishi mumkin. Yozishdan oldin offset
+    band qilinadi - shu paytdagi boshqa PATCH 423 oladi.
+    """
+    if length > get_chunk_size():
+        raise UploadError("Bo'lak hajmi juda katta", status=413)
+    if offset + length > upload.file_size:
+        raise UploadError("Fayl e'lon qilingan hajmdan katta", status=413)
+
+    if not run_write(claim_chunk, upload.id, offset):
+        if current_offset(upload) == offset:
+            raise UploadError("Bo'lak hozir yozilmoqda", status=423)
+        raise UploadError("Offset mos kelmadi", status=409)
+
+    written = 0
+    try:
+        with open(get_part_path(upload), 'ab') as part:
+            # Oldingi uzilib qolgan yozuvning tasdiqlanmagan qoldig'i
+            part.truncate(offset)
+            while written < length:
+                block = stream.read(min(READ_BLOCK_SIZE, length - written))
+                if not block:
+                    break
+                part.write(block)
+                written += len(block)
+    finally:
+        run_write(release_chunk, upload.id, offset + written)
+
+    upload.offset = offset + written
+    return upload.offset
+
+
+def finalize_upload(upload, content=''):
+    """To'liq yuklangan faylni Message sifatida saqlash va vaqtinchalik faylni o'chirish"""
+    # Yuklash davomida xonadan chiqqan (yoki chiqarilgan) user xabar yubora olmaydi
+    if not RoomMember.objects.filter(room_id=upload.room_id, user_id=upload.user_id).exists():
+        raise UploadError("Ruxsat yo'q", status=403)
+    if current_offset(upload) != upload.file_size:
+        raise UploadError("Fayl hali to'liq yuklanmagan", status=409)
+
+    content_type, _ = mimetypes.guess_type(upload.file_name)
+
+    message = Message(
+        room=upload.room,
+        user=upload.user,
+        content=content,
+        message_type='file',
+        file_type=content_type,
+    )
+    # .part fayl nusxalanmaydi: hash hisoblanib CAS yo'liga ko'chiriladi (blob havolasi saqlash bilan birga)
+    attach_local_file(message, get_part_path(upload), upload.file_name)
+    run_write(save_with_file, message)
+
+    discard_upload(upload)
+    return message
+
+
+def discard_upload(upload):
+    """Yuklash yozuvi va uning .part faylini o'chirish"""
+    try:
+        os.remove(get_part_path(upload))
+    except FileNotFoundError:
+        pass
+    run_write(upload.delete)
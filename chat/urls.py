@@ -8,8 +8,16 @@ urlpatterns = [
     path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
     path('room/<int:room_id>/', views.room, name='room'),
+    path('room/<int:room_id>/history/', views.room_history, name='room_history'),
+    path('room/<int:room_id>/upload/', views.upload_file, name='upload_file'),
+    path('room/<int:room_id>/uploads/', views.upload_create, name='upload_create'),
+    path('uploads/<uuid:upload_id>/', views.upload_detail, name='upload_detail'),
+    path('uploads/<uuid:upload_id>/finalize/', views.upload_finalize, name='upload_finalize'),
+    path('search/', views.search, name='search'),
+    path('metrics', views.metrics, name='metrics'),
     path('create/', views.create_room, name='create_room'),
     path('delete-content/<int:message_id>/<str:content_type>/', views.delete_message_content, name='delete_content'),
     path('delete-room/<int:room_id>/', views.delete_room, name='delete_room'),
     path('download/<int:message_id>/', views.download_file, name='download_file'),
+    path('download/<int:message_id>/<str:token>/', views.download_signed, name='download_signed'),
 ]
@@ -1,18 +1,46 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from django.http import JsonResponse, HttpResponse
+from django.views.decorators.http import require_http_methods, require_POST
+from django.template.loader import render_to_string
+from django.db import DatabaseError
 from django.db.models import Count
+import logging
 import re
-from .models import Room, Message, RoomMember
+from urllib.parse import urlencode
+from .models import Room, Message, RoomMember, ChunkedUpload
+from .broadcast import send_frame_to_room
+from .downloads import load_download_token, serve_file, serve_message_file
+from .history import encode_cursor, get_history_around, get_history_page
+from .rendering import attach_rendered_html, invalidate_message_html, message_payload
+from .uploads import (
+    UploadError, get_chunk_size, get_max_file_size, current_offset,
+    append_chunk, finalize_upload, discard_upload,
+)
+from .rooms import create_room_with_owner, delete_room_with_files, get_room_list
+from .search import clamp_search_page, search_messages
+from .stats import get_global_stats
+from .unread import mark_read
+from .events import delete_message, edit_message_content
+from .writer import run_write
+from .profiling import query_budget
+from .storage import attach_file, save_with_file
 
 
+logger = logging.getLogger(__name__)
+
+
+@query_budget(6)
 @login_required
 def index(request):
-    rooms = Room.objects.all().order_by('-created_at')
-    user_count = User.objects.count()
-    message_count = Message.objects.count()
+    rooms = get_room_list(request.user)
+    # To'liq COUNT o'rniga signal'lar yuritadigan hisoblagichlar (keshdan)
+    stats = get_global_stats()
+    user_count = stats['users']
+    message_count = stats['messages']
     
     context = {
         'rooms': rooms,
@@ -59,27 +87,37 @@ def logout_view(request):
     return redirect("chat:index")
 
 
+@query_budget(7, writes=7)
 @login_required
 def room(request, room_id):
     room = get_object_or_404(Room, id=room_id)
-    messages_list = Message.objects.filter(room=room).order_by('timestamp')
     
-    # Check if user is member of the room
-    if not RoomMember.objects.filter(room=room, user=request.user).exists():
-        RoomMember.objects.create(room=room, user=request.user)
+    # Check if user is member of the room (o'qish ko'rsatkichi ham shu so'rovda)
+    membership = (
+        RoomMember.objects
+        .filter(room=room, user=request.user)
+        .values('last_read_seq', 'unread_count')
+        .first()
+    )
+    if membership is None:
+        member, _ = run_write(RoomMember.objects.get_or_create, room=room, user=request.user)
+        membership = {'last_read_seq': member.last_read_seq, 'unread_count': member.unread_count}
     
     if request.method == 'POST':
         # Xabarni tahrirlash
         edit_message_id = request.POST.get('edit_message_id')
         if edit_message_id:
             message = get_object_or_404(Message, id=edit_message_id, room=room)
-            # Har qanday user tahrirlashi mumkin
             edited_content = request.POST.get('edited_content', '')
             # Strip faqat boshi va oxiridan, line breaks ichida saqlanadi
             edited_content = edited_content.strip()
             if edited_content:
-                message.content = edited_content
-                message.save()
+                # Eski versiya HTML keshini tashlab, WebSocket bilan bir xil yo'l: UPDATE + delta broadcast
+                invalidate_message_html(message)
+                # Faqat muallif (WebSocket bilan bir xil qoida)
+                delta = run_write(edit_message_content, room.id, message.id, edited_content, request.user.id)
+                if delta:
+                    send_frame_to_room(room.id, 'message_edited', **delta)
             return redirect('chat:room', room_id=room_id)
         
         # Yangi xabar yaratish
@@ -110,39 +148,134 @@ def room(request, room_id):
                 file_size = 0
                 file_type = None
             
-            message = Message.objects.create(
+            message = Message(
                 room=room,
                 user=request.user,
                 content=content,
-                file=file,
                 file_size=file_size,
                 file_type=file_type
             )
+            if file:
+                # Bir xil fayl qayta yuklansa diskda yangi nusxa paydo bo'lmaydi
+                attach_file(message, file, file.name)
+            run_write(save_with_file, message)
             return redirect('chat:room', room_id=room_id)
     
+    # Xona ochildi - hamma xabarlar o'qilgan (sidebar'da badge yo'qoladi).
+    # Allaqachon o'qilgan xonani yangilash writer navbatiga yozuv qo'ymaydi
+    if membership['unread_count'] or membership['last_read_seq'] < room.last_seq:
+        run_write(mark_read, room.id, request.user.id, room.last_seq)
+    
+    # Faqat eng yangi xabarlar, eskilari scroll qilinganda room_history orqali yuklanadi.
+    # ?at=<cursor> (qidiruv natijasi) - shu xabar atrofidagi sahifa
+    around = get_history_around(room, request.GET['at']) if request.GET.get('at') else None
+    if around is not None:
+        messages_list, next_cursor, has_more, has_newer = around
+    else:
+        messages_list, next_cursor, has_more = get_history_page(room)
+        has_newer = False
+    attach_rendered_html(messages_list)
+    
     # Barcha xonalarni sidebar uchun olish
-    all_rooms = Room.objects.all().order_by('-created_at')
+    all_rooms = get_room_list(request.user)
+    # A'zolar soni ro'yxatdagi annotate'dan - alohida COUNT so'rovi yo'q
+    member_count = next((r.member_count for r in all_rooms if r.id == room.id), 0)
     
     context = {
         'room': room,
+        'member_count': member_count,
+        'upload_chunk_size': get_chunk_size(),
         'messages': messages_list,
+        'next_cursor': next_cursor,
+        'has_more': has_more,
+        'has_newer': has_newer,
         'all_rooms': all_rooms,
     }
     return render(request, "chat/telegram_room.html", context)
 
 
+@query_budget(5)
+@login_required
+def room_history(request, room_id):
+    """Xona tarixining eski sahifasini JSON formatda qaytarish (cursor bo'yicha)"""
+    room = get_object_or_404(Room, id=room_id)
+    
+    # Faqat xona a'zolari tarixni ko'ra oladi
+    if not RoomMember.objects.filter(room=room, user=request.user).exists():
+        return JsonResponse({'error': 'Ruxsat yo\'q'}, status=403)
+    
+    messages_list, next_cursor, has_more = get_history_page(
+        room,
+        before=request.GET.get('before'),
+        limit=request.GET.get('limit'),
+    )
+    attach_rendered_html(messages_list)
+    html = render_to_string(
+        "chat/includes/messages.html",
+        {'messages': messages_list, 'room': room},
+        request=request,
+    )
+    
+    return JsonResponse({
+        'html': html,
+        'count': len(messages_list),
+        'next_cursor': next_cursor,
+        'has_more': has_more,
+    })
+
+
+@query_budget(4)
+@login_required
+def search(request):
+    """User a'zo bo'lgan xonalardagi xabarlarni qidirish (JSON, sahifalab)"""
+    query = request.GET.get('q', '').strip()
+    try:
+        room_id = int(request.GET.get('room') or 0)
+        page = int(request.GET.get('page') or 1)
+    except ValueError:
+        return JsonResponse({'error': 'Parametr noto\'g\'ri'}, status=400)
+    page = clamp_search_page(page, request.GET.get('limit'))
+    
+    results, has_more = search_messages(
+        request.user,
+        query,
+        room_id=room_id or None,
+        page=page,
+        limit=request.GET.get('limit'),
+    )
+    
+    return JsonResponse({
+        'query': query,
+        'page': page,
+        'has_more': has_more,
+        'results': [
+            {
+                'message_id': message.id,
+                'room_id': message.room_id,
+                'room': message.room.name,
+                'user': message.user.username,
+                'snippet': message.snippet,
+                'timestamp': message.timestamp.strftime('%d.%m.%Y %H:%M'),
+                # Xona sahifasi faqat eng yangi xabarlarni ko'rsatadi - natija atrofidagi tarix ochiladi
+                'url': (
+                    reverse('chat:room', args=[message.room_id])
+                    + '?' + urlencode({'at': encode_cursor(message)})
+                    + f'#message-text-{message.id}'
+                ),
+            }
+            for message in results
+        ],
+    })
+
+
 @login_required
 def create_room(request):
     if request.method == 'POST':
         room_name = request.POST.get('room_name', '').strip()
         
         if room_name:
-            room = Room.objects.create(
-                name=room_name,
-                created_by=request.user
-            )
-            # Add creator as member
-            RoomMember.objects.create(room=room, user=request.user)
+            # Xona va yaratuvchi a'zoligi - writer orqali bitta tranzaksiyada
+            room = run_write(create_room_with_owner, room_name, request.user)
             
             return redirect('chat:room', room_id=room.id)
         else:
@@ -151,35 +284,6 @@ def create_room(request):
     return render(request, "chat/telegram_create_chat.html")
 
 
-@login_required
-def delete_message_content(request, message_id, content_type):
-    """Xabar kontent turini o'chirish: 'text', 'file', 'all'"""
-    message = get_object_or_404(Message, id=message_id)
-    room = message.room
-    
-    # Faqat xabar egasi yoki xona yaratuvchisi o'chira oladi
-    if request.user != message.user and request.user != room.created_by:
-        return redirect('chat:room', room_id=room.id)
-    
-    if content_type == 'text':
-        # Faqat matnni o'chirish
-        message.content = ''
-        message.save()
-    elif content_type == 'file':
-        # Faqat faylni o'chirish
-        if message.file:
-            message.file.delete()  # Faylni diskdan ham o'chirish
-            message.file = None
-            message.save()
-    elif content_type == 'all':
-        # Butun xabarni o'chirish
-        if message.file:
-            message.file.delete()  # Faylni diskdan ham o'chirish
-        message.delete()
-    
-    return redirect('chat:room', room_id=room.id)
-
-
 @login_required
 def get_room_members(request, room_id):
     """Xona a'zolarini JSON formatda qaytarish - autocomplete uchun"""
@@ -199,8 +303,126 @@ def get_room_members(request, room_id):
     return JsonResponse({'members': members})
 
 
-def upload_file(request):
-    return JsonResponse({"success": False})
+@login_required
+@require_POST
+def upload_file(request, room_id):
+    """
+    Bitta so'rovda fayl yuklash (bitta bo'lakdan kichik fayllar uchun):
+    yangi xabar JSON'da qaytadi va xonaga file_message sifatida yuboriladi
+    """
+    room = get_object_or_404(Room, id=room_id)
+    
+    if not RoomMember.objects.filter(room=room, user=request.user).exists():
+        return JsonResponse({'error': 'Ruxsat yo\'q'}, status=403)
+    
+    file = request.FILES.get('file')
+    if file is None:
+        return JsonResponse({'error': 'Fayl kerak'}, status=400)
+    if file.size > get_max_file_size():
+        return JsonResponse({'error': 'Fayl hajmi 100MB dan katta bo\'lishi mumkin emas'}, status=413)
+    
+    import mimetypes
+    
+    message = Message(
+        room=room,
+        user=request.user,
+        content=request.POST.get('content', '').strip(),
+        message_type='file',
+        file_type=mimetypes.guess_type(file.name)[0],
+    )
+    attach_file(message, file, file.name)
+    run_write(save_with_file, message)
+    
+    payload = message_payload(message)
+    send_frame_to_room(room.id, 'file_message', **payload)
+    return JsonResponse({'success': True, 'message': payload}, status=201)
+
+
+@login_required
+@require_POST
+def upload_create(request, room_id):
+    """Resumable yuklashni boshlash: fayl nomi va hajmi e'lon qilinadi"""
+    room = get_object_or_404(Room, id=room_id)
+    
+    if not RoomMember.objects.filter(room=room, user=request.user).exists():
+        return JsonResponse({'error': 'Ruxsat yo\'q'}, status=403)
+    
+    file_name = request.POST.get('name', '').strip()
+    try:
+        file_size = int(request.POST.get('size', ''))
+    except ValueError:
+        return JsonResponse({'error': 'Fayl hajmi noto\'g\'ri'}, status=400)
+    
+    if not file_name or file_size <= 0:
+        return JsonResponse({'error': 'Fayl nomi va hajmi kerak'}, status=400)
+    if file_size > get_max_file_size():
+        return JsonResponse({'error': 'Fayl hajmi 100MB dan katta bo\'lishi mumkin emas'}, status=413)
+    
+    upload = run_write(
+        ChunkedUpload.objects.create,
+        room=room,
+        user=request.user,
+        file_name=file_name[:255],
+        file_size=file_size,
+    )
+    return JsonResponse({
+        'upload_id': str(upload.id),
+        'offset': 0,
+        'chunk_size': get_chunk_size(),
+    }, status=201)
+
+
+@login_required
+@require_http_methods(['GET', 'HEAD', 'PATCH', 'DELETE'])
+def upload_detail(request, upload_id):
+    """
+    GET/HEAD - joriy offset (qayerdan davom ettirish kerak),
+    PATCH - navbatdagi bo'lak (header: Upload-Offset), DELETE - bekor qilish
+    """
+    upload = get_object_or_404(ChunkedUpload, id=upload_id, user=request.user)
+    
+    if request.method == 'DELETE':
+        discard_upload(upload)
+        return JsonResponse({'success': True})
+    
+    if request.method == 'PATCH':
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return JsonResponse({'error': 'Upload-Offset header kerak'}, status=400)
+        
+        try:
+            append_chunk(upload, request, offset, length)
+        except UploadError as e:
+            offset = current_offset(upload)
+            response = JsonResponse({'error': str(e), 'offset': offset}, status=e.status)
+            response['Upload-Offset'] = offset
+            return response
+    
+    offset = current_offset(upload)
+    response = JsonResponse({'offset': offset, 'size': upload.file_size})
+    response['Upload-Offset'] = offset
+    response['Upload-Length'] = upload.file_size
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+@login_required
+@require_POST
+def upload_finalize(request, upload_id):
+    """Yuklash tugadi: Message yaratish va xonaga real-time yuborish"""
+    upload = get_object_or_404(ChunkedUpload.objects.select_related('room'), id=upload_id, user=request.user)
+    room_id = upload.room_id
+    
+    try:
+        message = finalize_upload(upload, content=request.POST.get('content', '').strip())
+    except UploadError as e:
+        return JsonResponse({'error': str(e), 'offset': current_offset(upload)}, status=e.status)
+    
+    payload = message_payload(message)
+    send_frame_to_room(room_id, 'file_message', **payload)
+    return JsonResponse({'success': True, 'message': payload})
 
 
 @login_required
@@ -212,16 +434,7 @@ def delete_room(request, room_id):
         return redirect('chat:room', room_id=room_id)
     
     if request.method == 'POST':
-        room_name = room.name
-        # Xonadagi barcha fayllarni o'chirish
-        for message in room.messages.all():
-            if message.file:
-                try:
-                    message.file.delete()
-                except:
-                    pass
-        
-        room.delete()
+        run_write(delete_room_with_files, room.id)
         return redirect('chat:index')
     
     return redirect('chat:room', room_id=room_id)
@@ -230,113 +443,114 @@ def delete_room(request, room_id):
 @login_required
 def delete_message_content(request, message_id, content_type):
     if request.method == 'POST':
+        room_id = Message.objects.filter(id=message_id).values_list('room_id', flat=True).first()
+        if room_id is None:
+            return redirect('chat:index')
         try:
-            message = get_object_or_404(Message, id=message_id)
-            # Har qanday user o'chira oladi
-            room_id = message.room.id
-            
-            if content_type == 'text':
-                # Faqat matnni o'chirish
-                message.content = ""
-                message.save()
-                
-            elif content_type == 'file':
-                # Faqat faylni o'chirish
-                if message.file:
-                    try:
-                        message.file.delete()
-                    except:
-                        pass
-                    message.file = None
-                    message.file_size = 0
-                    message.file_type = None
-                    message.save()
-                
-            elif content_type == 'all':
-                # Butun xabarni o'chirish
-                if message.file:
-                    try:
-                        message.file.delete()
-                    except:
-                        pass
-                message.delete()
-            
-            return redirect('chat:room', room_id=room_id)
-        except:
-            pass
+            # Ruxsat (a'zo bo'lgan muallif yoki xona yaratuvchisi) va o'chirish - writer ichida
+            state = run_write(delete_message, message_id, content_type, request.user.id)
+        except (DatabaseError, OSError):
+            logger.exception("Xabar #%s kontentini o'chirib bo'lmadi", message_id)
+            return redirect('chat:index')
+        if state:
+            # Boshqa a'zolar sahifani yangilamasdan o'zgartiradi (qisman o'chirishda qolgan holat bilan)
+            send_frame_to_room(room_id, 'message_deleted', **state)
+        return redirect('chat:room', room_id=room_id)
     
     return redirect('chat:index')
 
 
+@login_required
 def delete_file(request, message_id):
     if request.method == 'POST':
+        room_id = Message.objects.filter(id=message_id).values_list('room_id', flat=True).first()
+        if room_id is None:
+            return redirect('chat:index')
         try:
-            message = get_object_or_404(Message, id=message_id)
             # Faqat xabar egasi yoki xona admini o'chira oladi
-            if message.user == request.user or message.room.created_by == request.user:
-                room_id = message.room.id
-                if message.file:
-                    # Faylni ham o'chirish
-                    try:
-                        message.file.delete()
-                    except:
-                        pass
-                message.delete()
-                return redirect('chat:room', room_id=room_id)
-        except:
-            pass
+            state = run_write(delete_message, message_id, 'all', request.user.id)
+        except (DatabaseError, OSError):
+            logger.exception("Xabar #%s ni o'chirib bo'lmadi", message_id)
+            return redirect('chat:index')
+        if state:
+            send_frame_to_room(room_id, 'message_deleted', **state)
+            return redirect('chat:room', room_id=room_id)
     
     return redirect('chat:index')
 
 
+@query_budget(4)
 @login_required
 def download_file(request, message_id):
     """Xavfsiz fayl yuklash view'i"""
     try:
-        message = get_object_or_404(Message, id=message_id)
+        message = get_object_or_404(Message.objects.select_related('room'), id=message_id)
         
-        # Faqat xabar egasi yoki xona a'zosi yuklay oladi
-        if not (message.user == request.user or 
-               RoomMember.objects.filter(room=message.room, user=request.user).exists() or
-               message.room.created_by == request.user):
+        # Faqat xabar egasi yoki xona a'zosi yuklay oladi (id solishtiriladi - User yuklanmaydi)
+        if not (message.user_id == request.user.id or 
+               RoomMember.objects.filter(room_id=message.room_id, user=request.user).exists() or
+               message.room.created_by_id == request.user.id):
             return HttpResponse("Ruxsat yo'q", status=403)
         
         if not message.file:
             return HttpResponse("Fayl topilmadi", status=404)
         
-        import os
         import mimetypes
-        from django.http import FileResponse
-        from urllib.parse import quote
-        
-        file_path = message.file.path
-        if not os.path.exists(file_path):
-            return HttpResponse("Fayl topilmadi", status=404)
         
-        # Fayl nomini olish
-        original_filename = os.path.basename(message.file.name)
+        # Fayl nomini olish (CAS yo'lida asl nom yo'q)
+        original_filename = message.display_file_name
         
         # MIME type aniqlash
-        content_type, _ = mimetypes.guess_type(file_path)
+        content_type = message.file_type or mimetypes.guess_type(original_filename)[0]
         if not content_type:
             content_type = 'application/octet-stream'
         
-        # Xavfsiz fayl response yaratish
-        response = FileResponse(
-            open(file_path, 'rb'),
-            content_type=content_type,
-            as_attachment=True,
-            filename=original_filename
-        )
-        
-        # Xavfsizlik header'lari qo'shish
-        response['Content-Disposition'] = f'attachment; filename*=UTF-8\'\'{quote(original_filename)}'
-        response['X-Content-Type-Options'] = 'nosniff'
-        response['Content-Security-Policy'] = "default-src 'none'; sandbox"
-        response['X-Download-Options'] = 'noopen'
-        response['X-Permitted-Cross-Domain-Policies'] = 'none'
-        
-        return response
+        # Range/ETag qo'llab-quvvatlanadi, sozlansa baytlarni proxy yuboradi
+        return serve_message_file(request, message, original_filename, content_type)
         
     except Exception as e:
         return HttpResponse(f"Xatolik: {str(e)}", status=500)
+
+
+def download_signed(request, message_id, token):
+    """
+    Imzolangan havola orqali yuklash: ruxsat token imzosi bilan tasdiqlanadi,
+    DB'ga murojaat qilinmaydi. Token eskirgan yoki bekor qilingan bo'lsa
+    oddiy (ruxsat tekshiruvchi) download_file'ga yo'naltiriladi.
+    """
+    data = load_download_token(token, message_id)
+    if data is None:
+        return redirect('chat:download_file', message_id=message_id)
+    
+    import mimetypes
+    
+    content_type = data['t'] or mimetypes.guess_type(data['n'])[0] or 'application/octet-stream'
+    return serve_file(request, data['f'], data['n'], content_type, digest=data['h'])
+
+
+def metrics(request):
+    """
+    Prometheus text formatidagi metrikalar (scrape uchun).
+    DEBUG o'chiq bo'lsa faqat Bearer token, staff user yoki CHAT_METRICS_ALLOWED_IPS
+    manzillaridan ochiladi, qolganlarga 404.
+    """
+    from django.conf import settings
+    from django.http import Http404
+    from django.utils.crypto import constant_time_compare
+    from .metrics import metrics_enabled, render_metrics
+    
+    if not metrics_enabled():
+        raise Http404
+    
+    token = getattr(settings, 'CHAT_METRICS_TOKEN', None)
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    token_ok = bool(token) and constant_time_compare(header, f'Bearer {token}')
+    
+    if not settings.DEBUG:
+        allowed_ips = getattr(settings, 'CHAT_METRICS_ALLOWED_IPS', ())
+        if not (token_ok or request.user.is_staff or request.META.get('REMOTE_ADDR') in allowed_ips):
+            raise Http404
+    elif token and not token_ok:
+        return HttpResponse('Unauthorized', status=401)
+    
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
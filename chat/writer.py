@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from functools import partial
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from .metrics import DB_WRITE_SECONDS
+from .profiling import current_profile, profile_writes
+
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseWriter:
+    """
+    Bitta yozuvchi thread: yozish funksiyalari navbatga qo'yiladi va shu
+    thread'da ketma-ket bajariladi, o'qishlar esa avvalgidek parallel.
+
+    Thread navbatdan bir nechta vazifani olib bitta tranzaksiyada (group
+    commit) bajaradi: har bir vazifa o'z savepoint'ida, shuning uchun
+    bittasining xatosi qolganlarini bekor qilmaydi. Natijalar commit
+    muvaffaqiyatli bo'lgandan keyin qaytariladi.
+    """
+
+    def __init__(self, using=DEFAULT_DB_ALIAS, max_batch=64):
+        self.using = using
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=f'db-writer-{self.using}', daemon=True)
+                self._thread.start()
+
+    def submit(self, fn, *args, **kwargs):
+        """Yozish funksiyasini navbatga qo'yish; concurrent.futures.Future qaytadi"""
+        future = Future()
+        # Yozuv so'rovlari uni yuborgan so'rov/event profiliga tushadi
+        profile = current_profile()
+        if profile is not None:
+            fn = _writes_in(fn, profile)
+        if threading.current_thread() is self._thread:
+            # Writer ichidan chaqirilgan (masalan, signal) - o'zini kutib qolmasin
+            self._call(future, fn, args, kwargs)
+            return future
+        self._ensure_started()
+        self._queue.put((future, fn, args, kwargs))
+        return future
+
+    def run(self, fn, *args, **kwargs):
+        """Sinxron kod uchun: navbat orqali bajarib natijasini kutish"""
+        return self.submit(fn, *args, **kwargs).result()
+
+    @staticmethod
+    def _call(future, fn, args, kwargs):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as exc:
+            future.set_exception(exc)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            # Kutayotgan tomon bekor qilgan (masalan, consumer yopildi) vazifalar bajarilmaydi;
+            # qolganlari RUNNING holatiga o'tadi va endi bekor qilinmaydi
+            batch = [task for task in batch if task[0].set_running_or_notify_cancel()]
+            if batch:
+                self._execute(batch)
+
+    def _execute(self, batch):
+        outcomes = []
+        try:
+            with transaction.atomic(using=self.using):
+                for future, fn, args, kwargs in batch:
+                    try:
+                        with transaction.atomic(using=self.using):
+                            outcomes.append((future, True, fn(*args, **kwargs)))
+                    except Exception as exc:
+                        outcomes.append((future, False, exc))
+        except Exception as exc:
+            logger.exception("Yozish batch'i commit bo'lmadi (%d ta vazifa)", len(batch))
+            connections[self.using].close()
+            for future, *_ in batch:
+                future.set_exception(exc)
+            return
+
+        for future, ok, value in outcomes:
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(using=DEFAULT_DB_ALIAS):
+    with _writers_lock:
+        writer = _writers.get(using)
+        if writer is None:
+            writer = _writers[using] = DatabaseWriter(
+                using=using,
+                max_batch=getattr(settings, 'CHAT_DB_WRITER_MAX_BATCH', 64),
+            )
+        return writer
+
+
+def writer_enabled(using=DEFAULT_DB_ALIAS):
+    return getattr(settings, 'CHAT_DB_SINGLE_WRITER', False) and connections[using].vendor == 'sqlite'
+
+
+def write_op_name(fn):
+    """Metrika label'i: 'Message.save', 'MessageWriteBuffer._write', 'mark_read' kabi"""
+    instance = getattr(fn, '__self__', None)
+    if instance is not None and not isinstance(instance, type):
+        return f'{type(instance).__name__}.{fn.__name__}'
+    return getattr(fn, '__qualname__', 'write')
+
+
+def _writes_in(fn, profile):
+    def call(*args, **kwargs):
+        with profile_writes(profile):
+            return fn(*args, **kwargs)
+    return call
+
+
+def run_write(fn, *args, **kwargs):
+    """
+    Yozish funksiyasini yagona writer thread orqali bajarish (sinxron).
+    Writer o'chirilgan bo'lsa yoki chaqiruvchi allaqachon tranzaksiya
+    ichida bo'lsa (uning lock'ini writer kutib qolmasligi uchun) - joyida.
+    """
+    with DB_WRITE_SECONDS.time(write_op_name(fn)):
+        if not writer_enabled() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # Writer thread'idagidek: yozuvlar profilning alohida hisobiga
+            with profile_writes(current_profile()):
+                return fn(*args, **kwargs)
+        return get_writer().run(fn, *args, **kwargs)
+
+
+def submit_write(fn, *args, **kwargs):
+    """
+    Natijani kutmasdan yozish (fon thread'lari va callback'lar uchun): vazifa
+    writer navbatiga qo'yiladi, chaqiruvchi thread DB'ga tegmaydi.
+    Xato bo'lsa log'ga yoziladi; Future qaytadi.
+    """
+    future = get_writer().submit(fn, *args, **kwargs)
+    future.add_done_callback(partial(_log_write_failure, write_op_name(fn)))
+    return future
+
+
+def _log_write_failure(op, future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("Fon yozuvi bajarilmadi: %s", op, exc_info=future.exception())
+
+
+async def database_write(fn, *args, **kwargs):
+    """Async kod (consumer'lar) uchun run_write: event loop bloklanmaydi"""
+    with DB_WRITE_SECONDS.time(write_op_name(fn)):
+        if not writer_enabled():
+            return await database_sync_to_async(_writes_in(fn, current_profile()))(*args, **kwargs)
+        return await asyncio.wrap_future(get_writer().submit(fn, *args, **kwargs))